@@ -1,4 +1,5 @@
 from config import *
+import obj_loader
 
 class Texture:
     def __init__(self,filepath):
@@ -26,34 +27,19 @@ class Texture:
 class ObjModel:
     def __init__(self,filepath):
 
-        attributeMap = {'V':0,'T':1,'N':2}
-        datatypeMap = {'F':GL_FLOAT}
+        #position, texture coordinates, normal
+        vertices, indices = obj_loader.load_obj(filepath)
+        vertices = vertices[indices]
+        stride = vertices.shape[1]
+        attributes = ((0,3,GL_FLOAT,0),(1,2,GL_FLOAT,12),(2,3,GL_FLOAT,20))
 
-        attributes = []
-
-        scene = pwf.Wavefront(filepath)
-        for name, material in scene.materials.items():
-            vertex_format = material.vertex_format.split("_")
-            vertices = material.vertices
-
-        stride = 0
-        for item in vertex_format:
-            attributeLocation = attributeMap[item[0]]
-            attributeStart = stride
-            attributeLength = int(item[1])
-            attributeDataType = datatypeMap[item[2]]
-            stride += attributeLength
-            attributes.append((attributeLocation,attributeLength,attributeDataType,attributeStart*4))
-        
         self._VAO = glGenVertexArrays(1)
         glBindVertexArray(self._VAO)
 
-        vertices = np.array(vertices,dtype=np.float32)
-
         self._VBO = glGenBuffers(1)
         glBindBuffer(GL_ARRAY_BUFFER,self._VBO)
         glBufferData(GL_ARRAY_BUFFER,vertices.nbytes,vertices,GL_STATIC_DRAW)
-        self._vertexCount = int(len(vertices)/stride)
+        self._vertexCount = len(vertices)
 
         for a in attributes:
             glEnableVertexAttribArray(a[0])
@@ -3,7 +3,6 @@ from OpenGL.GL import *
 from OpenGL.GL.shaders import compileProgram,compileShader
 import numpy as np
 import pyrr
-import pywavefront as pwf
 from assets import *
 
 pg.init()
@@ -0,0 +1,84 @@
+from config import *
+import time
+import geometry
+import room
+
+#---- Room Partitioning              ----#
+# Builds the rooms and wall edges of     #
+# generated maps, growing up to 512x512. #
+# A map is a lattice of rooms with a     #
+# door in each wall between them, and a  #
+# few pillars scattered through.         #
+#----------------------------------------#
+
+mapSizes = (64, 128, 256, 512)
+roomSize = 8
+pillarChance = 0.02
+
+def make_map(size):
+    """
+        Generate a square map, as nested lists like the scene's.
+    """
+
+    walls = np.random.randint(low = 1, high = 10, size = (size, size)).astype(object)
+
+    #carve out the rooms, leaving the lattice of walls between them
+    inside = np.ones((size, size), dtype = bool)
+    inside[::roomSize, :] = False
+    inside[:, ::roomSize] = False
+    inside[-1, :] = False
+    inside[:, -1] = False
+    pillars = np.random.random_sample((size, size)) < pillarChance
+    walls[inside & ~pillars] = 0
+
+    #a door halfway along each wall
+    middle = roomSize // 2
+    for row in range(roomSize, size - roomSize, roomSize):
+        for col in range(middle, size - middle, roomSize):
+            walls[row, col] = "d"
+            walls[col, row] = "d"
+            walls[row + 1, col] = walls[row - 1, col] = 0
+            walls[col, row + 1] = walls[col, row - 1] = 0
+
+    return walls.tolist()
+
+def build(walls):
+    """
+        Everything make_level does to split up a map, timed.
+    """
+
+    timings = {}
+
+    start = time.perf_counter()
+    rooms = []
+    doors = []
+    geometry.make_rooms(walls, doors, rooms)
+    timings["rooms"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    wall_mask = geometry.get_lumped_geometry_from(walls)
+    edges = geometry.get_edges(wall_mask)
+    timings["edges"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    geometry.classify_edges(edges)
+    target = room.Room()
+    for _edge in edges:
+        geometry.send_edge(_edge, target)
+    timings["planes"] = time.perf_counter() - start
+
+    return (rooms, doors, target.planes, timings)
+
+if __name__ == "__main__":
+
+    np.random.seed(1)
+
+    for size in mapSizes:
+
+        walls = make_map(size)
+        rooms, doors, planes, timings = build(walls)
+        total = sum(timings.values())
+
+        print(f"{size}x{size}: {len(rooms)} rooms, {len(doors)} doors, "
+              f"{len(planes)} planes in {1000 * total:.1f} ms "
+              + ", ".join(f"({name} {1000 * t:.1f} ms)" for name, t in timings.items()))
@@ -2,4 +2,34 @@ import pygame as pg
 from OpenGL.GL import *
 from OpenGL.GL.shaders import compileProgram,compileShader
 import numpy as np
-import pyrr
\ No newline at end of file
+import pyrr
+
+#Each object is one row of the object data texture: 20 floats, read
+#by the shader as 5 rgba texels. The shader only reads the leading
+#fields, spheres and lights keep their animation state in the rest.
+data_type_sphere = np.dtype({
+    'names':   [         'center',   'radius',           'color', 'roughness',
+               'center_of_motion', 'radius_of_motion',      'axis',  'velocity',        't'],
+    'formats': [  (np.float32, 3), np.float32,   (np.float32, 3),  np.float32,
+                  (np.float32, 3),       np.float32, (np.float32, 3), np.float32, np.float32],
+    'offsets': [                0,         12,                16,          28,
+                               32,               44,              48,         60,         64],
+    'itemsize': 80})
+
+data_type_plane = np.dtype({
+    'names':   [         'center',         'tangent',       'bitangent',          'normal',
+                    'u_min',    'u_max',    'v_min',    'v_max', 'material_index'],
+    'formats': [  (np.float32, 3),   (np.float32, 3),   (np.float32, 3),   (np.float32, 3),
+               np.float32, np.float32, np.float32, np.float32,       np.float32],
+    'offsets': [                0,                12,                24,                36,
+                       48,         52,         56,         60,               64],
+    'itemsize': 80})
+
+data_type_light = np.dtype({
+    'names':   [       'position', 'strength',           'color',
+                         'center',   'radius',            'axis', 'velocity',        't'],
+    'formats': [  (np.float32, 3), np.float32,   (np.float32, 3),
+                  (np.float32, 3), np.float32,   (np.float32, 3), np.float32, np.float32],
+    'offsets': [                0,         12,                16,
+                               32,         44,                48,         60,         64],
+    'itemsize': 80})
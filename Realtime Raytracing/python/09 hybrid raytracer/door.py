@@ -15,6 +15,8 @@ class Door:
         """
 
         self.coordinate = coordinate
+        #the rooms on either side, this door is their portal
+        self.rooms = []
         self.planes = []
         self.vertices = []
         self.vertexCount = 0
@@ -27,6 +29,7 @@ class Door:
             return
         self.finalized = True
 
+        self.planes = np.array(self.planes, dtype=data_type_plane)
         self.vertices = np.array(self.vertices, dtype=np.float32)
         self.vao = glGenVertexArrays(1)
         glBindVertexArray(self.vao)
@@ -184,18 +184,15 @@ class Engine:
     def createResourceMemory(self):
 
         """
-            allocate storage for up to 1024 objects (why not?)
+            allocate storage for up to 1024 objects (why not?),
+            growing if a view ever needs more
         """
 
-        objectData = []
-
         # sphere: (cx cy cz r)  (r g b roughness) (- - - -)     (- - - -)             (- - - -)
         # plane:  (cx cy cz tx) (ty tz bx by)     (bz nx ny nz) (umin umax vmin vmax) (material_index - - -)
-        # light:  (x y z s)     (r g b -)         (bz nx ny nz) (umin umax vmin vmax) (material_index - - -)
-        for object in range(1024):
-            for attribute in range(20):
-                objectData.append(0.0)
-        self.objectData = np.array(objectData, dtype=np.float32)
+        # light:  (x y z s)     (r g b -)         (- - - -)     (- - - -)             (- - - -)
+        self.objectCapacity = 1024
+        self.objectData = np.zeros((self.objectCapacity, 20), dtype=np.float32)
 
         self.objectDataTexture = glGenTextures(1)
         glActiveTexture(GL_TEXTURE1)
@@ -206,7 +203,20 @@ class Engine:
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
     
-        glTexImage2D(GL_TEXTURE_2D,0,GL_RGBA32F,5,1024,0,GL_RGBA,GL_FLOAT,bytes(self.objectData))
+        glTexImage2D(GL_TEXTURE_2D,0,GL_RGBA32F,5,self.objectCapacity,0,GL_RGBA,GL_FLOAT,self.objectData)
+    
+    def growResourceMemory(self, objectCount):
+        """
+            Make room for at least the given number of objects.
+        """
+
+        while self.objectCapacity < objectCount:
+            self.objectCapacity *= 2
+        self.objectData = np.zeros((self.objectCapacity, 20), dtype=np.float32)
+
+        glActiveTexture(GL_TEXTURE1)
+        glBindTexture(GL_TEXTURE_2D, self.objectDataTexture)
+        glTexImage2D(GL_TEXTURE_2D,0,GL_RGBA32F,5,self.objectCapacity,0,GL_RGBA,GL_FLOAT,None)
     
     def createMegaTexture(self):
 
@@ -216,7 +226,7 @@ class Engine:
             "CrumblingBrickWall", "DiamondSquareFlourishTiles", "EgyptianHieroglyphMetal"
         ]
 
-        self.megaTexture = megatexture.MegaTexture(filenames)
+        self.megaTexture = megatexture.MegaTexture(filenames, streamMipmaps = False)
     
     def createShader(self, vertexFilepath, fragmentFilepath):
         """
@@ -248,112 +258,46 @@ class Engine:
         
         return shader
 
-    def recordSphere(self, i, _sphere):
-
-        # sphere: (cx cy cz r) (r g b -) (- - - -) (- - - -) (- - - -)
-
-        self.objectData[20*i]     = _sphere.center[0]
-        self.objectData[20*i + 1] = _sphere.center[1]
-        self.objectData[20*i + 2] = _sphere.center[2]
-
-        self.objectData[20*i + 3] = _sphere.radius
-
-        self.objectData[20*i + 4] = _sphere.color[0]
-        self.objectData[20*i + 5] = _sphere.color[1]
-        self.objectData[20*i + 6] = _sphere.color[2]
-
-        self.objectData[20*i + 7] = _sphere.roughness
-    
-    def recordPlane(self, i, _plane):
-
-        # plane: (cx cy cz tx) (ty tz bx by) (bz nx ny nz) (umin umax vmin vmax) (r g b -)
-
-        self.objectData[20*i]     = _plane.center[0]
-        self.objectData[20*i + 1] = _plane.center[1]
-        self.objectData[20*i + 2] = _plane.center[2]
-
-        self.objectData[20*i + 3] = _plane.tangent[0]
-        self.objectData[20*i + 4] = _plane.tangent[1]
-        self.objectData[20*i + 5] = _plane.tangent[2]
-
-        self.objectData[20*i + 6] = _plane.bitangent[0]
-        self.objectData[20*i + 7] = _plane.bitangent[1]
-        self.objectData[20*i + 8] = _plane.bitangent[2]
-
-        self.objectData[20*i + 9]  = _plane.normal[0]
-        self.objectData[20*i + 10] = _plane.normal[1]
-        self.objectData[20*i + 11] = _plane.normal[2]
-
-        self.objectData[20*i + 12] = _plane.uMin
-        self.objectData[20*i + 13] = _plane.uMax
-        self.objectData[20*i + 14] = _plane.vMin
-        self.objectData[20*i + 15] = _plane.vMax
-
-        self.objectData[20*i + 16] = _plane.material_index
-    
-    def recordLight(self, i, _light):
-
-        # light: (x y z s) (r g b -) (- - - -) (- - - -) (- - - -)
-
-        self.objectData[20*i]     = _light.position[0]
-        self.objectData[20*i + 1] = _light.position[1]
-        self.objectData[20*i + 2] = _light.position[2]
-        self.objectData[20*i + 3] = _light.strength
-
-        self.objectData[20*i + 4] = _light.color[0]
-        self.objectData[20*i + 5] = _light.color[1]
-        self.objectData[20*i + 6] = _light.color[2]
-    
     def updateScene(self, scene):
+        """
+            Gather the objects of the scene and its active rooms
+            into the object data, then upload the part in use.
+        """
 
         scene.outDated = False
 
         glUseProgram(self.rayTracerShader)
 
-        #spheres
-        sphereCount = 0
+        rooms = scene.active_rooms
+        spheres = [scene.spheres] + [room.spheres for room in rooms]
+        planes = [scene.planes] + [room.planes for room in rooms] \
+            + [door.planes for door in scene.active_doors]
+        lights = [scene.lights] + [room.lights for room in rooms]
+
+        objectCount = sum(len(objects) for objects in spheres + planes + lights)
+        if objectCount > self.objectCapacity:
+            self.growResourceMemory(objectCount)
+
+        #every object is a row of 20 floats, so each array copies in as a block
         objectCount = 0
-        for i,_sphere in enumerate(scene.spheres):
-            self.recordSphere(i + sphereCount + objectCount, _sphere)
-        sphereCount += len(scene.spheres)
-        for room in scene.active_rooms:
-            for i, _sphere in enumerate(room.spheres):
-                self.recordSphere(i + sphereCount + objectCount, _sphere)
-            sphereCount += len(room.spheres)
-        glUniform1f(self.sphereCountLocation, sphereCount)
-        objectCount += sphereCount
-
-        #planes
-        planeCount = 0
-        for i,_plane in enumerate(scene.planes):
-            self.recordPlane(i + planeCount + objectCount, _plane)
-        planeCount += len(scene.planes)
-        for room in scene.active_rooms:
-            for i, _plane in enumerate(room.planes):
-                self.recordPlane(i + planeCount + objectCount, _plane)
-            planeCount += len(room.planes)
-            for door in room.doors:
-                for i,_plane in enumerate(door.planes):
-                    self.recordPlane(i + planeCount + objectCount, _plane)
-                planeCount += len(door.planes)
-        glUniform1f(self.planeCountLocation, planeCount)
-        objectCount += planeCount
-
-        #lights
-        lightCount = 0
-        for i,_light in enumerate(scene.lights):
-            self.recordLight(i + lightCount + objectCount, _light)
-        lightCount += len(scene.lights)
-        for room in scene.active_rooms:
-            for i, _light in enumerate(room.lights):
-                self.recordLight(i + lightCount + objectCount, _light)
-            lightCount += len(room.lights)
-        glUniform1f(self.lightCountLocation, lightCount)
-        objectCount += lightCount
+        for group, location in (
+            (spheres, self.sphereCountLocation),
+            (planes, self.planeCountLocation),
+            (lights, self.lightCountLocation)):
+
+            groupStart = objectCount
+            for objects in group:
+                self.objectData[objectCount : objectCount + len(objects)] \
+                    = objects.view(np.float32).reshape(-1, 20)
+                objectCount += len(objects)
+            glUniform1f(location, objectCount - groupStart)
+
+        if objectCount == 0:
+            return
 
         glActiveTexture(GL_TEXTURE1)
         glBindTexture(GL_TEXTURE_2D, self.objectDataTexture)
-        glTexImage2D(GL_TEXTURE_2D,0,GL_RGBA32F,5,1024,0,GL_RGBA,GL_FLOAT,bytes(self.objectData))
+        glTexSubImage2D(GL_TEXTURE_2D,0,0,0,5,objectCount,GL_RGBA,GL_FLOAT,self.objectData)
     
     def prepare_geometry_pass(self, scene):
 
@@ -396,10 +340,10 @@ class Engine:
 
         glBindVertexArray(scene.vao)
         glDrawArrays(GL_TRIANGLES, 0, scene.vertexCount)
+        for _door in scene.active_doors:
+            glBindVertexArray(_door.vao)
+            glDrawArrays(GL_TRIANGLES, 0, _door.vertexCount)
         for _room in scene.active_rooms:
-            for _door in _room.doors:
-                glBindVertexArray(_door.vao)
-                glDrawArrays(GL_TRIANGLES, 0, _door.vertexCount)
             glBindVertexArray(_room.vao)
             glDrawArrays(GL_TRIANGLES, 0, _room.vertexCount)
         glBindFramebuffer(GL_FRAMEBUFFER, 0)
@@ -418,7 +362,7 @@ class Engine:
         glActiveTexture(GL_TEXTURE1)
         glBindImageTexture(1, self.objectDataTexture, 0, GL_FALSE, 0, GL_READ_ONLY, GL_RGBA32F)
         glActiveTexture(GL_TEXTURE3)
-        glBindImageTexture(3, self.megaTexture.texture, 0, GL_FALSE, 0, GL_READ_ONLY, GL_RGBA32F)
+        glBindImageTexture(3, self.megaTexture.texture, 0, GL_FALSE, 0, GL_READ_ONLY, GL_RGBA8)
         #g-Buffer
         glActiveTexture(GL_TEXTURE4)
         glBindImageTexture(4, self.g0Texture, 0, GL_FALSE, 0, GL_READ_ONLY, GL_RGBA32F)
@@ -457,6 +401,7 @@ class Engine:
             Draw all objects in the scene
         """
         
+        self.megaTexture.update()
         self.updateScene(scene)
         self.geometry_pass(scene)
         self.raytrace_pass(scene)
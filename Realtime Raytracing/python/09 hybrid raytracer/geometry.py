@@ -1,8 +1,40 @@
+from config import *
+from collections import deque
 import room
 import door
 import plane
 import edge
 
+def get_block_masks(walls):
+    """
+        Sort the blocks of a map into open floor, doors and
+        solid walls, as boolean grids.
+    """
+
+    grid = np.array(walls, dtype = object)
+    doors = grid == "d"
+    floor = grid == 0
+
+    return floor, doors, ~(floor | doors)
+
+def find_runs(mask):
+    """
+        Find the runs of set cells along each row of a boolean grid.
+
+        Returns the row, first column and one past the last
+        column of each run, in scan order.
+    """
+
+    rows, cols = mask.shape
+    padded = np.zeros((rows, cols + 2), dtype = np.int8)
+    padded[:, 1:-1] = mask
+    change = np.diff(padded, axis = 1)
+
+    lines, starts = np.nonzero(change == 1)
+    _, ends = np.nonzero(change == -1)
+
+    return lines, starts, ends
+
 def get_lumped_geometry_from(array):
     """
         Get a description of what planes are visible.
@@ -12,318 +44,244 @@ def get_lumped_geometry_from(array):
         8: West wall
     """
 
-    rows = len(array)
-    cols = len(array[0])
+    _, _, solid = get_block_masks(array)
 
-    empty_blocks = (0, "d")
+    #off the map counts as solid
+    padded = np.pad(solid, 1, constant_values = True)
+    north = padded[:-2, 1:-1]
+    south = padded[2:, 1:-1]
+    west = padded[1:-1, :-2]
+    east = padded[1:-1, 2:]
 
-    result = [[0 for col in range(cols)] for row in range(rows)]
+    result = 15 - 1 * north - 2 * east - 4 * south - 8 * west
 
-    for row in range(rows):
-        for col in range(cols):
+    return np.where(solid, result, 0)
 
-            #block
-            if array[row][col] not in empty_blocks:
-                result[row][col] = 15
+def get_edges(wall_mask):
+    """
+        Merge the visible faces into edges: runs along the rows
+        for north and south faces, along the columns for east and
+        west.
+    """
 
-                #north
-                if row == 0 or array[row - 1][col] not in empty_blocks:
-                    result[row][col] -= 1
-                
-                #east
-                if col == (cols - 1) or array[row][col + 1] not in empty_blocks:
-                    result[row][col] -= 2
-                
-                #south
-                if row == (rows - 1) or array[row + 1][col] not in empty_blocks:
-                    result[row][col] -= 4
-                
-                #west
-                if col == 0 or array[row][col - 1] not in empty_blocks:
-                    result[row][col] -= 8
-        
+    wall_mask = np.asarray(wall_mask)
+    edges = []
 
-    return result
+    for bit, along_columns in ((1, False), (2, True), (4, False), (8, True)):
 
-def get_edges(wall_mask):
+        faces = (wall_mask & bit) != 0
+        if along_columns:
+            faces = faces.T
+        lines, starts, ends = find_runs(faces)
 
-    rows = len(wall_mask)
-    cols = len(wall_mask[0])
-    edges = []
-    id = 0
+        for line, start, end in zip(lines.tolist(), starts.tolist(), ends.tolist()):
 
-    #debugging: print mask
-    """
-    for row in range(rows):
-        for col in range(cols):
-            print(f"{wall_mask[row][col]} ", end="")
-        print()
-    """
-    
-    #North edges: 1
-    building_edge = False
-    _edge = None
-    for row in range(rows):
-        for col in range(cols):
-            
-            if wall_mask[row][col] & 1:
-                if not building_edge:
-                    building_edge = True
-                    _edge = edge.Edge(id)
-                    id += 1
-                    _edge.point_a = (row, col)
-                    _edge.type = edge.NORTH
-            else:
-                if building_edge:
-                    building_edge = False
-                    _edge.point_b = (row, col - 1)
-                    edges.append(_edge)
-            
-        if building_edge:
-            building_edge = False
-            _edge.point_b = (row, cols - 1)
-            edges.append(_edge)
-        
-    #East edges: 2
-    building_edge = False
-    _edge = None
-    for col in range(cols):
-        for row in range(rows):
-            
-            if wall_mask[row][col] & 2:
-                if not building_edge:
-                    building_edge = True
-                    _edge = edge.Edge(id)
-                    id += 1
-                    _edge.point_a = (row, col)
-                    _edge.type = edge.EAST
+            if along_columns:
+                first, last = (start, line), (end - 1, line)
             else:
-                if building_edge:
-                    building_edge = False
-                    _edge.point_b = (row - 1, col)
-                    edges.append(_edge)
-            
-        if building_edge:
-            building_edge = False
-            _edge.point_b = (rows - 1, col)
-            edges.append(_edge)
-    
-    #South: 4
-    building_edge = False
-    _edge = None
-    for row in range(rows):
-        for col in range(cols):
-            
-            if wall_mask[row][col] & 4:
-                if not building_edge:
-                    building_edge = True
-                    _edge = edge.Edge(id)
-                    id += 1
-                    _edge.point_b = (row, col)
-                    _edge.type = edge.SOUTH
-            else:
-                if building_edge:
-                    building_edge = False
-                    _edge.point_a = (row, col - 1)
-                    edges.append(_edge)
-            
-        if building_edge:
-            building_edge = False
-            _edge.point_a = (row, cols - 1)
-            edges.append(_edge)
-        
-    #West: 8
-    building_edge = False
-    _edge = None
-    for col in range(cols):
-        for row in range(rows):
-            
-            if wall_mask[row][col] & 8:
-                if not building_edge:
-                    building_edge = True
-                    _edge = edge.Edge(id)
-                    id += 1
-                    _edge.point_b = (row, col)
-                    _edge.type = edge.WEST
+                first, last = (line, start), (line, end - 1)
+
+            _edge = edge.Edge(len(edges))
+            _edge.type = bit
+            #north and east run forwards, south and west backwards
+            if bit in (edge.NORTH, edge.EAST):
+                _edge.point_a, _edge.point_b = first, last
             else:
-                if building_edge:
-                    building_edge = False
-                    _edge.point_a = (row - 1, col)
-                    edges.append(_edge)
-            
-        if building_edge:
-            building_edge = False
-            _edge.point_a = (rows - 1, col)
+                _edge.point_a, _edge.point_b = last, first
             edges.append(_edge)
-    
-    #debugging: print set of edges
+
+    return edges
+
+def label_rooms(floor):
     """
-    for _edge in edges:
-        print(f"Edge {_edge.id}: ", end="")
-        if _edge.type == edge.NORTH:
-            print("North: ",end="")
-        elif _edge.type == edge.EAST:
-            print("East: ",end="")
-        elif _edge.type == edge.SOUTH:
-            print("South: ",end="")
-        elif _edge.type == edge.WEST:
-            print("West: ",end="")
-        print(f"({_edge.point_a[0]}, {_edge.point_a[1]}) -> ({_edge.point_b[0]}, {_edge.point_b[1]})")
+        Label the connected regions of open floor. Doors aren't
+        floor, so they split rooms.
+
+        The floor is cut into runs along each row, then runs
+        touching in neighbouring rows are flood filled together.
+        Rooms are numbered in the order a row by row scan first
+        reaches them.
+
+        Returns the label of each block (-1 off the floor) and
+        the number of rooms.
     """
 
-    return edges
+    rows, cols = floor.shape
+    lines, starts, ends = find_runs(floor)
+    run_count = len(lines)
+
+    #the run each floor block belongs to
+    run_starts = np.zeros((rows, cols), dtype = np.int64)
+    run_starts[lines, starts] = 1
+    run_of_block = np.cumsum(run_starts.ravel()).reshape(rows, cols) - 1
+
+    #runs which touch across a pair of rows
+    touching = floor[:-1] & floor[1:]
+    links = np.unique(
+        run_of_block[:-1][touching] * run_count + run_of_block[1:][touching])
+    upper, lower = np.divmod(links, max(run_count, 1))
+    sources = np.concatenate((upper, lower))
+    targets = np.concatenate((lower, upper))
+    order = np.argsort(sources, kind = "stable")
+    neighbours = targets[order].tolist()
+    offsets = np.searchsorted(sources[order], np.arange(run_count + 1)).tolist()
+
+    run_labels = np.zeros(run_count, dtype = np.int64)
+    visited = np.zeros(run_count, dtype = bool)
+    room_count = 0
+
+    for seed in range(run_count):
+
+        if visited[seed]:
+            continue
+
+        visited[seed] = True
+        frontier = deque((seed,))
+        while frontier:
+            run = frontier.popleft()
+            run_labels[run] = room_count
+            for neighbour in neighbours[offsets[run]:offsets[run + 1]]:
+                if not visited[neighbour]:
+                    visited[neighbour] = True
+                    frontier.append(neighbour)
+
+        room_count += 1
+
+    labels = np.where(floor, run_labels[run_of_block] if run_count else -1, -1)
+
+    return labels, room_count
 
 def make_rooms(walls, doors, rooms):
     """
-        Perform Depth First search to partition the empty space
-        into rooms.
+        Partition the empty space into rooms.
 
-        Add planes to rooms.
+        Each room holds its floor blocks and the doors beside
+        them as internal coordinates, and the walls beside its
+        floor as coordinates. Doors belong to the rooms on both
+        sides.
     """
 
-    #list of coordinates to search.
-    coordinates_to_expand = []
-    #history of coordinates which have already been searched.
-    expanded_coordinates = []
-    empty_blocks = (0, "d")
+    floor, door_blocks, solid = get_block_masks(walls)
+    labels, room_count = label_rooms(floor)
+    rows, cols = floor.shape
+    block_count = rows * cols
+    index = np.arange(block_count).reshape(rows, cols)
+
+    #pair every floor block's room with the blocks beside it
+    owners = np.concatenate((
+        labels[1:, :].ravel(), labels[:-1, :].ravel(),
+        labels[:, 1:].ravel(), labels[:, :-1].ravel()))
+    blocks = np.concatenate((
+        index[:-1, :].ravel(), index[1:, :].ravel(),
+        index[:, :-1].ravel(), index[:, 1:].ravel()))
+    beside = owners >= 0
+    owners = owners[beside]
+    blocks = blocks[beside]
+
+    #keys sort by room, then in scan order
+    floor_blocks = np.flatnonzero(floor)
+    floor_keys = labels.ravel()[floor_blocks] * block_count + floor_blocks
+    is_door = door_blocks.ravel()[blocks]
+    door_keys = np.unique(owners[is_door] * block_count + blocks[is_door])
+    is_wall = solid.ravel()[blocks]
+    wall_keys = np.unique(owners[is_wall] * block_count + blocks[is_wall])
+    internal_keys = np.sort(np.concatenate((floor_keys, door_keys)))
+
+    door_lookup = {_door.coordinate: _door for _door in doors}
+    templates = make_door_templates()
+    room_ids = np.arange(room_count + 1) * block_count
+
+    grouped = []
+    for keys in (internal_keys, wall_keys, door_keys):
+        _, block = np.divmod(keys, block_count)
+        row, col = np.divmod(block, cols)
+        coordinates = list(zip(row.tolist(), col.tolist()))
+        bounds = np.searchsorted(keys, room_ids).tolist()
+        grouped.append((coordinates, bounds))
+
+    for i in range(room_count):
 
-    #get the first open block to search from
-    starting_coordinate = get_new_room(walls, expanded_coordinates)
-
-    while starting_coordinate is not None:
-        #start looking in a new room
-        coordinates_to_expand.append(starting_coordinate)
-        #empty blocks can be 0 or "d", but doors can be expanded from both sides,
-        #so remove any doors currently in history.
-        for i,coordinate in enumerate(expanded_coordinates):
-            row, col = coordinate
-            if walls[row][col] == "d":
-                expanded_coordinates.pop(i)
         newRoom = room.Room()
-    
-        #keep expanding empty space within the room, until done.
-        while len(coordinates_to_expand) > 0:
-
-            searched_coordinate = coordinates_to_expand.pop(0)
-            if searched_coordinate in expanded_coordinates:
-                #just in case the algorithm tells us to search
-                #the same space twice.
-                continue
-            expanded_coordinates.append(searched_coordinate)
-            neighbors = expand(walls, searched_coordinate, expanded_coordinates)
-            
-            for coordinate in neighbors:
-                row,col = coordinate
-                #in the next iteration, only the empty space neighbours
-                #will be expanded
-                if walls[row][col] in empty_blocks:
-
-                    if coordinate not in expanded_coordinates:
-                        coordinates_to_expand.append(coordinate)
-                    
-                    #If we're on a door then search to see if the door already exists
-                    #(doors can belong to multiple rooms)
-                    if walls[row][col] == "d":
-                        alreadyExists = False
-                        for _door in doors:
-                            if coordinate == _door.coordinate:
-                                alreadyExists = True
-                        
-                        if not alreadyExists:
-                            #make a door, build the central planes,
-                            #then build the external planes
-                            newDoor = door.Door(coordinate)
-                            make_north_wall(row, col, 7, newDoor)
-                            make_east_wall(row, col, 7, newDoor)
-                            make_south_wall(row, col, 7, newDoor)
-                            make_west_wall(row, col, 7, newDoor)
-                            make_ceiling(row, col, 7, newDoor)
-                            make_floor(row, col, 7, newDoor)
-                            if walls[row+1][col] not in empty_blocks:
-                                #horizontal, add top and bottom
-                                make_north_wall(row + 1, col, 7, newDoor)
-                                make_south_wall(row - 1, col, 7, newDoor)
-                            else:
-                                #vertical, add left and right
-                                make_east_wall(row, col - 1, 7,newDoor)
-                                make_west_wall(row, col + 1, 7,newDoor)
-                            
-                            doors.append(newDoor)
-                            newRoom.doors.append(newDoor)
-                        else:
-                            #a door exists, find the instance of the door, and add it to the
-                            #current room
-                            newDoor = get_door_by_coordinate(doors, coordinate)
-                            newRoom.doors.append(newDoor)
-
-                        
-                    if coordinate not in newRoom.internalCoordinates:
-                        newRoom.internalCoordinates.append(coordinate)
-
-                elif coordinate not in newRoom.coordinates:
-                    newRoom.coordinates.append(coordinate)
-
-        #this room has been fully expanded, add it to the set
-        #of rooms, then attempt to start a new room.
+        for (coordinates, bounds), target in zip(
+            grouped, (newRoom.internalCoordinates, newRoom.coordinates, newRoom.doors)):
+
+            target.extend(coordinates[bounds[i]:bounds[i + 1]])
+
+        #swap door coordinates for doors, made the first time they're seen
+        for j, coordinate in enumerate(newRoom.doors):
+            if coordinate not in door_lookup:
+                door_lookup[coordinate] = make_door(walls, coordinate, templates)
+                doors.append(door_lookup[coordinate])
+            newRoom.doors[j] = door_lookup[coordinate]
+
         rooms.append(newRoom)
-        starting_coordinate = get_new_room(walls, expanded_coordinates)
 
-def get_new_room(walls, expanded_coordinates):
+def make_door(walls, coordinate, templates):
     """
-        Search the set of rooms and if an empty space is found
-        that hasn't been searched, return that coordinate.
-        Otherwise, return None
+        Make a door, by moving a copy of the template for its
+        orientation into place.
     """
 
-    #get dimensions of map
-    rows = len(walls)
-    cols = len(walls[0])
+    empty_blocks = (0, "d")
+    row, col = coordinate
+
+    newDoor = door.Door(coordinate)
+    horizontal = walls[row+1][col] not in empty_blocks
+    vertices = templates[0 if horizontal else 1].copy()
+    vertices[:, 0] += col
+    vertices[:, 1] += row
+    newDoor.vertices = vertices.ravel()
+    newDoor.vertexCount = len(vertices)
 
-    for row in range(rows):
-        for col in range(cols):
-            if walls[row][col] == 0:
-                possible_solution = (row,col)
-                if possible_solution not in expanded_coordinates:
-                    return possible_solution
-    return None
+    return newDoor
 
-def expand(walls, coordinate, expanded_coordinates):
+def make_door_templates():
     """
-        return the neighbourhood of coordinates around a given coordinate,
-        returning all those which are in the same room.
+        Build door geometry at the origin, horizontal and vertical.
+        Doors only differ by where they sit, so the rest are
+        copies of these.
     """
 
-    coordinates = [coordinate,]
+    templates = []
+    for horizontal in (True, False):
+        template = door.Door((0, 0))
+        build_door(0, 0, horizontal, template)
+        templates.append(np.array(template.vertices).reshape(-1, 14))
 
-    rows = len(walls)
-    cols = len(walls[0])
-    
-    row,col = coordinate
-
-    onDoor = (walls[row][col] == "d")
-
-    if row > 0:
-        if (not onDoor) \
-            or (onDoor and walls[row - 1][col] != 0) \
-            and coordinate not in expanded_coordinates:
-            coordinates.append((row - 1, col))
-    if row < rows - 1:
-        if (not onDoor) \
-            or (onDoor and walls[row + 1][col] != 0) \
-            and coordinate not in expanded_coordinates:
-            coordinates.append((row + 1, col))
-    if col > 0:
-        if (not onDoor) \
-            or (onDoor and walls[row][col - 1] != 0) \
-            and coordinate not in expanded_coordinates:
-            coordinates.append((row, col - 1))
-    if col < cols - 1:
-        if (not onDoor) \
-            or (onDoor and walls[row][col + 1] != 0) \
-            and coordinate not in expanded_coordinates:
-            coordinates.append((row, col + 1))
-    
-    return coordinates
+    return templates
+
+def build_door(row, col, horizontal, target):
+    """
+        Build the central planes, then build the external planes.
+    """
+
+    make_north_wall(row, col, 7, target)
+    make_east_wall(row, col, 7, target)
+    make_south_wall(row, col, 7, target)
+    make_west_wall(row, col, 7, target)
+    make_ceiling(row, col, 7, target)
+    make_floor(row, col, 7, target)
+    if horizontal:
+        #add top and bottom
+        make_north_wall(row + 1, col, 7, target)
+        make_south_wall(row - 1, col, 7, target)
+    else:
+        #vertical, add left and right
+        make_east_wall(row, col - 1, 7, target)
+        make_west_wall(row, col + 1, 7, target)
+
+#normal, tangent and bitangent of the walls facing each way,
+#shared by all of their planes
+wall_axes = {
+    edge.NORTH: ([ 0, -1, 0], [-1, 0, 0], [0, 0, -1]),
+    edge.EAST:  ([ 1,  0, 0], [ 0, 1, 0], [0, 0,  1]),
+    edge.SOUTH: ([ 0,  1, 0], [-1, 0, 0], [0, 0,  1]),
+    edge.WEST:  ([-1,  0, 0], [ 0, 1, 0], [0, 0, -1]),
+}
+wall_axes = {
+    _type: tuple(np.array(axis, dtype=np.float32) for axis in axes)
+    for _type, axes in wall_axes.items()
+}
 
 def send_edge(_edge, target):
 
@@ -334,70 +292,35 @@ def send_edge(_edge, target):
         x_center = (_edge.point_a[1] + _edge.point_b[1] + 1)/2
         y_center = _edge.point_a[0]
         width = (_edge.point_b[1] + 1 - _edge.point_a[1])/2
-        target.planes.append(
-            plane.Plane(
-                normal    = [0, -1, 0],
-                tangent   = [-1, 0, 0],
-                bitangent = [0, 0, -1],
-                uMin = -width,
-                uMax = width,
-                vMin = -0.5,
-                vMax = 0.5,
-                center = [x_center, y_center, 0.5],
-                material_index = 0
-            )
-        )
     elif _edge.type == edge.EAST:
         x_center = _edge.point_a[1] + 1
         y_center = (_edge.point_a[0] + _edge.point_b[0] + 1)/2
         width = (_edge.point_b[0] + 1 - _edge.point_a[0])/2
-        target.planes.append(
-            plane.Plane(
-                normal    = [1, 0, 0],
-                tangent   = [0, 1, 0],
-                bitangent = [0, 0, 1],
-                uMin = -width,
-                uMax = width,
-                vMin = -0.5,
-                vMax = 0.5,
-                center = [x_center, y_center, 0.5],
-                material_index = 0
-            )
-        )
     elif _edge.type == edge.SOUTH:
         x_center = (_edge.point_a[1] + _edge.point_b[1] + 1)/2
         y_center = _edge.point_a[0] + 1
         width = (_edge.point_b[1] + 1 - _edge.point_a[1])/2
-        target.planes.append(
-            plane.Plane(
-                normal    = [ 0, 1, 0],
-                tangent   = [-1, 0, 0],
-                bitangent = [ 0, 0, 1],
-                uMin = -width,
-                uMax = width,
-                vMin = -0.5,
-                vMax = 0.5,
-                center = [x_center, y_center, 0.5],
-                material_index = 0
-            )
-        )
     elif _edge.type == edge.WEST:
         x_center = _edge.point_a[1]
         y_center = (_edge.point_a[0] + _edge.point_b[0] + 1)/2
         width = (_edge.point_b[0] + 1 - _edge.point_a[0])/2
-        target.planes.append(
-            plane.Plane(
-                normal    = [-1, 0, 0],
-                tangent   = [0, 1, 0],
-                bitangent = [0, 0, -1],
-                uMin = -width,
-                uMax = width,
-                vMin = -0.5,
-                vMax = 0.5,
-                center = [x_center, y_center, 0.5],
-                material_index = 0
-            )
+    else:
+        return
+
+    normal, tangent, bitangent = wall_axes[_edge.type]
+    target.planes.append(
+        plane.make_plane(
+            normal    = normal,
+            tangent   = tangent,
+            bitangent = bitangent,
+            uMin = -width,
+            uMax = width,
+            vMin = -0.5,
+            vMax = 0.5,
+            center = [x_center, y_center, 0.5],
+            material_index = 0
         )
+    )
 
 def make_north_wall(row, col, material, target):
 
@@ -412,8 +335,7 @@ def make_north_wall(row, col, material, target):
         col + 1.0, row, 1.0, 1.0/5.0, (9.0 - material)/9.0,         -1.0, 0.0, 0.0, 0.0, 0.0, -1.0, 0.0, -1.0, 0.0, #z+,x+
     ]
 
-    for data in vertices:
-        target.vertices.append(data)
+    target.vertices.extend(vertices)
     
     target.vertexCount += 6
     
@@ -430,8 +352,7 @@ def make_east_wall(row, col, material, target):
         col + 1.0, row,       0.0, 0.0,     (9.0 - (material + 1.0))/9.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0, 1.0, 0.0, 0.0, #z-,y-
     ]
 
-    for data in vertices:
-        target.vertices.append(data)
+    target.vertices.extend(vertices)
     
     target.vertexCount += 6
 
@@ -448,8 +369,7 @@ def make_south_wall(row, col, material, target):
         col + 1.0, row + 1.0, 1.0, 1.0/5.0, (9.0 - material)/9.0,         -1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 1.0, 0.0, #z+,x+
     ]
 
-    for data in vertices:
-        target.vertices.append(data)
+    target.vertices.extend(vertices)
     
     target.vertexCount += 6
 
@@ -466,8 +386,7 @@ def make_west_wall(row, col, material, target):
         col, row + 1.0, 1.0, 1.0/5.0, (9.0 - material)/9.0,         0.0, 1.0, 0.0, 0.0, 0.0, -1.0, -1.0, 0.0, 0.0, #z+,y+
     ]
 
-    for data in vertices:
-        target.vertices.append(data)
+    target.vertices.extend(vertices)
     
     target.vertexCount += 6
 
@@ -484,8 +403,7 @@ def make_ceiling(row, col, material, target):
         col + 1, row,       1.0, 1.0/5.0, (9.0 - material)/9.0,         0.0, -1.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, -1.0, #x+,y-
     ]
 
-    for data in vertices:
-        target.vertices.append(data)
+    target.vertices.extend(vertices)
     
     target.vertexCount += 6
 
@@ -502,17 +420,10 @@ def make_floor(row, col, material, target):
         col + 1.0, row + 1.0, 0.0, 1.0/5.0, (9.0 - material)/9.0,         0.0, 1.0, 0.0, -1.0, 0.0, 0.0, 0.0, 0.0, 1.0, #x+,y+
     ]
 
-    for data in vertices:
-        target.vertices.append(data)
+    target.vertices.extend(vertices)
     
     target.vertexCount += 6
 
-def get_door_by_coordinate(doors, coordinate):
-
-    for _door in doors:
-        if _door.coordinate == coordinate:
-            return _door
-
 def get_geometry_at_point(row, col, target, walls, floors, ceilings, wall_mask):
 
     if wall_mask[row][col] & 1:
@@ -532,35 +443,53 @@ def get_geometry_at_point(row, col, target, walls, floors, ceilings, wall_mask):
         make_ceiling(row, col, ceilings[row][col] - 1, target)
 
 def classify_edges(edges):
+    """
+        Join each edge to the first edge which starts beside its
+        end, and mark whether the corner between them is convex.
+    """
 
-    for _edge in edges:
+    count = len(edges)
+    if count == 0:
+        return
 
-        if _edge.convex is not None:
+    #shift by one so the blocks around every end are on the grid
+    starts = np.array([_edge.point_a for _edge in edges]) + 1
+    ends = np.array([_edge.point_b for _edge in edges]) + 1
+    rows, cols = np.maximum(starts.max(axis = 0), ends.max(axis = 0)) + 2
+
+    #the two lowest edge ids starting on each block,
+    #one edge can't be its own partner so two is enough
+    start_blocks = starts[:, 0] * cols + starts[:, 1]
+    lowest = np.full((2, rows * cols), count)
+    remaining = np.arange(count)
+    for rank in range(2):
+        blocks, first = np.unique(start_blocks[remaining], return_index = True)
+        lowest[rank, blocks] = remaining[first]
+        remaining = np.delete(remaining, first)
+
+    candidates = []
+    for d_row in (-1, 0, 1):
+        for d_col in (-1, 0, 1):
+            blocks = (ends[:, 0] + d_row) * cols + ends[:, 1] + d_col
+            candidates.append(lowest[:, blocks])
+    candidates = np.concatenate(candidates)
+    candidates[candidates == np.arange(count)] = count
+    partners = candidates.min(axis = 0).tolist()
+
+    for _edge, partner in zip(edges, partners):
+
+        if _edge.convex is not None or partner == count:
             continue
 
-        for _edge2 in edges:
-
-            if _edge2 == _edge:
-                continue
-
-            row_check = abs(_edge.point_b[0] - _edge2.point_a[0]) <= 1
-            col_check = abs(_edge.point_b[1] - _edge2.point_a[1]) <= 1
-
-            if row_check and col_check:
-                convex = is_convex(_edge.type, _edge2.type)
+        _edge2 = edges[partner]
+        convex = is_convex(_edge.type, _edge2.type)
 
-                if _edge.convex is None:
-                    _edge.convex = convex
-                else:
-                    _edge.convex = _edge.convex and convex
+        _edge.convex = convex
 
-                if _edge2.convex is None:
-                    _edge2.convex = convex
-                else:
-                    _edge2.convex = _edge2.convex and convex
-                #print(f"Edge {_edge.id} connects to edge {_edge2.id}")
-                #print(f"convex: {convex}")
-                break
+        if _edge2.convex is None:
+            _edge2.convex = convex
+        else:
+            _edge2.convex = _edge2.convex and convex
 
 def is_convex(type_1, type_2):
 
@@ -1,31 +1,22 @@
 from config import *
 
-class Light:
+def make_light(position, color, strength, axis, radius, velocity):
     """
-        Represents a light in the scene
-    """
-
+        Create a new light, as a record of data_type_light
 
-    def __init__(self, position, color, strength, axis, radius, velocity):
-        """
-            Create a new plane
+        Parameters:
+            position (array [3,1])
+            color (array [3,1])
+            strength float
+    """
 
-            Parameters:
-                position (array [3,1])
-                color (array [3,1])
-                strength float
-        """
+    return (position, strength, color, position, radius, axis, velocity, 0)
 
-        self.position = np.array(position, dtype=np.float32)
-        self.color = np.array(color, dtype=np.float32)
-        self.strength = strength
-        self.t = 0
-        self.center = np.array(position, dtype=np.float32)
-        self.axis = np.array(axis, dtype=np.float32)
-        self.radius = radius
-        self.velocity = velocity
-    
-    def update(self, rate):
+def update_lights(lights, rate):
+    """
+        Move an array of lights along their axes of motion.
+    """
 
-        self.t += rate
-        self.position = self.center + self.radius * self.axis * np.sin(self.velocity * self.t)
\ No newline at end of file
+    lights['t'] += rate
+    offsets = lights['radius'] * np.sin(lights['velocity'] * lights['t'])
+    lights['position'] = lights['center'] + offsets[:, None] * lights['axis']
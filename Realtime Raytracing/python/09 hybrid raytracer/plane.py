@@ -1,30 +1,16 @@
 from config import *
 
-class Plane:
+def make_plane(normal, tangent, bitangent, uMin, uMax, vMin, vMax, center, material_index):
     """
-        Represents a plane in the scene
-    """
-
+        Create a new plane, as a record of data_type_plane
 
-    def __init__(self, normal, tangent, bitangent, uMin, uMax, vMin, vMax, center, material_index):
-        """
-            Create a new plane
-
-            Parameters:
-                normal (array [3,1])
-                tangent (array [3,1])
-                bitangent (array [3,1])
-                uMin,uMax,vMin,vMax (float) constraints, u: tangent, v: bitangent
-                center (array [3,1])
-                material_index int
-        """
+        Parameters:
+            normal (array [3,1])
+            tangent (array [3,1])
+            bitangent (array [3,1])
+            uMin,uMax,vMin,vMax (float) constraints, u: tangent, v: bitangent
+            center (array [3,1])
+            material_index int
+    """
 
-        self.normal = np.array(normal, dtype=np.float32)
-        self.tangent = np.array(tangent, dtype=np.float32)
-        self.bitangent = np.array(bitangent, dtype=np.float32)
-        self.uMin = uMin
-        self.uMax = uMax
-        self.vMin = vMin
-        self.vMax = vMax
-        self.center = np.array(center, dtype=np.float32)
-        self.material_index = material_index
\ No newline at end of file
+    return (center, tangent, bitangent, normal, uMin, uMax, vMin, vMax, material_index)
@@ -0,0 +1,111 @@
+from config import *
+
+#Portal visibility: rooms are only joined through doors, so the
+#camera's room is visible, then any room behind a door which
+#falls inside the view, then any room behind a door which falls
+#inside the part of the view that the first door let through,
+#and so on.
+#
+#The map is a grid of unit height, so the view is clipped as an
+#interval of angles around the camera's facing, on the xy plane.
+
+def link_doors(rooms):
+    """
+        Tell each door which rooms it joins.
+    """
+
+    for _room in rooms:
+        for _door in _room.doors:
+            if _room not in _door.rooms:
+                _door.rooms.append(_room)
+
+def wrap_angle(angle):
+    """
+        Bring an angle into [-pi, pi).
+    """
+
+    return (angle + np.pi) % (2 * np.pi) - np.pi
+
+def view_half_angle(camera, horizontal_extent = 1.0, vertical_extent = 0.75):
+    """
+        Half the angle the view covers on the xy plane. Screen
+        corners are at forwards +- horizontal_extent * right
+        +- vertical_extent * up, like in the ray tracing shader.
+        Looking up or down widens the view, until it's looking
+        steeply enough to see all the way around.
+    """
+
+    pitch = abs(np.deg2rad(camera.phi))
+    forwards = np.cos(pitch) - vertical_extent * np.sin(pitch)
+    if forwards <= 0:
+        return np.pi
+    return np.arctan2(horizontal_extent, forwards)
+
+def portal_interval(_door, x, y, facing):
+    """
+        The angles, relative to facing, covered by a door's cell
+        as seen from (x,y). Returns (low, high).
+    """
+
+    row, col = _door.coordinate
+    if col <= x <= col + 1 and row <= y <= row + 1:
+        return (-np.pi, np.pi)
+
+    #measure corners from the cell's centre direction, so the
+    #interval never wraps around
+    centre = np.arctan2(row + 0.5 - y, col + 0.5 - x)
+    low = high = 0.0
+    for corner_x, corner_y in ((col, row), (col + 1, row), (col, row + 1), (col + 1, row + 1)):
+        offset = wrap_angle(np.arctan2(corner_y - y, corner_x - x) - centre)
+        low = min(low, offset)
+        high = max(high, offset)
+
+    centre = wrap_angle(centre - facing)
+    return (centre + low, centre + high)
+
+def find_visible_rooms(start_room, camera, max_depth = 32):
+    """
+        Walk the portal graph outwards from the camera's room,
+        narrowing the view at each door.
+
+        Returns the visible rooms, the camera's room first.
+    """
+
+    x = camera.position[0]
+    y = camera.position[1]
+    facing = np.deg2rad(camera.theta)
+    half_angle = view_half_angle(camera)
+
+    visible = [start_room,]
+    #room, view interval, depth, the door we came through
+    to_visit = [(start_room, -half_angle, half_angle, 0, None),]
+
+    while len(to_visit) > 0:
+
+        _room, low, high, depth, entrance = to_visit.pop()
+
+        for _door in _room.doors:
+
+            if _door is entrance:
+                continue
+
+            portal_low, portal_high = portal_interval(_door, x, y, facing)
+            clipped_low = max(low, portal_low)
+            clipped_high = min(high, portal_high)
+            if clipped_low > clipped_high:
+                continue
+
+            for neighbour in _door.rooms:
+
+                if neighbour is _room:
+                    continue
+
+                if neighbour not in visible:
+                    visible.append(neighbour)
+
+                if depth < max_depth:
+                    to_visit.append(
+                        (neighbour, clipped_low, clipped_high, depth + 1, _door)
+                    )
+    
+    return visible
@@ -20,16 +20,19 @@ class Room:
     
     def add_light(self, light):
 
-        if light not in self.lights:
-            self.lights.append(light)
+        self.lights.append(light)
     
     def add_sphere(self, sphere):
 
-        if sphere not in self.spheres:
-            self.spheres.append(sphere)
+        self.spheres.append(sphere)
     
     def finalize(self):
 
+        #pack the objects into arrays, ready to copy to the gpu
+        self.planes = np.array(self.planes, dtype=data_type_plane)
+        self.spheres = np.array(self.spheres, dtype=data_type_sphere)
+        self.lights = np.array(self.lights, dtype=data_type_light)
+
         self.vertices = np.array(self.vertices, dtype=np.float32)
         self.vao = glGenVertexArrays(1)
         glBindVertexArray(self.vao)
@@ -5,6 +5,7 @@ import light
 import geometry
 import room
 import plane
+import portal
 
 class Scene:
     """
@@ -54,7 +55,7 @@ class Scene:
         #self.spheres = []
         
         self.spheres = [
-            sphere.Sphere(
+            sphere.make_sphere(
                 center = (2.5, 1.5, 0.3),
                 radius = 0.1,
                 color = (0.5, 1, 0.3),
@@ -63,7 +64,7 @@ class Scene:
                 radius_of_motion= 0.2,
                 velocity=0.1
             ),
-            sphere.Sphere(
+            sphere.make_sphere(
                 center = (3.35, 6.5, 0.1),
                 radius = 0.1,
                 color = (1, 0, 0),
@@ -72,7 +73,7 @@ class Scene:
                 radius_of_motion= 0,
                 velocity=0
             ),
-            sphere.Sphere(
+            sphere.make_sphere(
                 center = (3.5, 6.35, 0.1),
                 radius = 0.1,
                 color = (0, 1, 0),
@@ -81,7 +82,7 @@ class Scene:
                 radius_of_motion= 0,
                 velocity=0
             ),
-            sphere.Sphere(
+            sphere.make_sphere(
                 center = (3.65, 6.5, 0.1),
                 radius = 0.1,
                 color = (0, 0, 1),
@@ -90,7 +91,7 @@ class Scene:
                 radius_of_motion= 0,
                 velocity=0
             ),
-            sphere.Sphere(
+            sphere.make_sphere(
                 center = (3.5, 6.65, 0.1),
                 radius = 0.1,
                 color = (1, 0, 1),
@@ -99,7 +100,7 @@ class Scene:
                 radius_of_motion= 0,
                 velocity=0
             ),
-            sphere.Sphere(
+            sphere.make_sphere(
                 center = (3.5, 6.5, 0.225),
                 radius = 0.1,
                 color = (1, 1, 0),
@@ -112,7 +113,7 @@ class Scene:
         
 
         self.lights = [
-            light.Light(
+            light.make_light(
                 position = (3.5, 1.5, 0.7),
                 color = (0, 0.75, 1),
                 strength = 1,
@@ -120,7 +121,7 @@ class Scene:
                 radius = 1,
                 velocity = 0.05
             ),
-            light.Light(
+            light.make_light(
                 position = (4.5, 3.5, 0.1),
                 color = (1, 0, 0),
                 strength = 1,
@@ -128,7 +129,7 @@ class Scene:
                 radius = 0,
                 velocity = 0
             ),
-            light.Light(
+            light.make_light(
                 position = (2, 6, 0.5),
                 color = (0, 0, 1),
                 strength = 1,
@@ -136,7 +137,7 @@ class Scene:
                 radius = 1,
                 velocity = 0.025
             ),
-            light.Light(
+            light.make_light(
                 position = (5, 6, 0.5),
                 color = (1, 0, 0),
                 strength = 1,
@@ -199,6 +200,8 @@ class Scene:
                     self.wall_geometry, self.floor_geometry, self.ceiling_geometry, wall_mask
                 )
         
+        portal.link_doors(self.rooms)
+
         edges = geometry.get_edges(wall_mask)
         geometry.classify_edges(edges)
 
@@ -215,26 +218,40 @@ class Scene:
             print(f"Plane Count: {len(_room.planes)}")
         """
         
-        self.active_rooms = [self.rooms[0],]
+        self.set_active_rooms([self.rooms[0],])
+
+    def set_active_rooms(self, rooms):
+        """
+            Set the rooms to draw and trace, along with their doors.
+            A door between two active rooms is listed by both, so
+            the doors are gathered once each, in order.
+        """
+
+        self.active_rooms = rooms
+        self.active_doors = list(dict.fromkeys(
+            _door for _room in rooms for _door in _room.doors))
 
     def send_objects_to_rooms(self):
 
-        while len(self.lights) > 0:
+        lights = np.array(self.lights, dtype=data_type_light)
+        for _light in lights:
 
-            _light = self.lights.pop()
-            coordinate = (int(_light.position[1]), int(_light.position[0]))
+            coordinate = (int(_light['position'][1]), int(_light['position'][0]))
             _room = self.room_lookup[coordinate]
             _room.add_light(_light)
+        self.lights = lights[:0]
         
-        while len(self.spheres) > 0:
+        spheres = np.array(self.spheres, dtype=data_type_sphere)
+        for _sphere in spheres:
 
-            _sphere = self.spheres.pop()
-            coordinate = (int(_sphere.center[1]), int(_sphere.center[0]))
+            coordinate = (int(_sphere['center'][1]), int(_sphere['center'][0]))
             _room = self.room_lookup[coordinate]
             _room.add_sphere(_sphere)
+        self.spheres = spheres[:0]
     
     def finalize(self):
 
+        self.planes = np.array(self.planes, dtype=data_type_plane)
         self.vertices = np.array(self.vertices, dtype=np.float32)
         self.vao = glGenVertexArrays(1)
         glBindVertexArray(self.vao)
@@ -310,17 +327,16 @@ class Scene:
         row = int(self.camera.position[1])
         col = int(self.camera.position[0])
         coordinate = (row,col)
-        
-        self.active_rooms = []
 
-        for room in self.rooms:
-            if coordinate in room.internalCoordinates:
-                self.active_rooms.append(room)
+        if coordinate in self.room_lookup:
+            self.set_active_rooms(portal.find_visible_rooms(
+                self.room_lookup[coordinate], self.camera
+            ))
+
+        for room in self.active_rooms:
+            
+            light.update_lights(room.lights, rate)
             
-                for _light in room.lights:
-                    _light.update(rate)
-                
-                for _sphere in room.spheres:
-                    _sphere.update(rate)
+            sphere.update_spheres(room.spheres, rate)
         
         self.outDated = True
\ No newline at end of file
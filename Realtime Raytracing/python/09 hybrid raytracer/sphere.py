@@ -1,31 +1,22 @@
 from config import *
 
-class Sphere:
-    """
-        Represents a sphere in the scene
+def make_sphere(center, radius, color, roughness, axis, radius_of_motion, velocity):
     """
+        Create a new sphere, as a record of data_type_sphere
 
-    def __init__(self, center, radius, color, roughness, axis, radius_of_motion, velocity):
-        """
-            Create a new sphere
+        Parameters:
+            center (array [3,1])
+            radius (float)
+            color (array [3,1])
+    """
 
-            Parameters:
-                center (array [3,1])
-                radius (float)
-                color (array [3,1])
-        """
+    return (center, radius, color, roughness, center, radius_of_motion, axis, velocity, 0)
 
-        self.center = np.array(center,dtype=np.float32)
-        self.radius = radius
-        self.color = np.array(color, dtype=np.float32)
-        self.roughness = roughness
-        self.t = 0
-        self.center_of_motion = np.array(center, dtype=np.float32)
-        self.axis = np.array(axis, dtype=np.float32)
-        self.radius_of_motion = radius_of_motion
-        self.velocity = velocity
-    
-    def update(self, rate):
+def update_spheres(spheres, rate):
+    """
+        Move an array of spheres along their axes of motion.
+    """
 
-        self.t += rate
-        self.center = self.center_of_motion + self.radius_of_motion * self.axis * np.sin(self.velocity * self.t)
\ No newline at end of file
+    spheres['t'] += rate
+    offsets = spheres['radius_of_motion'] * np.sin(spheres['velocity'] * spheres['t'])
+    spheres['center'] = spheres['center_of_motion'] + offsets[:, None] * spheres['axis']
@@ -11,6 +11,8 @@ class App:
 
         self.screenWidth = 800
         self.screenHeight = 600
+        #draw many copies of a few clusters, under a two level bvh
+        self.instanced = False
 
         self.set_up_glfw()
 
@@ -49,7 +51,10 @@ class App:
             Make everything needed by the program.
         """
 
-        self.scene = scene.Scene()
+        if self.instanced:
+            self.scene = scene.InstancedScene()
+        else:
+            self.scene = scene.Scene()
         self.graphicsEngine = engine.Engine(self.screenWidth, self.screenHeight, self.scene)
     
     def set_up_input_systems(self) -> None:
@@ -67,6 +72,7 @@ class App:
             self.screenWidth // 2, 
             self.screenHeight // 2
         )
+        glfw.set_key_callback(self.window, self.handleKeyPress)
 
         self.walk_offset_lookup = {
             1: 0,
@@ -150,6 +156,21 @@ class App:
             dy = -0.1 * rate * np.sin(angle)
             self.scene.move_player(dx, dy)
     
+    def handleKeyPress(self, window, key, scancode, action, mods) -> None:
+        """
+            Handle one-off key presses, P pauses the spheres
+            and T saves a profiling trace.
+        """
+
+        if action != GLFW_CONSTANTS.GLFW_PRESS:
+            return
+
+        if key == GLFW_CONSTANTS.GLFW_KEY_P:
+            self.scene.animate = not self.scene.animate
+        elif key == GLFW_CONSTANTS.GLFW_KEY_T:
+            self.graphicsEngine.profiler.exportTrace("trace.json")
+            print("Saved profile to trace.json, open it in chrome://tracing")
+    
     def handleMouse(self) -> None:
         """
             Handle mouse movement.
@@ -172,11 +193,16 @@ class App:
         delta = self.currentTime - self.lastTime
         if (delta >= 1):
             framerate = int(self.graphicsEngine.numFrames/delta)
-            glfw.set_window_title(self.window, f"Running at {framerate} fps.")
+            bvh_quality = self.scene.scheduler.latest().get("cost_ratio", 1.0)
+            upload_kb = self.graphicsEngine.bytesUploaded / max(1, self.graphicsEngine.numFrames) / 1024
+            glfw.set_window_title(self.window, 
+                f"Running at {framerate} fps, bvh cost x{bvh_quality:.2f}, "
+                f"uploading {upload_kb:.1f} kB/frame, "
+                f"render scale {self.graphicsEngine.renderScale:.2f}.")
+            self.graphicsEngine.bytesUploaded = 0
             self.lastTime = self.currentTime
             self.graphicsEngine.numFrames = 0
             self.frameTime = float(1000.0 / max(60,framerate))
-            self.graphicsEngine.adaptResolution(framerate)
         self.graphicsEngine.numFrames += 1
 
     def quit(self) -> None:
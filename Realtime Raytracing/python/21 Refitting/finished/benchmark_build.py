@@ -0,0 +1,64 @@
+from config import *
+import sphere
+import node
+import bvh_backend
+
+#---- BVH Build Scaling              ----#
+# Times the parallel builder over scene  #
+# sizes and thread counts. The serial    #
+# builder is timed too, while it's still #
+# bearable.                              #
+#----------------------------------------#
+
+sceneSizes = (10_000, 100_000, 1_000_000)
+serialLimit = 100_000
+materialCount = 16
+
+def time_build(build, spheres: np.ndarray, repeats: int = 3) -> float:
+    """
+        Returns the best of a few builds, in milliseconds.
+    """
+
+    sphere_count = len(spheres)
+    nodes = node.make_nodes(2 * sphere_count + 1)
+    best = 1e30
+    for _ in range(repeats):
+        sphere_ids = np.arange(sphere_count, dtype=np.int32)
+        start = time.perf_counter()
+        build(nodes, spheres, sphere_ids, sphere_count)
+        best = min(best, time.perf_counter() - start)
+
+    return 1000 * best
+
+if __name__ == "__main__":
+
+    max_threads = numba.config.NUMBA_NUM_THREADS
+    thread_counts = [1]
+    while thread_counts[-1] * 2 <= max_threads:
+        thread_counts.append(thread_counts[-1] * 2)
+    if thread_counts[-1] != max_threads:
+        thread_counts.append(max_threads)
+
+    #compile everything before timing
+    warmup = sphere.make_spheres(100, materialCount)
+    time_build(bvh_backend.build_bvh_parallel, warmup, repeats = 1)
+    time_build(bvh_backend.build_bvh, warmup, repeats = 1)
+
+    for sphere_count in sceneSizes:
+
+        np.random.seed(0)
+        spheres = sphere.make_spheres(sphere_count, materialCount)
+        print(f"---- {sphere_count} spheres ----")
+
+        if sphere_count <= serialLimit:
+            ms = time_build(bvh_backend.build_bvh, spheres, repeats = 1)
+            print(f"\tserial build: {ms:.1f} ms")
+
+        baseline = None
+        for thread_count in thread_counts:
+            numba.set_num_threads(thread_count)
+            ms = time_build(bvh_backend.build_bvh_parallel, spheres)
+            if baseline is None:
+                baseline = ms
+            print(f"\t{thread_count} threads: {ms:.1f} ms, "
+                  f"speedup {baseline / ms:.2f}x")
@@ -0,0 +1,69 @@
+from config import *
+import types
+import sphere
+import node
+import camera
+import bvh_backend
+import bvh_scheduler
+import cpu_tracer
+
+#---- Builder Trade-offs             ----#
+# Build time against trace cost for the  #
+# SAH, morton and hybrid builders. Trace #
+# cost is given both as the tree's SAH   #
+# cost and as measured cpu rays/second.  #
+#----------------------------------------#
+
+sceneSizes = (10_000, 100_000, 1_000_000)
+materialCount = 16
+imageWidth = 160
+imageHeight = 120
+
+builders = {
+    "sah": lambda nodes, spheres, ids, count:
+        bvh_backend.build_bvh_parallel(nodes, spheres, ids, count),
+    "lbvh": lambda nodes, spheres, ids, count:
+        bvh_backend.build_lbvh(nodes, spheres, ids, count),
+    "hybrid": lambda nodes, spheres, ids, count:
+        bvh_backend.build_lbvh(nodes, spheres, ids, count, sah_below = 256),
+}
+
+if __name__ == "__main__":
+
+    materials = np.zeros(materialCount, dtype = data_type_material)
+    materials['r'] = 1.0
+    materials['g'] = 1.0
+    materials['b'] = 1.0
+    materials['reflectance'] = 0.5
+    materials['eta'] = 0.7
+    sky = cpu_tracer.load_sky("gfx/sky")
+
+    for sphere_count in sceneSizes:
+
+        np.random.seed(0)
+        spheres = sphere.make_spheres(sphere_count, materialCount)
+        nodes = node.make_nodes(2 * sphere_count + 1)
+        scheduler = bvh_scheduler.RebuildScheduler(len(nodes))
+        print(f"---- {sphere_count} spheres ----")
+
+        for name, build in builders.items():
+
+            #once to compile, once to time
+            for _ in range(2):
+                sphere_ids = np.arange(sphere_count, dtype = np.int32)
+                start = time.perf_counter()
+                nodes_used = build(nodes, spheres, sphere_ids, sphere_count)
+                build_ms = 1000 * (time.perf_counter() - start)
+
+            cost = scheduler.measure(nodes, nodes_used)
+
+            _scene = types.SimpleNamespace(
+                nodes = nodes, spheres = spheres, sphere_ids = sphere_ids,
+                materials = materials,
+                camera = camera.Camera(position = [0.0, 0.0, 1.0]))
+            cpu_tracer.render(_scene, imageWidth, imageHeight, sky)
+            _, stats = cpu_tracer.render(_scene, imageWidth, imageHeight, sky)
+
+            print(f"\t{name}: build {build_ms:.1f} ms, {nodes_used} nodes, "
+                  f"SAH cost {cost:.4g}, "
+                  f"{stats['rays_per_second'] / 1e6:.2f} million rays/s")
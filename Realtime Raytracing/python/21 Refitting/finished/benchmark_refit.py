@@ -0,0 +1,61 @@
+from config import *
+import sphere
+import node
+import bvh_backend
+
+#---- Refit Comparison               ----#
+# The reverse index order refit against  #
+# the level at a time refits, on the     #
+# same tree in both layouts.             #
+#----------------------------------------#
+
+sceneSizes = (3_000, 100_000, 1_000_000)
+materialCount = 16
+repeats = 10
+
+def time_refit(refit, nodes: np.ndarray, spheres: np.ndarray,
+    sphere_ids: np.ndarray, layout) -> float:
+    """
+        Returns the best refit time, in milliseconds.
+    """
+
+    refit(nodes, spheres, sphere_ids, layout)
+    best = 1e30
+    for _ in range(repeats):
+        sphere.update_spheres(spheres, 0.1)
+        start = time.perf_counter()
+        refit(nodes, spheres, sphere_ids, layout)
+        best = min(best, time.perf_counter() - start)
+
+    return 1000 * best
+
+if __name__ == "__main__":
+
+    print(f"{numba.get_num_threads()} threads")
+
+    for sphere_count in sceneSizes:
+
+        np.random.seed(0)
+        spheres = sphere.make_spheres(sphere_count, materialCount)
+        sphere_ids = np.arange(sphere_count, dtype = np.int32)
+        depth_first = node.make_nodes(2 * sphere_count + 1)
+        nodes_used = bvh_backend.build_bvh_parallel(
+            depth_first, spheres, sphere_ids, sphere_count)
+
+        by_level = depth_first.copy()
+        level_offsets = bvh_backend.order_by_level(by_level, nodes_used)
+
+        print(f"---- {sphere_count} spheres, {nodes_used} nodes, "
+              f"{len(level_offsets) - 1} levels ----")
+
+        ms = time_refit(bvh_backend.refit_bvh,
+            depth_first, spheres, sphere_ids, nodes_used)
+        print(f"\trefit_bvh: {ms:.3f} ms")
+
+        ms = time_refit(bvh_backend.refit_bvh_levels,
+            by_level, spheres, sphere_ids, level_offsets)
+        print(f"\trefit_bvh_levels: {ms:.3f} ms")
+
+        ms = time_refit(bvh_backend.refit_bvh_levels_numpy,
+            by_level, spheres, sphere_ids, level_offsets)
+        print(f"\trefit_bvh_levels_numpy: {ms:.3f} ms")
@@ -0,0 +1,103 @@
+from config import *
+import types
+import sphere
+import materials
+import node
+import camera
+import bvh_backend
+import cpu_tracer
+
+#---- Scene Size Sweep               ----#
+# Times each stage of getting a scene on #
+# screen: generating the spheres, then   #
+# building their bvh, then rendering the #
+# first frame (on the cpu). The old one  #
+# sphere at a time generator is timed    #
+# too, while it's still bearable.        #
+#----------------------------------------#
+
+sceneSizes = (10_000, 100_000, 1_000_000)
+loopLimit = 100_000
+materialCount = 16
+imageWidth = 320
+imageHeight = 240
+seed = 0
+
+def make_spheres_loop(count: int, material_count: int) -> np.ndarray:
+    """
+        The old generator, one tuple at a time, for comparison.
+    """
+
+    spheres = []
+    for _ in range(count):
+        x = np.random.uniform(low = -95.0, high = 95.0)
+        y = np.random.uniform(low = -95.0, high = 95.0)
+        z = np.random.uniform(low = -15.0, high = 15.0)
+        radius = np.random.uniform(low = 0.3, high = 2.0)
+        vx = np.random.uniform(low = -1.0, high = 1.0)
+        vy = np.random.uniform(low = -1.0, high = 1.0)
+        vz = np.random.uniform(low = -1.0, high = 1.0)
+        material = np.random.randint(low = 0, high = material_count)
+        spheres.append((x,y,z,radius,vx,vy,vz,material))
+
+    return np.array(spheres, dtype=data_type_sphere)
+
+def make_scene(sphere_count: int) -> tuple[types.SimpleNamespace, dict[str, float]]:
+    """
+        Generate and build a scene, timing each stage.
+
+        Returns the scene (as much of one as the cpu tracer
+        needs) and the timings, in milliseconds.
+    """
+
+    timings = {}
+    rng = make_generator(seed)
+
+    start = time.perf_counter()
+    _materials = materials.make_materials(materialCount, rng)
+    spheres = sphere.make_spheres(sphere_count, materialCount, rng)
+    timings["generate"] = 1000 * (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    nodes = node.make_nodes(2 * sphere_count + 1)
+    sphere_ids = np.arange(sphere_count, dtype = np.int32)
+    bvh_backend.build_bvh_parallel(nodes, spheres, sphere_ids, sphere_count)
+    timings["build"] = 1000 * (time.perf_counter() - start)
+
+    eye = camera.Camera(position = [0.0, 0.0, 1.0])
+    _scene = types.SimpleNamespace(
+        spheres = spheres, materials = _materials, nodes = nodes,
+        sphere_ids = sphere_ids, camera = eye)
+
+    return _scene, timings
+
+if __name__ == "__main__":
+
+    sky = cpu_tracer.load_sky("gfx/sky")
+
+    #compile everything before timing
+    warmup, _ = make_scene(100)
+    cpu_tracer.render(warmup, 16, 16, sky)
+
+    #same seed, same scene
+    first, _ = make_scene(1000)
+    second, _ = make_scene(1000)
+    assert np.array_equal(first.spheres, second.spheres)
+
+    for sphere_count in sceneSizes:
+
+        print(f"---- {sphere_count} spheres ----")
+
+        if sphere_count <= loopLimit:
+            start = time.perf_counter()
+            make_spheres_loop(sphere_count, materialCount)
+            ms = 1000 * (time.perf_counter() - start)
+            print(f"\tgenerate (loop): {ms:.1f} ms")
+
+        _scene, timings = make_scene(sphere_count)
+        _, stats = cpu_tracer.render(_scene, imageWidth, imageHeight, sky)
+        timings["first frame"] = 1000 * stats["seconds"]
+
+        for stage, ms in timings.items():
+            print(f"\t{stage}: {ms:.1f} ms")
+        print(f"\ttotal: {sum(timings.values()):.1f} ms")
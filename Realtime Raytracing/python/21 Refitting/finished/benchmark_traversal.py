@@ -0,0 +1,91 @@
+from config import *
+import engine
+import scene
+
+#---- Traversal Modes                ----#
+# Renders a few still scenes with each   #
+# way the shader can walk the bvh, and   #
+# reports the gpu time of the trace      #
+# pass. Needs an OpenGL 4.3 context, the #
+# window is kept hidden.                 #
+#----------------------------------------#
+
+screenWidth = 800
+screenHeight = 600
+warmupFrames = 20
+frameCount = 100
+
+#(name, bvh width, traversal)
+modes = (
+    ("binary, per ray", 2, "ray"),
+    ("4 wide, per ray", 4, "ray"),
+    ("binary, packets", 2, "packet"),
+)
+
+def make_scenes() -> list[tuple[str, scene.Scene]]:
+    """
+        The scene set, built fresh for each mode.
+    """
+
+    return [
+        ("3k spheres", scene.Scene(sphere_count = 3_000)),
+        ("100k spheres", scene.Scene(sphere_count = 100_000)),
+        ("instanced", scene.InstancedScene()),
+    ]
+
+def time_trace(graphicsEngine: engine.Engine, _scene: scene.Scene) -> float:
+    """
+        Returns the median gpu time (ms) of the trace pass.
+    """
+
+    for _ in range(warmupFrames + frameCount):
+        graphicsEngine.renderScene(_scene)
+    glFinish()
+    graphicsEngine.profiler.collect()
+
+    times = [event["dur"] / 1000 for event in graphicsEngine.profiler.events
+             if event["cat"] == "gpu" and event["name"] == "trace"
+             and event["args"]["frame"] >= warmupFrames]
+    return float(np.median(times))
+
+if __name__ == "__main__":
+
+    glfw.init()
+    glfw.window_hint(GLFW_CONSTANTS.GLFW_CONTEXT_VERSION_MAJOR,4)
+    glfw.window_hint(GLFW_CONSTANTS.GLFW_CONTEXT_VERSION_MINOR,3)
+    glfw.window_hint(
+        GLFW_CONSTANTS.GLFW_OPENGL_PROFILE,
+        GLFW_CONSTANTS.GLFW_OPENGL_CORE_PROFILE
+    )
+    glfw.window_hint(
+        GLFW_CONSTANTS.GLFW_OPENGL_FORWARD_COMPAT,
+        GLFW_CONSTANTS.GLFW_TRUE
+    )
+    glfw.window_hint(GLFW_CONSTANTS.GLFW_VISIBLE, False)
+    window = glfw.create_window(screenWidth, screenHeight, "Benchmark", None, None)
+    glfw.make_context_current(window)
+
+    results: dict[str, dict[str, float]] = {}
+    for name, width, traversal in modes:
+        for sceneName, _scene in make_scenes():
+
+            #hold everything still, at full resolution
+            _scene.animate = False
+            if not _scene.instanced:
+                _scene.bvh_width = width
+            graphicsEngine = engine.Engine(
+                screenWidth, screenHeight, _scene, traversal = traversal)
+            graphicsEngine.logResolution = False
+            graphicsEngine.resolutionController.minScale = 1.0
+
+            ms = time_trace(graphicsEngine, _scene)
+            results.setdefault(sceneName, {})[name] = ms
+            graphicsEngine.profiler.destroy()
+
+    for sceneName, times in results.items():
+        print(f"---- {sceneName} ----")
+        baseline = times[modes[0][0]]
+        for name, ms in times.items():
+            print(f"\t{name}: {ms:.2f} ms (x{baseline / ms:.2f})")
+
+    glfw.terminate()
@@ -0,0 +1,82 @@
+from config import *
+import sys
+import node
+import camera
+import triangle
+import bvh_backend
+import bvh_scheduler
+import cpu_tracer
+
+#---- Triangle Meshes                ----#
+# Builds, refits and renders a mesh with #
+# the same backend as the spheres. Pass  #
+# an obj file to use it instead of the   #
+# generated terrain.                     #
+#----------------------------------------#
+
+terrainSize = 256
+materialCount = 1
+imageWidth = 320
+imageHeight = 240
+
+builders = {
+    "sah": lambda nodes, triangles, ids, count:
+        bvh_backend.build_bvh_parallel(nodes, triangles, ids, count),
+    "lbvh": lambda nodes, triangles, ids, count:
+        bvh_backend.build_lbvh(nodes, triangles, ids, count),
+}
+
+if __name__ == "__main__":
+
+    if len(sys.argv) > 1:
+        start = time.perf_counter()
+        triangles = triangle.load_obj(sys.argv[1])
+        print(f"loaded {sys.argv[1]} in "
+              f"{1000 * (time.perf_counter() - start):.1f} ms")
+    else:
+        triangles = triangle.make_terrain(terrainSize)
+    triangle_count = len(triangles)
+
+    materials = np.zeros(materialCount, dtype = data_type_material)
+    materials['r'] = 0.8
+    materials['g'] = 0.7
+    materials['b'] = 0.5
+    sky = cpu_tracer.load_sky("gfx/sky")
+
+    bounds = bvh_backend.primitive_bounds(triangles)
+    extent = bounds['max_x'].max() - bounds['min_x'].min()
+    eye = camera.Camera(position = [
+        bounds['min_x'].min() - 0.5 * extent, bounds['y'].mean(),
+        bounds['max_z'].max() + 0.25 * extent])
+    eye.phi = -20
+    eye.recalculateVectors()
+
+    nodes = node.make_nodes(2 * triangle_count + 1)
+    scheduler = bvh_scheduler.RebuildScheduler(len(nodes))
+    print(f"---- {triangle_count} triangles ----")
+
+    for name, build in builders.items():
+
+        #once to compile, once to time
+        for _ in range(2):
+            triangle_ids = np.arange(triangle_count, dtype = np.int32)
+            start = time.perf_counter()
+            nodes_used = build(nodes, triangles, triangle_ids, triangle_count)
+            build_ms = 1000 * (time.perf_counter() - start)
+
+        bvh_backend.refit_bvh(nodes, triangles, triangle_ids, nodes_used)
+        start = time.perf_counter()
+        bvh_backend.refit_bvh(nodes, triangles, triangle_ids, nodes_used)
+        refit_ms = 1000 * (time.perf_counter() - start)
+
+        cost = scheduler.measure(nodes, nodes_used)
+
+        cpu_tracer.render_mesh(nodes, triangles, triangle_ids, materials,
+            eye, imageWidth, imageHeight, sky)
+        image, stats = cpu_tracer.render_mesh(nodes, triangles, triangle_ids,
+            materials, eye, imageWidth, imageHeight, sky)
+        cpu_tracer.save_image(image, f"triangles_{name}.png")
+
+        print(f"\t{name}: build {build_ms:.1f} ms, refit {refit_ms:.1f} ms, "
+              f"{nodes_used} nodes, SAH cost {cost:.4g}, "
+              f"{stats['rays_per_second'] / 1e6:.2f} million rays/s")
@@ -0,0 +1,127 @@
+from config import *
+import sphere
+import node
+import camera
+import bvh_backend
+import cpu_tracer
+
+#---- Wide BVH                       ----#
+# Casts the same primary rays through    #
+# the binary tree and its 4 and 8 wide   #
+# collapses, checks they agree and times #
+# them. Also reports how deep each tree  #
+# goes, so the shader's stack can be     #
+# sized to match.                        #
+#----------------------------------------#
+
+sceneSizes = (3_000, 100_000, 1_000_000)
+widths = (4, 8)
+materialCount = 16
+imageWidth = 640
+imageHeight = 480
+#the stack the shader used to have
+oldStackSize = 12
+
+@njit(cache = True, parallel = True)
+def cast_rays(nodes: np.ndarray, spheres: np.ndarray, sphere_ids: np.ndarray,
+    position: np.ndarray, forwards: np.ndarray, right: np.ndarray, up: np.ndarray,
+    distances: np.ndarray) -> None:
+    """
+        Write the distance to the first hit of each pixel's
+        primary ray, through a binary bvh.
+    """
+
+    height, width = distances.shape
+    for y in prange(height):
+        stack = np.empty(cpu_tracer.NODE_STACK_SIZE, dtype = np.int32)
+        vertical = (y * 2.0 - height) / width
+        for x in range(width):
+            horizontal = (x * 2.0 - width) / width
+            d_x = forwards[0] + horizontal * right[0] + vertical * up[0]
+            d_y = forwards[1] + horizontal * right[1] + vertical * up[1]
+            d_z = forwards[2] + horizontal * right[2] + vertical * up[2]
+            hit, t, _, _ = cpu_tracer.trace(nodes, spheres, sphere_ids,
+                position[0], position[1], position[2], d_x, d_y, d_z, stack)
+            distances[y, x] = t if hit else -1.0
+
+@njit(cache = True, parallel = True)
+def cast_rays_wide(wide_nodes: np.ndarray, spheres: np.ndarray, sphere_ids: np.ndarray,
+    position: np.ndarray, forwards: np.ndarray, right: np.ndarray, up: np.ndarray,
+    distances: np.ndarray) -> None:
+    """
+        cast_rays, through a wide bvh.
+    """
+
+    height, width = distances.shape
+    for y in prange(height):
+        stack = np.empty(cpu_tracer.NODE_STACK_SIZE, dtype = np.int32)
+        vertical = (y * 2.0 - height) / width
+        for x in range(width):
+            horizontal = (x * 2.0 - width) / width
+            d_x = forwards[0] + horizontal * right[0] + vertical * up[0]
+            d_y = forwards[1] + horizontal * right[1] + vertical * up[1]
+            d_z = forwards[2] + horizontal * right[2] + vertical * up[2]
+            hit, t, _, _ = cpu_tracer.trace_wide(wide_nodes, spheres, sphere_ids,
+                position[0], position[1], position[2], d_x, d_y, d_z, stack)
+            distances[y, x] = t if hit else -1.0
+
+def time_rays(cast, tree: np.ndarray, spheres: np.ndarray, sphere_ids: np.ndarray,
+    eye: camera.Camera, repeats: int = 3) -> tuple[float, np.ndarray]:
+    """
+        Returns the best time of a few casts (ms), and the hit
+        distances.
+    """
+
+    distances = np.zeros((imageHeight, imageWidth), dtype = np.float32)
+    up = (imageHeight / imageWidth * eye.up).astype(np.float32)
+    best = 1e30
+    for _ in range(repeats):
+        start = time.perf_counter()
+        cast(tree, spheres, sphere_ids, eye.position, eye.forwards,
+            eye.right, up, distances)
+        best = min(best, time.perf_counter() - start)
+
+    return (1000 * best, distances)
+
+if __name__ == "__main__":
+
+    eye = camera.Camera(position = [0.0, 0.0, 1.0])
+
+    for sphere_count in sceneSizes:
+
+        np.random.seed(0)
+        spheres = sphere.make_spheres(sphere_count, materialCount)
+        nodes = node.make_nodes(2 * sphere_count + 1)
+        sphere_ids = np.arange(sphere_count, dtype = np.int32)
+        bvh_backend.build_bvh_parallel(nodes, spheres, sphere_ids, sphere_count)
+        depth = bvh_backend.bvh_depth(nodes)
+        ray_count = imageWidth * imageHeight
+
+        print(f"---- {sphere_count} spheres ----")
+        ms, reference = time_rays(cast_rays, nodes, spheres, sphere_ids, eye)
+        overflow = " (overflowed the old stack)" if depth > oldStackSize else ""
+        print(f"\tbinary: depth {depth}{overflow}, "
+              f"{ray_count / ms / 1000:.2f} million rays/s")
+
+        for width in widths:
+
+            wide_nodes, sources = bvh_backend.make_wide_nodes(nodes, width)
+            #once to compile
+            bvh_backend.refit_wide_bvh(nodes, wide_nodes, sources,
+                bvh_backend.collapse_bvh(nodes, wide_nodes, sources))
+            start = time.perf_counter()
+            wide_count = bvh_backend.collapse_bvh(nodes, wide_nodes, sources)
+            collapse_ms = 1000 * (time.perf_counter() - start)
+            start = time.perf_counter()
+            bvh_backend.refit_wide_bvh(nodes, wide_nodes, sources, wide_count)
+            refit_ms = 1000 * (time.perf_counter() - start)
+            wide_depth = bvh_backend.wide_bvh_depth(wide_nodes, wide_count)
+
+            ms, distances = time_rays(cast_rays_wide, wide_nodes, spheres, sphere_ids, eye)
+            mismatches = np.count_nonzero(np.abs(distances - reference) > 1e-3)
+
+            print(f"\t{width} wide: {wide_count} nodes, depth {wide_depth} "
+                  f"(stack {(width - 1) * wide_depth}), "
+                  f"collapse {collapse_ms:.1f} ms, refit {refit_ms:.1f} ms, "
+                  f"{ray_count / ms / 1000:.2f} million rays/s, "
+                  f"{mismatches} pixels differ")
@@ -1,37 +1,175 @@
 from config import *
+import ctypes
 
 class Buffer:
+    """
+        A storage buffer with a copy in host memory. Only the
+        blocks of the host copy that have changed are uploaded.
 
-    def __init__(self, size: int, binding: int, dtype: np.dtype):
+        In persistent mode the buffer is mapped once and split
+        into a ring of regions, each a full copy of the data.
+        Each frame writes the next region while the gpu may still
+        be reading the others, with fences to stop us lapping it.
+    """
+
+    blockSize = 4096
+
+    def __init__(self, size: int, binding: int, dtype: np.dtype,
+        persistent: bool = False, ringSize: int = 3):
 
         self.size = size
         self.binding = binding
+        self.persistent = persistent
 
         self.hostMemory = np.zeros(size, dtype=dtype)
+        self.nbytes = self.hostMemory.nbytes
+        self.itemsPerBlock = max(1, self.blockSize // self.hostMemory.itemsize)
+        blockCount = (size + self.itemsPerBlock - 1) // self.itemsPerBlock
+
+        self.ringSize = ringSize if persistent else 1
+        #the blocks each region is missing
+        self.dirtyBlocks = np.ones((self.ringSize, blockCount), dtype=bool)
+        self.region = 0
+        self.fences = [None] * self.ringSize
+        self.bytesUploaded = 0
+
+        #regions have to start on the binding alignment
+        alignment = int(glGetIntegerv(GL_SHADER_STORAGE_BUFFER_OFFSET_ALIGNMENT))
+        self.stride = (self.nbytes + alignment - 1) // alignment * alignment
 
         self.deviceMemory = glGenBuffers(1)
         glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.deviceMemory)
-        glBufferStorage(
-            GL_SHADER_STORAGE_BUFFER, self.hostMemory.nbytes, 
-            self.hostMemory, GL_DYNAMIC_STORAGE_BIT)
-        glBindBufferBase(GL_SHADER_STORAGE_BUFFER, binding, self.deviceMemory)
-    
+
+        if persistent:
+            flags = GL_MAP_WRITE_BIT | GL_MAP_PERSISTENT_BIT | GL_MAP_COHERENT_BIT
+            glBufferStorage(
+                GL_SHADER_STORAGE_BUFFER, self.ringSize * self.stride, None, flags)
+            address = glMapBufferRange(
+                GL_SHADER_STORAGE_BUFFER, 0, self.ringSize * self.stride, flags)
+            self.mappedMemory = np.frombuffer(
+                (ctypes.c_byte * (self.ringSize * self.stride)).from_address(address),
+                dtype=np.uint8).reshape(self.ringSize, self.stride)
+        else:
+            glBufferStorage(
+                GL_SHADER_STORAGE_BUFFER, self.nbytes,
+                self.hostMemory, GL_DYNAMIC_STORAGE_BIT)
+            self.dirtyBlocks[:] = False
+
+        self.bind()
+
     def blit(self, data: np.ndarray) -> None:
+        """
+            Copy data into the host memory, noting which blocks
+            actually changed.
+        """
 
+        itemsize = self.hostMemory.itemsize
+        old = self.hostMemory.view(np.uint8).reshape(self.size, itemsize)
+        new = np.ascontiguousarray(data).view(np.uint8).reshape(self.size, itemsize)
+        changed = (old != new).any(axis=1)
+        padding = self.dirtyBlocks.shape[1] * self.itemsPerBlock - self.size
+        changed = np.pad(changed, (0, padding)).reshape(-1, self.itemsPerBlock).any(axis=1)
+
+        self.dirtyBlocks |= changed
         self.hostMemory[:] = data[:]
-    
+
+    def markDirty(self, first: int, count: int) -> None:
+        """
+            Flag elements which were written to hostMemory directly.
+        """
+
+        firstBlock = first // self.itemsPerBlock
+        lastBlock = (first + count + self.itemsPerBlock - 1) // self.itemsPerBlock
+        self.dirtyBlocks[:, firstBlock:lastBlock] = True
+
+    def dirtyRanges(self, region: int) -> list[tuple[int, int]]:
+        """
+            Runs of dirty blocks in a region, as (first, last)
+            byte offsets.
+        """
+
+        dirty = np.concatenate(([False], self.dirtyBlocks[region], [False]))
+        edges = np.flatnonzero(dirty[1:] != dirty[:-1])
+        blockBytes = self.itemsPerBlock * self.hostMemory.itemsize
+
+        return [(int(first) * blockBytes, min(int(last) * blockBytes, self.nbytes))
+                for first, last in zip(edges[::2], edges[1::2])]
+
     def readFrom(self) -> None:
         """
             Upload the CPU data to the buffer, then arm it for reading.
         """
 
-        glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.deviceMemory)
-        glBufferSubData(GL_SHADER_STORAGE_BUFFER, 0, self.hostMemory.nbytes, self.hostMemory)
-        glBindBufferBase(GL_SHADER_STORAGE_BUFFER, self.binding, self.deviceMemory)
-    
+        if self.persistent:
+            #move on to the next region, once the gpu is done with it
+            self.region = (self.region + 1) % self.ringSize
+            self.waitFor(self.region)
+            hostBytes = self.hostMemory.view(np.uint8)
+            for first, last in self.dirtyRanges(self.region):
+                self.mappedMemory[self.region, first:last] = hostBytes[first:last]
+                self.bytesUploaded += last - first
+        else:
+            glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.deviceMemory)
+            hostBytes = self.hostMemory.view(np.uint8)
+            for first, last in self.dirtyRanges(0):
+                glBufferSubData(GL_SHADER_STORAGE_BUFFER, first, last - first, hostBytes[first:last])
+                self.bytesUploaded += last - first
+
+        self.dirtyBlocks[self.region] = False
+        self.bind()
+
+    def bind(self) -> None:
+        """
+            Point the shader's binding at the current region.
+        """
+
+        glBindBufferRange(
+            GL_SHADER_STORAGE_BUFFER, self.binding, self.deviceMemory,
+            self.region * self.stride, self.nbytes)
+
+    def fence(self) -> None:
+        """
+            Call after any draw or dispatch which reads the buffer,
+            so the region it read isn't overwritten too early.
+        """
+
+        if not self.persistent:
+            return
+
+        if self.fences[self.region] is not None:
+            glDeleteSync(self.fences[self.region])
+        self.fences[self.region] = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+
+    def waitFor(self, region: int) -> None:
+        """
+            Block until the gpu has finished with a region.
+        """
+
+        fence = self.fences[region]
+        if fence is None:
+            return
+
+        glClientWaitSync(fence, GL_SYNC_FLUSH_COMMANDS_BIT, 1_000_000_000)
+        glDeleteSync(fence)
+        self.fences[region] = None
+
+    def takeUploadCount(self) -> int:
+        """
+            Returns the bytes uploaded since the last call.
+        """
+
+        count = self.bytesUploaded
+        self.bytesUploaded = 0
+        return count
+
     def destroy(self) -> None:
         """
             Free the memory.
         """
 
-        glDeleteBuffers(1, (self.deviceMemory,))
\ No newline at end of file
+        for region in range(self.ringSize):
+            self.waitFor(region)
+        if self.persistent:
+            glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.deviceMemory)
+            glUnmapBuffer(GL_SHADER_STORAGE_BUFFER)
+        glDeleteBuffers(1, (self.deviceMemory,))
@@ -6,14 +6,81 @@ import node
 # be compiled.                           #
 #----------------------------------------#
 
+#---- Primitives                     ----#
+# The builders and refits only ever see  #
+# an AABB and a centre per primitive, so #
+# spheres and triangles share them.      #
+#----------------------------------------#
+#region
+def primitive_bounds(primitives: np.ndarray) -> np.ndarray:
+    """
+        Boil spheres or triangles down to bounding boxes
+        and centres. Bounds are passed straight through.
+    """
+
+    if primitives.dtype == data_type_sphere:
+        return sphere_bounds(primitives)
+    if primitives.dtype == data_type_triangle:
+        return triangle_bounds(primitives)
+    return primitives
+
+@njit(cache = True, parallel = True, nogil = True)
+def sphere_bounds(spheres: np.ndarray) -> np.ndarray:
+
+    bounds = np.empty(len(spheres), dtype = data_type_primitive_bounds)
+
+    for i in prange(len(spheres)):
+
+        s_x = spheres[i]['x']
+        s_y = spheres[i]['y']
+        s_z = spheres[i]['z']
+        s_r = spheres[i]['radius']
+
+        bounds[i]['min_x'] = s_x - s_r
+        bounds[i]['min_y'] = s_y - s_r
+        bounds[i]['min_z'] = s_z - s_r
+        bounds[i]['max_x'] = s_x + s_r
+        bounds[i]['max_y'] = s_y + s_r
+        bounds[i]['max_z'] = s_z + s_r
+        bounds[i]['x'] = s_x
+        bounds[i]['y'] = s_y
+        bounds[i]['z'] = s_z
+    
+    return bounds
+
+@njit(cache = True, parallel = True, nogil = True)
+def triangle_bounds(triangles: np.ndarray) -> np.ndarray:
+
+    bounds = np.empty(len(triangles), dtype = data_type_primitive_bounds)
+
+    for i in prange(len(triangles)):
+
+        t = triangles[i]
+        bounds[i]['min_x'] = min(t['ax'], min(t['bx'], t['cx']))
+        bounds[i]['min_y'] = min(t['ay'], min(t['by'], t['cy']))
+        bounds[i]['min_z'] = min(t['az'], min(t['bz'], t['cz']))
+        bounds[i]['max_x'] = max(t['ax'], max(t['bx'], t['cx']))
+        bounds[i]['max_y'] = max(t['ay'], max(t['by'], t['cy']))
+        bounds[i]['max_z'] = max(t['az'], max(t['bz'], t['cz']))
+        bounds[i]['x'] = (t['ax'] + t['bx'] + t['cx']) / 3.0
+        bounds[i]['y'] = (t['ay'] + t['by'] + t['cy']) / 3.0
+        bounds[i]['z'] = (t['az'] + t['bz'] + t['cz']) / 3.0
+    
+    return bounds
+#endregion
 #---- BVH Building                   ----#
 #region
 def build_bvh(
     nodes: np.ndarray, 
-    spheres: np.ndarray,
+    primitives: np.ndarray,
     sphere_ids: np.ndarray,
     sphere_count: int) -> int:
 
+    bounds = primitive_bounds(primitives)
+
+    #Clear out any previous tree
+    node.reset_nodes(nodes, 0, len(nodes))
+
     #Configure root node
     #sphere count
     nodes[0]['sphere_count'] = sphere_count
@@ -23,16 +90,17 @@ def build_bvh(
     # [bins -- left_bins -- right_bins -- dummy_left -- dummy_right]
     bins = node.make_nodes(50)
 
-    update_bounds(nodes, spheres, sphere_ids, 0)
+    update_bounds(nodes, bounds, sphere_ids, 0)
     nodes_used = subdivide(
-        nodes, spheres, sphere_ids, 
+        nodes, bounds, sphere_ids, 
         0, 1, bins)
     
     return nodes_used
 
+@njit(cache=True, nogil=True)
 def update_bounds(
     nodes: np.ndarray, 
-    spheres: np.ndarray, 
+    bounds: np.ndarray, 
     sphere_ids: np.ndarray,
     node_index: int) -> None:
 
@@ -44,33 +112,50 @@ def update_bounds(
 
         sphere_index = sphere_ids[first + i]
 
-        #grab sphere info
-        sphere = spheres[sphere_index]
-        s_x = sphere['x']
-        s_y = sphere['y']
-        s_z = sphere['z']
-        s_r = sphere['radius']
+        #grab primitive info
+        primitive = bounds[sphere_index]
 
         #find new minimum
-        nodes[node_index]['min_x'] = min(nodes[node_index]['min_x'], s_x - s_r)
-        nodes[node_index]['min_y'] = min(nodes[node_index]['min_y'], s_y - s_r)
-        nodes[node_index]['min_z'] = min(nodes[node_index]['min_z'], s_z - s_r)
+        nodes[node_index]['min_x'] = min(nodes[node_index]['min_x'], primitive['min_x'])
+        nodes[node_index]['min_y'] = min(nodes[node_index]['min_y'], primitive['min_y'])
+        nodes[node_index]['min_z'] = min(nodes[node_index]['min_z'], primitive['min_z'])
         
         #find new maximum
-        nodes[node_index]['max_x'] = max(nodes[node_index]['max_x'], s_x + s_r)
-        nodes[node_index]['max_y'] = max(nodes[node_index]['max_y'], s_y + s_r)
-        nodes[node_index]['max_z'] = max(nodes[node_index]['max_z'], s_z + s_r)
+        nodes[node_index]['max_x'] = max(nodes[node_index]['max_x'], primitive['max_x'])
+        nodes[node_index]['max_y'] = max(nodes[node_index]['max_y'], primitive['max_y'])
+        nodes[node_index]['max_z'] = max(nodes[node_index]['max_z'], primitive['max_z'])
 
 def subdivide(nodes: np.ndarray, 
-    spheres: np.ndarray, 
+    bounds: np.ndarray, 
     sphere_ids: np.ndarray,
     node_index: int,
     nodes_used: int,
     bins: np.ndarray) -> int:
 
+    should_split, bestAxis, pos = choose_split(
+        nodes, bounds, sphere_ids, node_index, bins)
+    
+    if not should_split:
+        return nodes_used
+
+    return object_split(
+        nodes, bounds, sphere_ids, node_index, bestAxis, nodes_used, pos,
+        bins)
+
+@njit(cache=True)
+def choose_split(nodes: np.ndarray, 
+    bounds: np.ndarray, 
+    sphere_ids: np.ndarray,
+    node_index: int,
+    bins: np.ndarray) -> tuple[bool, int, float]:
+    """
+        Pick a split plane for the node, returns
+        (worth splitting?, axis, position)
+    """
+
     sphere_count = int(nodes[node_index]['sphere_count'])
     if sphere_count < 2:
-        return nodes_used
+        return (False, 0, 0.0)
     
     e_x = nodes[node_index]['max_x'] - nodes[node_index]['min_x']
     e_y = nodes[node_index]['max_y'] - nodes[node_index]['min_y']
@@ -88,31 +173,21 @@ def subdivide(nodes: np.ndarray,
     
     if sphere_count >= bin_count:
         pos, cost = determine_best_split_bin(
-            nodes, spheres, sphere_ids, 
+            nodes, bounds, sphere_ids, 
             node_index, bestAxis, bin_count,
             bins)
     else:
         pos, cost = determine_best_split_full(
-            nodes, spheres, sphere_ids, 
+            nodes, bounds, sphere_ids, 
             node_index, bestAxis, bins)
-    """
-    pos, cost = determine_best_split_bin(
-        nodes, spheres, sphere_ids, 
-        node_index, bestAxis, bin_count,
-        bins)
-    """
-    node_cost = sphere_count * (e_x * e_y + e_y * e_z + e_x * e_z)
-    
-    if cost >= node_cost:
-        return nodes_used
 
-    return object_split(
-        nodes, spheres, sphere_ids, node_index, bestAxis, nodes_used, pos,
-        bins)
+    node_cost = np.float32(sphere_count) * (e_x * e_y + e_y * e_z + e_x * e_z)
+    
+    return (cost < node_cost, bestAxis, pos)
 
 @njit(cache=True)
 def determine_best_split_full(nodes: np.ndarray, 
-    spheres: np.ndarray, 
+    bounds: np.ndarray, 
     sphere_ids: np.ndarray,
     node_index: int, axis: int,
     bins: np.ndarray) -> tuple[float, float]:
@@ -126,7 +201,7 @@ def determine_best_split_full(nodes: np.ndarray,
     contents = int(_node['contents'])
 
     for i in range(sphere_count):
-        sphere = spheres[sphere_ids[contents + i]]
+        sphere = bounds[sphere_ids[contents + i]]
         
         testPos = sphere['x']
         if axis == 1:
@@ -134,7 +209,7 @@ def determine_best_split_full(nodes: np.ndarray,
         elif axis == 2:
             testPos = sphere['z']
 
-        cost = evaluate_sah(nodes, spheres, sphere_ids, node_index, axis, testPos, bins)
+        cost = evaluate_sah(nodes, bounds, sphere_ids, node_index, axis, testPos, bins)
 
         if cost < bestCost:
             bestPos = testPos
@@ -144,7 +219,7 @@ def determine_best_split_full(nodes: np.ndarray,
 
 @njit(cache=True)
 def evaluate_sah(nodes: np.ndarray,
-    spheres: np.ndarray,
+    bounds: np.ndarray,
     sphere_ids: np.ndarray,
     node_index: int, axis: int, split_position: float,
     bins: np.ndarray) -> float:
@@ -171,37 +246,32 @@ def evaluate_sah(nodes: np.ndarray,
     contents = int(nodes[node_index]['contents'])
 
     for i in range(sphere_count):
-        sphere = spheres[sphere_ids[contents + i]]
-        #get sphere info
-        s_x = sphere['x']
-        s_y = sphere['y']
-        s_z = sphere['z']
-        s_r = sphere['radius']
-
-        s_pos = sphere['x']
+        primitive = bounds[sphere_ids[contents + i]]
+
+        s_pos = primitive['x']
         if axis == 1:
-            s_pos = sphere['y']
+            s_pos = primitive['y']
         elif axis == 2:
-            s_pos = sphere['z']
+            s_pos = primitive['z']
         
         if s_pos < split_position:
             #Grow left box
-            bins[48]['min_x'] = min(bins[48]['min_x'], s_x - s_r)
-            bins[48]['min_y'] = min(bins[48]['min_y'], s_y - s_r)
-            bins[48]['min_z'] = min(bins[48]['min_z'], s_z - s_r)
+            bins[48]['min_x'] = min(bins[48]['min_x'], primitive['min_x'])
+            bins[48]['min_y'] = min(bins[48]['min_y'], primitive['min_y'])
+            bins[48]['min_z'] = min(bins[48]['min_z'], primitive['min_z'])
             bins[48]['sphere_count'] = bins[48]['sphere_count'] + 1
-            bins[48]['max_x'] = max(bins[48]['max_x'], s_x + s_r)
-            bins[48]['max_y'] = max(bins[48]['max_y'], s_y + s_r)
-            bins[48]['max_z'] = max(bins[48]['max_z'], s_z + s_r)
+            bins[48]['max_x'] = max(bins[48]['max_x'], primitive['max_x'])
+            bins[48]['max_y'] = max(bins[48]['max_y'], primitive['max_y'])
+            bins[48]['max_z'] = max(bins[48]['max_z'], primitive['max_z'])
         else:
             #Grow right box
-            bins[49]['min_x'] = min(bins[49]['min_x'], s_x - s_r)
-            bins[49]['min_y'] = min(bins[49]['min_y'], s_y - s_r)
-            bins[49]['min_z'] = min(bins[49]['min_z'], s_z - s_r)
+            bins[49]['min_x'] = min(bins[49]['min_x'], primitive['min_x'])
+            bins[49]['min_y'] = min(bins[49]['min_y'], primitive['min_y'])
+            bins[49]['min_z'] = min(bins[49]['min_z'], primitive['min_z'])
             bins[49]['sphere_count'] = bins[49]['sphere_count'] + 1
-            bins[49]['max_x'] = max(bins[49]['max_x'], s_x + s_r)
-            bins[49]['max_y'] = max(bins[49]['max_y'], s_y + s_r)
-            bins[49]['max_z'] = max(bins[49]['max_z'], s_z + s_r)
+            bins[49]['max_x'] = max(bins[49]['max_x'], primitive['max_x'])
+            bins[49]['max_y'] = max(bins[49]['max_y'], primitive['max_y'])
+            bins[49]['max_z'] = max(bins[49]['max_z'], primitive['max_z'])
     
     l_x = bins[48]['max_x'] - bins[48]['min_x']
     l_y = bins[48]['max_y'] - bins[48]['min_y']
@@ -223,13 +293,13 @@ def evaluate_sah(nodes: np.ndarray,
 
 @njit(cache=True)
 def determine_best_split_bin(nodes: np.ndarray, 
-    spheres: np.ndarray, 
+    bounds: np.ndarray, 
     sphere_ids: np.ndarray,
     node_index: int, axis: int, bin_count: int,
     bins: np.ndarray) -> tuple[float, float]:
     
     node.reset_nodes(bins, 0, 50)
-    build_bins(nodes, spheres, sphere_ids, node_index, bin_count, axis, bins)
+    build_bins(nodes, bounds, sphere_ids, node_index, bin_count, axis, bins)
     collect_bins(bins, bin_count)
 
     _node = nodes[node_index]
@@ -278,7 +348,7 @@ def determine_best_split_bin(nodes: np.ndarray,
 
 @njit(cache=True)
 def build_bins(nodes: np.ndarray, 
-    spheres: np.ndarray, 
+    bounds: np.ndarray, 
     sphere_ids: np.ndarray, node_index: int, bin_count: int, axis: int, bins: np.ndarray) -> np.ndarray:
 
     node.reset_nodes(bins, 0, bin_count)
@@ -300,29 +370,23 @@ def build_bins(nodes: np.ndarray,
     extent = max_bound - min_bound
     bin_size = extent / bin_count
     for i in range(sphere_count):
-        sphere = spheres[sphere_ids[first + i]]
+        primitive = bounds[sphere_ids[first + i]]
 
-        sphere_center = sphere['x']
+        sphere_center = primitive['x']
         if axis == 1:
-            sphere_center = sphere['y']
+            sphere_center = primitive['y']
         elif axis == 2:
-            sphere_center = sphere['z']
-        
-        #unpack sphere info
-        s_x = sphere['x']
-        s_y = sphere['y']
-        s_z = sphere['z']
-        s_r = sphere['radius']
+            sphere_center = primitive['z']
         
         sphere_offset = sphere_center - min_bound
         bin_index = max(0, min(bin_count - 1, int(sphere_offset / bin_size)))
-        bins[bin_index]['min_x'] = min(bins[bin_index]['min_x'], s_x - s_r)
-        bins[bin_index]['min_y'] = min(bins[bin_index]['min_y'], s_y - s_r)
-        bins[bin_index]['min_z'] = min(bins[bin_index]['min_z'], s_z - s_r)
+        bins[bin_index]['min_x'] = min(bins[bin_index]['min_x'], primitive['min_x'])
+        bins[bin_index]['min_y'] = min(bins[bin_index]['min_y'], primitive['min_y'])
+        bins[bin_index]['min_z'] = min(bins[bin_index]['min_z'], primitive['min_z'])
         bins[bin_index]['sphere_count'] = bins[bin_index]['sphere_count'] + 1
-        bins[bin_index]['max_x'] = max(bins[bin_index]['max_x'], s_x + s_r)
-        bins[bin_index]['max_y'] = max(bins[bin_index]['max_y'], s_y + s_r)
-        bins[bin_index]['max_z'] = max(bins[bin_index]['max_z'], s_z + s_r)
+        bins[bin_index]['max_x'] = max(bins[bin_index]['max_x'], primitive['max_x'])
+        bins[bin_index]['max_y'] = max(bins[bin_index]['max_y'], primitive['max_y'])
+        bins[bin_index]['max_z'] = max(bins[bin_index]['max_z'], primitive['max_z'])
 
     return bins
 
@@ -392,7 +456,7 @@ def collect_bins(bins: np.ndarray,
         bins[right_index]['max_z'] = bins[dr_index]['max_z']
 
 def object_split(nodes: np.ndarray, 
-    spheres: np.ndarray, 
+    bounds: np.ndarray, 
     sphere_ids: np.ndarray, 
     parent_index: int, axis: int, 
     nodes_used: int, split_position: float,
@@ -403,10 +467,49 @@ def object_split(nodes: np.ndarray,
     contents = int(_node['contents'])
 
     #split group into halves
-    i = contents
+    i = partition(bounds, sphere_ids, contents, sphere_count, 
+        axis, split_position)
+
+    #create child nodes
+    left_count = i - contents
+    if (left_count == 0 or left_count == sphere_count):
+        return nodes_used
+    
+    left_child_index = nodes_used
+    nodes_used += 1
+    nodes[left_child_index]['contents'] = contents
+    nodes[left_child_index]['sphere_count'] = left_count
+    nodes[parent_index]['contents'] = left_child_index
+    
+    right_child_index = nodes_used
+    nodes_used += 1
+    nodes[right_child_index]['contents'] = i
+    nodes[right_child_index]['sphere_count'] = sphere_count - left_count
+
+    update_bounds(nodes, bounds, sphere_ids, left_child_index)
+    nodes_used = subdivide(nodes, bounds, sphere_ids, left_child_index, nodes_used, bins)
+    update_bounds(nodes, bounds, sphere_ids, right_child_index)
+    nodes_used = subdivide(nodes, bounds, sphere_ids, right_child_index, nodes_used, bins)
+
+    nodes[parent_index]['sphere_count'] = 0
+
+    return nodes_used
+
+@njit(cache=True)
+def partition(bounds: np.ndarray, 
+    sphere_ids: np.ndarray, 
+    first: int, sphere_count: int, 
+    axis: int, split_position: float) -> int:
+    """
+        Reorder the given range of sphere ids so that spheres
+        left of the split come first.
+        Returns the index of the first sphere on the right.
+    """
+
+    i = first
     j = i + sphere_count - 1
     while i <= j:
-        sphere = spheres[sphere_ids[i]]
+        sphere = bounds[sphere_ids[i]]
 
         sphere_center = sphere['x']
         if axis == 1:
@@ -421,37 +524,496 @@ def object_split(nodes: np.ndarray,
             sphere_ids[i] = sphere_ids[j]
             sphere_ids[j] = temp
             j -= 1
+    
+    return i
+#endregion
+#---- Parallel BVH Building          ----#
+# The top of the tree is split serially, #
+# then each remaining subtree is built   #
+# on its own core with its own bins.     #
+# Subtrees are spliced back in the order #
+# the serial build would have made them, #
+# so the layout matches build_bvh.       #
+#----------------------------------------#
+#region
+def build_bvh_parallel(
+    nodes: np.ndarray, 
+    primitives: np.ndarray,
+    sphere_ids: np.ndarray,
+    sphere_count: int,
+    serial_depth: int = -1) -> int:
+    """
+        Build the bvh, spreading the work over all numba threads.
 
-    #create child nodes
-    left_count = i - contents
-    if (left_count == 0 or left_count == sphere_count):
+            Parameters:
+                serial_depth (int): depth at which subtrees are handed
+                    off to worker threads, by default enough to give
+                    each thread a few subtrees.
+
+            Returns:
+                The number of nodes used.
+    """
+
+    bounds = primitive_bounds(primitives)
+    if serial_depth < 0:
+        serial_depth = int(np.ceil(np.log2(numba.get_num_threads()))) + 3
+
+    #Split the top levels into a scratch tree
+    top_nodes = node.make_nodes(2 * (1 << serial_depth) + 1)
+    top_nodes[0]['sphere_count'] = sphere_count
+    top_nodes[0]['contents'] = 0
+    update_bounds(top_nodes, bounds, sphere_ids, 0)
+    deferred = np.full(len(top_nodes), -1, dtype = np.int32)
+    top_used, task_count = build_iterative(
+        top_nodes, bounds, sphere_ids, node.make_nodes(50), 
+        serial_depth, deferred)
+
+    #Build the subtrees, each into its own region of scratch memory
+    scratch = node.make_nodes(2 * sphere_count)
+    sizes = np.zeros(task_count, dtype = np.int32)
+    build_deferred(top_nodes, deferred, task_count, 
+        bounds, sphere_ids, scratch, sizes)
+
+    #Stitch the pieces together
+    node.reset_nodes(nodes, 0, len(nodes))
+    return splice_subtrees(nodes, top_nodes, top_used, 
+        deferred, scratch, sizes)
+
+@njit(cache=True, nogil=True)
+def build_iterative(nodes: np.ndarray, 
+    bounds: np.ndarray, 
+    sphere_ids: np.ndarray,
+    bins: np.ndarray,
+    max_depth: int,
+    deferred: np.ndarray) -> tuple[int, int]:
+    """
+        Stack based version of subdivide, starting from node 0,
+        whose bounds must already be set. Nodes are numbered in
+        the same order as the recursive build.
+
+        Nodes which would split below max_depth are left as leaves,
+        their indices are written to deferred.
+
+        Returns (nodes used, deferred count).
+    """
+
+    stack = np.empty((2 * min(max_depth, 64) + 2, 2), dtype = np.int32)
+    stack[0, 0] = 0
+    stack[0, 1] = 0
+    stack_pos = 1
+    nodes_used = 1
+    deferred_count = 0
+
+    while stack_pos > 0:
+
+        stack_pos -= 1
+        node_index = stack[stack_pos, 0]
+        depth = stack[stack_pos, 1]
+
+        if depth >= max_depth:
+            if nodes[node_index]['sphere_count'] > 1:
+                deferred[deferred_count] = node_index
+                deferred_count += 1
+            continue
+
+        should_split, axis, pos = choose_split(
+            nodes, bounds, sphere_ids, node_index, bins)
+        if not should_split:
+            continue
+
+        sphere_count = int(nodes[node_index]['sphere_count'])
+        contents = int(nodes[node_index]['contents'])
+        i = partition(bounds, sphere_ids, contents, sphere_count, axis, pos)
+        left_count = i - contents
+        if (left_count == 0 or left_count == sphere_count):
+            continue
+
+        left_child_index = nodes_used
+        right_child_index = nodes_used + 1
+        nodes_used += 2
+        nodes[left_child_index]['contents'] = contents
+        nodes[left_child_index]['sphere_count'] = left_count
+        nodes[right_child_index]['contents'] = i
+        nodes[right_child_index]['sphere_count'] = sphere_count - left_count
+        nodes[node_index]['contents'] = left_child_index
+        nodes[node_index]['sphere_count'] = 0
+        update_bounds(nodes, bounds, sphere_ids, left_child_index)
+        update_bounds(nodes, bounds, sphere_ids, right_child_index)
+
+        #grow the stack if a degenerate split made the tree deep
+        if stack_pos + 2 > len(stack):
+            bigger = np.empty((2 * len(stack), 2), dtype = np.int32)
+            bigger[:len(stack)] = stack
+            stack = bigger
+
+        #right first, so the left subtree is numbered first
+        stack[stack_pos, 0] = right_child_index
+        stack[stack_pos, 1] = depth + 1
+        stack[stack_pos + 1, 0] = left_child_index
+        stack[stack_pos + 1, 1] = depth + 1
+        stack_pos += 2
+
+    return (nodes_used, deferred_count)
+
+@njit(cache=True)
+def copy_node(source: np.ndarray, source_index: int, 
+    destination: np.ndarray, destination_index: int) -> None:
+
+    destination[destination_index]['min_x'] = source[source_index]['min_x']
+    destination[destination_index]['min_y'] = source[source_index]['min_y']
+    destination[destination_index]['min_z'] = source[source_index]['min_z']
+    destination[destination_index]['sphere_count'] = source[source_index]['sphere_count']
+    destination[destination_index]['max_x'] = source[source_index]['max_x']
+    destination[destination_index]['max_y'] = source[source_index]['max_y']
+    destination[destination_index]['max_z'] = source[source_index]['max_z']
+    destination[destination_index]['contents'] = source[source_index]['contents']
+
+@njit(cache=True, parallel=True, nogil=True)
+def build_deferred(top_nodes: np.ndarray, 
+    deferred: np.ndarray, task_count: int,
+    bounds: np.ndarray, 
+    sphere_ids: np.ndarray,
+    scratch: np.ndarray,
+    sizes: np.ndarray) -> None:
+    """
+        Build each deferred subtree, rooted at local index 0 of
+        its own slice of scratch. A subtree over n spheres needs
+        at most 2n - 1 nodes, so slicing scratch by sphere range
+        keeps the tasks apart.
+    """
+
+    for task in prange(task_count):
+
+        root_index = deferred[task]
+        first = int(top_nodes[root_index]['contents'])
+        count = int(top_nodes[root_index]['sphere_count'])
+        local_nodes = scratch[2 * first : 2 * (first + count)]
+        copy_node(top_nodes, root_index, local_nodes, 0)
+
+        #each worker gets its own bins
+        bins = node.make_nodes(50)
+        used, _ = build_iterative(
+            local_nodes, bounds, sphere_ids, bins, 
+            1 << 30, np.empty(0, dtype = np.int32))
+        sizes[task] = used
+
+@njit(cache=True, nogil=True)
+def splice_subtrees(nodes: np.ndarray,
+    top_nodes: np.ndarray, top_used: int,
+    deferred: np.ndarray,
+    scratch: np.ndarray,
+    sizes: np.ndarray) -> int:
+    """
+        Walk the top tree depth first, handing out node indices
+        in the order the recursive build would, and copying in
+        each finished subtree where its root was deferred.
+
+        Returns the number of nodes used.
+    """
+
+    task_of = np.full(top_used, -1, dtype = np.int32)
+    for task in range(len(sizes)):
+        task_of[deferred[task]] = task
+
+    # (top index, final index)
+    stack = np.empty((top_used + 1, 2), dtype = np.int32)
+    stack[0, 0] = 0
+    stack[0, 1] = 0
+    stack_pos = 1
+    nodes_used = 1
+
+    while stack_pos > 0:
+
+        stack_pos -= 1
+        top_index = stack[stack_pos, 0]
+        final_index = stack[stack_pos, 1]
+        task = task_of[top_index]
+
+        if task >= 0:
+            #copy in the subtree, rebasing child indices
+            first = int(top_nodes[top_index]['contents'])
+            local_nodes = scratch[2 * first :]
+            size = sizes[task]
+            offset = nodes_used - 1
+            copy_node(local_nodes, 0, nodes, final_index)
+            for i in range(1, size):
+                copy_node(local_nodes, i, nodes, offset + i)
+            if nodes[final_index]['sphere_count'] == 0:
+                nodes[final_index]['contents'] += offset
+            for i in range(1, size):
+                if nodes[offset + i]['sphere_count'] == 0:
+                    nodes[offset + i]['contents'] += offset
+            nodes_used += size - 1
+            continue
+
+        copy_node(top_nodes, top_index, nodes, final_index)
+        if top_nodes[top_index]['sphere_count'] > 0:
+            continue
+
+        left_top = int(top_nodes[top_index]['contents'])
+        nodes[final_index]['contents'] = nodes_used
+        stack[stack_pos, 0] = left_top + 1
+        stack[stack_pos, 1] = nodes_used + 1
+        stack[stack_pos + 1, 0] = left_top
+        stack[stack_pos + 1, 1] = nodes_used
+        stack_pos += 2
+        nodes_used += 2
+
+    return nodes_used
+#endregion
+#---- Linear BVH Building            ----#
+# Sort spheres along a morton curve, then #
+# split ranges where the codes' highest  #
+# differing bit changes. Much cheaper    #
+# than SAH, at the cost of tree quality. #
+#----------------------------------------#
+#region
+def build_lbvh(
+    nodes: np.ndarray, 
+    primitives: np.ndarray,
+    sphere_ids: np.ndarray,
+    sphere_count: int,
+    leaf_size: int = 4,
+    sah_below: int = 0) -> int:
+    """
+        Build a bvh by morton code.
+
+            Parameters:
+                leaf_size (int): ranges this small become leaves
+                sah_below (int): if set, ranges this small are handed
+                    to the SAH builder instead, so the morton codes only
+                    lay out the top of the tree.
+
+            Returns:
+                The number of nodes used.
+    """
+
+    bounds = primitive_bounds(primitives)
+    codes = np.empty(sphere_count, dtype = np.uint32)
+    morton_codes(bounds, sphere_ids, sphere_count, codes)
+    radix_sort(codes, sphere_ids)
+
+    if sah_below <= leaf_size:
+        node.reset_nodes(nodes, 0, len(nodes))
+        nodes_used, _ = emit_lbvh(nodes, codes, sphere_count, 
+            leaf_size, 0, np.empty(0, dtype = np.int32))
+        refit_nodes(nodes, bounds, sphere_ids, nodes_used)
         return nodes_used
+
+    #Morton splits on top, SAH subtrees below
+    top_nodes = node.make_nodes(2 * sphere_count)
+    deferred = np.full(len(top_nodes), -1, dtype = np.int32)
+    top_used, task_count = emit_lbvh(top_nodes, codes, sphere_count, 
+        leaf_size, sah_below, deferred)
+    refit_nodes(top_nodes, bounds, sphere_ids, top_used)
+
+    scratch = node.make_nodes(2 * sphere_count)
+    sizes = np.zeros(task_count, dtype = np.int32)
+    build_deferred(top_nodes, deferred, task_count, 
+        bounds, sphere_ids, scratch, sizes)
+
+    node.reset_nodes(nodes, 0, len(nodes))
+    return splice_subtrees(nodes, top_nodes, top_used, 
+        deferred, scratch, sizes)
+
+@njit(cache=True)
+def expand_bits(v: int) -> int:
+    """
+        Spread the low 10 bits of v out, two zeros between each.
+    """
+
+    v = (v * 0x00010001) & 0xFF0000FF
+    v = (v * 0x00000101) & 0x0F00F00F
+    v = (v * 0x00000011) & 0xC30C30C3
+    v = (v * 0x00000005) & 0x49249249
+    return v
+
+@njit(cache=True, parallel=True, nogil=True)
+def morton_codes(bounds: np.ndarray, 
+    sphere_ids: np.ndarray, 
+    sphere_count: int,
+    codes: np.ndarray) -> None:
+    """
+        30 bit morton code of each sphere's centre, quantized
+        within the bounds of all the centres.
+    """
+
+    min_x = 1e10
+    min_y = 1e10
+    min_z = 1e10
+    max_x = -1e10
+    max_y = -1e10
+    max_z = -1e10
+    for i in range(sphere_count):
+        sphere = bounds[sphere_ids[i]]
+        min_x = min(min_x, sphere['x'])
+        min_y = min(min_y, sphere['y'])
+        min_z = min(min_z, sphere['z'])
+        max_x = max(max_x, sphere['x'])
+        max_y = max(max_y, sphere['y'])
+        max_z = max(max_z, sphere['z'])
     
-    left_child_index = nodes_used
-    nodes_used += 1
-    nodes[left_child_index]['contents'] = contents
-    nodes[left_child_index]['sphere_count'] = left_count
-    nodes[parent_index]['contents'] = left_child_index
+    scale_x = 1023.0 / max(max_x - min_x, 1e-6)
+    scale_y = 1023.0 / max(max_y - min_y, 1e-6)
+    scale_z = 1023.0 / max(max_z - min_z, 1e-6)
+
+    for i in prange(sphere_count):
+        sphere = bounds[sphere_ids[i]]
+        q_x = min(1023, max(0, int((sphere['x'] - min_x) * scale_x)))
+        q_y = min(1023, max(0, int((sphere['y'] - min_y) * scale_y)))
+        q_z = min(1023, max(0, int((sphere['z'] - min_z) * scale_z)))
+        codes[i] = (expand_bits(q_x) << 2) | (expand_bits(q_y) << 1) | expand_bits(q_z)
+
+@njit(cache=True, nogil=True)
+def radix_sort(codes: np.ndarray, sphere_ids: np.ndarray) -> None:
+    """
+        Sort 30 bit codes, carrying the sphere ids along,
+        in three passes of 10 bits.
+    """
+
+    count = len(codes)
+    codes_out = np.empty_like(codes)
+    ids_out = np.empty_like(sphere_ids[:count])
+    histogram = np.empty(1024, dtype = np.int64)
+
+    for shift in range(0, 30, 10):
+
+        histogram[:] = 0
+        for i in range(count):
+            histogram[(codes[i] >> shift) & 1023] += 1
+        
+        total = 0
+        for digit in range(1024):
+            bucket = histogram[digit]
+            histogram[digit] = total
+            total += bucket
+        
+        for i in range(count):
+            digit = (codes[i] >> shift) & 1023
+            codes_out[histogram[digit]] = codes[i]
+            ids_out[histogram[digit]] = sphere_ids[i]
+            histogram[digit] += 1
+        
+        codes[:] = codes_out
+        sphere_ids[:count] = ids_out
+
+@njit(cache=True)
+def leading_zeros(x: int) -> int:
+    """
+        Leading zeros of a 30 bit number.
+    """
+
+    count = 0
+    bit = 1 << 29
+    while bit > 0 and (x & bit) == 0:
+        count += 1
+        bit >>= 1
+    return count
+
+@njit(cache=True)
+def find_split(codes: np.ndarray, first: int, last: int) -> int:
+    """
+        Returns the last index of the left half of codes[first:last + 1],
+        splitting where the highest differing bit flips.
+    """
+
+    first_code = codes[first]
+    last_code = codes[last]
+
+    if first_code == last_code:
+        return (first + last) >> 1
     
-    right_child_index = nodes_used
-    nodes_used += 1
-    nodes[right_child_index]['contents'] = i
-    nodes[right_child_index]['sphere_count'] = sphere_count - left_count
+    prefix = leading_zeros(first_code ^ last_code)
+
+    #binary search for the last code sharing more than prefix bits
+    split = first
+    step = last - first
+    while step > 1:
+        step = (step + 1) >> 1
+        candidate = split + step
+        if candidate < last:
+            if leading_zeros(first_code ^ codes[candidate]) > prefix:
+                split = candidate
+    
+    return split
+
+@njit(cache=True, nogil=True)
+def emit_lbvh(nodes: np.ndarray, 
+    codes: np.ndarray,
+    sphere_count: int,
+    leaf_size: int,
+    defer_below: int,
+    deferred: np.ndarray) -> tuple[int, int]:
+    """
+        Lay out the hierarchy over sorted codes, children side by
+        side and numbered depth first like the SAH builders.
+        Bounds are left for refit_bvh to fill in.
 
-    update_bounds(nodes, spheres, sphere_ids, left_child_index)
-    nodes_used = subdivide(nodes, spheres, sphere_ids, left_child_index, nodes_used, bins)
-    update_bounds(nodes, spheres, sphere_ids, right_child_index)
-    nodes_used = subdivide(nodes, spheres, sphere_ids, right_child_index, nodes_used, bins)
+        Ranges of defer_below spheres or fewer are left as leaves
+        and written to deferred.
 
-    nodes[parent_index]['sphere_count'] = 0
+        Returns (nodes used, deferred count).
+    """
 
-    return nodes_used
+    nodes[0]['contents'] = 0
+    nodes[0]['sphere_count'] = sphere_count
+    stack = np.empty(128, dtype = np.int32)
+    stack[0] = 0
+    stack_pos = 1
+    nodes_used = 1
+    deferred_count = 0
+
+    while stack_pos > 0:
+
+        stack_pos -= 1
+        node_index = stack[stack_pos]
+        first = int(nodes[node_index]['contents'])
+        count = int(nodes[node_index]['sphere_count'])
+
+        if count <= leaf_size:
+            continue
+
+        if count <= defer_below:
+            deferred[deferred_count] = node_index
+            deferred_count += 1
+            continue
+
+        split = find_split(codes, first, first + count - 1)
+        left_count = split - first + 1
+
+        left_child_index = nodes_used
+        right_child_index = nodes_used + 1
+        nodes_used += 2
+        nodes[left_child_index]['contents'] = first
+        nodes[left_child_index]['sphere_count'] = left_count
+        nodes[right_child_index]['contents'] = split + 1
+        nodes[right_child_index]['sphere_count'] = count - left_count
+        nodes[node_index]['contents'] = left_child_index
+        nodes[node_index]['sphere_count'] = 0
+
+        if stack_pos + 2 > len(stack):
+            bigger = np.empty(2 * len(stack), dtype = np.int32)
+            bigger[:len(stack)] = stack
+            stack = bigger
+
+        stack[stack_pos] = right_child_index
+        stack[stack_pos + 1] = left_child_index
+        stack_pos += 2
+    
+    return (nodes_used, deferred_count)
 #endregion
 #---- BVH Updating                   ----#
 #region
-@njit(cache = True)
 def refit_bvh(nodes: np.ndarray, 
-    spheres: np.ndarray,
+    primitives: np.ndarray,
+    sphere_ids: np.ndarray,
+    node_count: int) -> None:
+
+    refit_nodes(nodes, primitive_bounds(primitives), sphere_ids, node_count)
+
+@njit(cache = True)
+def refit_nodes(nodes: np.ndarray, 
+    bounds: np.ndarray,
     sphere_ids: np.ndarray,
     node_count: int) -> None:
 
@@ -477,22 +1039,18 @@ def refit_bvh(nodes: np.ndarray,
 
                 sphere_index = sphere_ids[first + j]
 
-                #grab sphere info
-                sphere = spheres[sphere_index]
-                s_x = sphere['x']
-                s_y = sphere['y']
-                s_z = sphere['z']
-                s_r = sphere['radius']
+                #grab primitive info
+                primitive = bounds[sphere_index]
 
                 #find new minimum
-                nodes[i]['min_x'] = min(nodes[i]['min_x'], s_x - s_r)
-                nodes[i]['min_y'] = min(nodes[i]['min_y'], s_y - s_r)
-                nodes[i]['min_z'] = min(nodes[i]['min_z'], s_z - s_r)
+                nodes[i]['min_x'] = min(nodes[i]['min_x'], primitive['min_x'])
+                nodes[i]['min_y'] = min(nodes[i]['min_y'], primitive['min_y'])
+                nodes[i]['min_z'] = min(nodes[i]['min_z'], primitive['min_z'])
                 
                 #find new maximum
-                nodes[i]['max_x'] = max(nodes[i]['max_x'], s_x + s_r)
-                nodes[i]['max_y'] = max(nodes[i]['max_y'], s_y + s_r)
-                nodes[i]['max_z'] = max(nodes[i]['max_z'], s_z + s_r)
+                nodes[i]['max_x'] = max(nodes[i]['max_x'], primitive['max_x'])
+                nodes[i]['max_y'] = max(nodes[i]['max_y'], primitive['max_y'])
+                nodes[i]['max_z'] = max(nodes[i]['max_z'], primitive['max_z'])
         else:
             #Internal node, check children
             for j in range(2):
@@ -510,4 +1068,435 @@ def refit_bvh(nodes: np.ndarray,
                 nodes[i]['max_z'] = max(nodes[i]['max_z'], child_node['max_z'])
 
         i = i - 1
-#endregion
\ No newline at end of file
+#endregion
+#---- Level Ordered BVH              ----#
+# Renumber nodes breadth first, so every #
+# depth is one contiguous block. Each    #
+# level can then be refit in one batch.  #
+#----------------------------------------#
+#region
+@njit(cache=True, nogil=True)
+def order_by_level(nodes: np.ndarray, node_count: int) -> np.ndarray:
+    """
+        Renumber the reachable nodes breadth first, in place.
+        Siblings stay side by side and children still come after
+        their parents, so traversal and refit_bvh don't change.
+
+        Note that a node's descendants are no longer contiguous,
+        so rebuild_subtree can't be used on the result.
+
+        Returns level offsets: level i is nodes[offsets[i]:offsets[i + 1]].
+    """
+
+    old_nodes = nodes[:node_count].copy()
+    #queue[new index] = old index
+    queue = np.empty(node_count, dtype = np.int32)
+    queue[0] = 0
+    queue_end = 1
+    offsets = np.empty(node_count + 1, dtype = np.int32)
+    offsets[0] = 0
+    level_count = 0
+    level_start = 0
+
+    while level_start < queue_end:
+
+        level_end = queue_end
+        level_count += 1
+        offsets[level_count] = level_end
+
+        for new_index in range(level_start, level_end):
+            old_index = queue[new_index]
+            copy_node(old_nodes, old_index, nodes, new_index)
+            if old_nodes[old_index]['sphere_count'] == 0:
+                child = int(old_nodes[old_index]['contents'])
+                nodes[new_index]['contents'] = queue_end
+                queue[queue_end] = child
+                queue[queue_end + 1] = child + 1
+                queue_end += 2
+        
+        level_start = level_end
+    
+    #anything past the reachable nodes is cleared
+    node.reset_nodes(nodes, queue_end, node_count - queue_end)
+
+    return offsets[:level_count + 1].copy()
+
+def refit_bvh_levels(nodes: np.ndarray, 
+    primitives: np.ndarray,
+    sphere_ids: np.ndarray,
+    level_offsets: np.ndarray) -> None:
+    """
+        refit_bvh for a level ordered tree: all the leaves in
+        parallel, then each level of internal nodes, deepest
+        first, in parallel.
+    """
+
+    refit_levels(nodes, primitive_bounds(primitives), sphere_ids, level_offsets)
+
+@njit(cache=True, parallel=True)
+def refit_levels(nodes: np.ndarray, 
+    bounds: np.ndarray,
+    sphere_ids: np.ndarray,
+    level_offsets: np.ndarray) -> None:
+
+    node_count = level_offsets[-1]
+
+    for i in prange(node_count):
+
+        count = int(nodes[i]['sphere_count'])
+        if count == 0:
+            continue
+        first = int(nodes[i]['contents'])
+
+        min_x = np.float32(1e10)
+        min_y = np.float32(1e10)
+        min_z = np.float32(1e10)
+        max_x = np.float32(-1e10)
+        max_y = np.float32(-1e10)
+        max_z = np.float32(-1e10)
+        for j in range(count):
+            primitive = bounds[sphere_ids[first + j]]
+            min_x = min(min_x, primitive['min_x'])
+            min_y = min(min_y, primitive['min_y'])
+            min_z = min(min_z, primitive['min_z'])
+            max_x = max(max_x, primitive['max_x'])
+            max_y = max(max_y, primitive['max_y'])
+            max_z = max(max_z, primitive['max_z'])
+        
+        nodes[i]['min_x'] = min_x
+        nodes[i]['min_y'] = min_y
+        nodes[i]['min_z'] = min_z
+        nodes[i]['max_x'] = max_x
+        nodes[i]['max_y'] = max_y
+        nodes[i]['max_z'] = max_z
+    
+    for level in range(len(level_offsets) - 2, -1, -1):
+        for i in prange(level_offsets[level], level_offsets[level + 1]):
+
+            if nodes[i]['sphere_count'] > 0:
+                continue
+            left = int(nodes[i]['contents'])
+            right = left + 1
+
+            nodes[i]['min_x'] = min(nodes[left]['min_x'], nodes[right]['min_x'])
+            nodes[i]['min_y'] = min(nodes[left]['min_y'], nodes[right]['min_y'])
+            nodes[i]['min_z'] = min(nodes[left]['min_z'], nodes[right]['min_z'])
+            nodes[i]['max_x'] = max(nodes[left]['max_x'], nodes[right]['max_x'])
+            nodes[i]['max_y'] = max(nodes[left]['max_y'], nodes[right]['max_y'])
+            nodes[i]['max_z'] = max(nodes[left]['max_z'], nodes[right]['max_z'])
+
+def refit_bvh_levels_numpy(nodes: np.ndarray, 
+    primitives: np.ndarray,
+    sphere_ids: np.ndarray,
+    level_offsets: np.ndarray) -> None:
+    """
+        The same refit, written as whole-array numpy reductions
+        over the node fields, one batch per level.
+    """
+
+    bounds = primitive_bounds(primitives)
+
+    node_count = level_offsets[-1]
+    counts = nodes['sphere_count'][:node_count]
+    contents = nodes['contents'][:node_count]
+    fields = (
+        ('min_x', np.minimum), ('min_y', np.minimum), ('min_z', np.minimum), 
+        ('max_x', np.maximum), ('max_y', np.maximum), ('max_z', np.maximum))
+
+    #leaves: reduce over each leaf's run of spheres
+    leaves = np.nonzero(counts > 0)[0]
+    order = np.argsort(contents[leaves], kind = 'stable')
+    leaves = leaves[order]
+    starts = contents[leaves]
+    covered = sphere_ids[starts[0] : starts[-1] + counts[leaves[-1]]]
+    for field, reduce in fields:
+        nodes[field][leaves] = reduce.reduceat(
+            bounds[field][covered], starts - starts[0])
+
+    #internal nodes: pairwise reduction of the children, deepest level first
+    for level in range(len(level_offsets) - 2, -1, -1):
+        first = level_offsets[level]
+        level_counts = counts[first : level_offsets[level + 1]]
+        internal = first + np.nonzero(level_counts == 0)[0]
+        if len(internal) == 0:
+            continue
+        left = contents[internal]
+        for field, reduce in fields:
+            column = nodes[field]
+            column[internal] = reduce(column[left], column[left + 1])
+#endregion
+#---- BVH Quality                    ----#
+# Same cost as subdivide and print_node: #
+# sphere count (two for internal nodes)  #
+# times half the surface area.           #
+#----------------------------------------#
+#region
+@njit(cache = True)
+def node_cost(nodes: np.ndarray, i: int) -> float:
+
+    count = int(nodes[i]['sphere_count'])
+    if count == 0:
+        count = 2
+    e_x = nodes[i]['max_x'] - nodes[i]['min_x']
+    e_y = nodes[i]['max_y'] - nodes[i]['min_y']
+    e_z = nodes[i]['max_z'] - nodes[i]['min_z']
+
+    return count * (e_x * e_y + e_y * e_z + e_x * e_z)
+
+@njit(cache = True)
+def measure_subtrees(nodes: np.ndarray, 
+    node_count: int,
+    costs: np.ndarray,
+    firsts: np.ndarray, 
+    counts: np.ndarray,
+    sizes: np.ndarray,
+    depths: np.ndarray) -> float:
+    """
+        Fill in, for every node: the total cost of its subtree,
+        the sphere range it covers, how many nodes hang below it
+        and its depth (-1 if it's unreachable from the root).
+
+        Returns the cost of the whole tree.
+    """
+
+    #top down, parents always come before their children
+    depths[:node_count] = -1
+    depths[0] = 0
+    for i in range(node_count):
+        if depths[i] >= 0 and nodes[i]['sphere_count'] == 0:
+            child = int(nodes[i]['contents'])
+            depths[child] = depths[i] + 1
+            depths[child + 1] = depths[i] + 1
+
+    #bottom up
+    i = node_count - 1
+    for _ in range(node_count):
+
+        costs[i] = node_cost(nodes, i)
+        count = int(nodes[i]['sphere_count'])
+        if count > 0:
+            firsts[i] = nodes[i]['contents']
+            counts[i] = count
+            sizes[i] = 0
+        else:
+            left = int(nodes[i]['contents'])
+            right = left + 1
+            costs[i] += costs[left] + costs[right]
+            firsts[i] = firsts[left]
+            counts[i] = counts[left] + counts[right]
+            sizes[i] = 2 + sizes[left] + sizes[right]
+
+        i = i - 1
+
+    return costs[0]
+
+@njit(cache = True, nogil = True)
+def rebuild_subtree(nodes: np.ndarray, 
+    bounds: np.ndarray,
+    sphere_ids: np.ndarray,
+    root_index: int,
+    first: int, count: int, 
+    descendant_count: int) -> bool:
+    """
+        Rebuild the subtree under an internal node in place.
+        Descendants of a node always sit in one contiguous block,
+        starting at its left child, so the new subtree is written
+        over the old one. Leftover slots become unreachable.
+
+        Returns False, leaving the tree untouched, if the new
+        subtree doesn't fit in the old one's space.
+    """
+
+    local_nodes = node.make_nodes(2 * count)
+    local_nodes[0]['sphere_count'] = count
+    local_nodes[0]['contents'] = first
+    update_bounds(local_nodes, bounds, sphere_ids, 0)
+
+    #the build reorders the ids, keep them in case we back out
+    saved_ids = sphere_ids[first : first + count].copy()
+    used, _ = build_iterative(
+        local_nodes, bounds, sphere_ids, node.make_nodes(50), 
+        1 << 30, np.empty(0, dtype = np.int32))
+    
+    if used - 1 > descendant_count:
+        sphere_ids[first : first + count] = saved_ids
+        return False
+    
+    offset = int(nodes[root_index]['contents']) - 1
+    copy_node(local_nodes, 0, nodes, root_index)
+    for i in range(1, used):
+        copy_node(local_nodes, i, nodes, offset + i)
+    for i in range(used):
+        target = root_index if i == 0 else offset + i
+        if nodes[target]['sphere_count'] == 0:
+            nodes[target]['contents'] += offset
+    
+    return True
+#endregion
+#---- Wide BVH                       ----#
+# Collapse the binary tree into one with #
+# 4 or 8 children per node, so a ray    #
+# tests several boxes per node fetched   #
+# and walks a much shallower tree.       #
+#----------------------------------------#
+#region
+def make_wide_nodes(nodes: np.ndarray, width: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+        Allocate enough wide nodes for any tree over the given
+        binary nodes, and the map back to the binary nodes each
+        child slot was taken from.
+    """
+
+    capacity = max(1, (len(nodes) + 1) // 2)
+    wide_nodes = np.zeros(capacity, dtype = make_wide_node_type(width))
+    sources = np.full((capacity, width), -1, dtype = np.int32)
+
+    return (wide_nodes, sources)
+
+@njit(cache = True, nogil = True)
+def collapse_bvh(nodes: np.ndarray, 
+    wide_nodes: np.ndarray,
+    sources: np.ndarray) -> int:
+    """
+        Build a wide bvh from the binary tree. Each wide node
+        starts with a binary node's two children, then keeps
+        swapping the biggest internal child for its children
+        until it's full. Wide nodes are numbered breadth first.
+
+        Returns the number of wide nodes used.
+    """
+
+    width = sources.shape[1]
+    #queue[wide node] = binary node it was opened from
+    queue = np.empty(len(wide_nodes), dtype = np.int32)
+    queue[0] = 0
+    queue_end = 1
+    children = np.empty(width, dtype = np.int32)
+
+    for i in range(len(wide_nodes)):
+
+        if i == queue_end:
+            break
+
+        root = queue[i]
+        if nodes[root]['sphere_count'] > 0:
+            #a single leaf tree
+            children[0] = root
+            child_count = 1
+        else:
+            children[0] = nodes[root]['contents']
+            children[1] = nodes[root]['contents'] + 1
+            child_count = 2
+
+        while child_count < width:
+
+            best = -1
+            best_area = -1.0
+            for j in range(child_count):
+                if nodes[children[j]]['sphere_count'] == 0:
+                    area = node_cost(nodes, children[j]) / 2
+                    if area > best_area:
+                        best = j
+                        best_area = area
+
+            if best < 0:
+                break
+
+            contents = nodes[children[best]]['contents']
+            children[best] = contents
+            children[child_count] = contents + 1
+            child_count += 1
+
+        for j in range(width):
+
+            if j >= child_count:
+                sources[i, j] = -1
+                wide_nodes[i]['child'][j] = -1
+                wide_nodes[i]['count'][j] = -1
+                continue
+
+            child = children[j]
+            sources[i, j] = child
+            count = nodes[child]['sphere_count']
+            if count > 0:
+                wide_nodes[i]['child'][j] = nodes[child]['contents']
+                wide_nodes[i]['count'][j] = count
+            else:
+                wide_nodes[i]['child'][j] = queue_end
+                wide_nodes[i]['count'][j] = 0
+                queue[queue_end] = child
+                queue_end += 1
+
+    refit_wide_bvh(nodes, wide_nodes, sources, queue_end)
+
+    return queue_end
+
+@njit(cache = True, parallel = True, nogil = True)
+def refit_wide_bvh(nodes: np.ndarray, 
+    wide_nodes: np.ndarray,
+    sources: np.ndarray,
+    wide_count: int) -> None:
+    """
+        Copy the (already refit) binary bounds into the wide
+        nodes. Only valid until the binary tree's shape changes.
+    """
+
+    width = sources.shape[1]
+    for i in prange(wide_count):
+        for j in range(width):
+
+            source = sources[i, j]
+            if source < 0:
+                wide_nodes[i]['min_x'][j] = 1e10
+                wide_nodes[i]['min_y'][j] = 1e10
+                wide_nodes[i]['min_z'][j] = 1e10
+                wide_nodes[i]['max_x'][j] = -1e10
+                wide_nodes[i]['max_y'][j] = -1e10
+                wide_nodes[i]['max_z'][j] = -1e10
+            else:
+                wide_nodes[i]['min_x'][j] = nodes[source]['min_x']
+                wide_nodes[i]['min_y'][j] = nodes[source]['min_y']
+                wide_nodes[i]['min_z'][j] = nodes[source]['min_z']
+                wide_nodes[i]['max_x'][j] = nodes[source]['max_x']
+                wide_nodes[i]['max_y'][j] = nodes[source]['max_y']
+                wide_nodes[i]['max_z'][j] = nodes[source]['max_z']
+
+@njit(cache = True)
+def bvh_depth(nodes: np.ndarray) -> int:
+    """
+        Levels below the root of a binary tree. Traversal
+        pushes at most one node per level.
+    """
+
+    depths = np.zeros(len(nodes), dtype = np.int32)
+    deepest = 0
+    stack = [0]
+    while len(stack) > 0:
+        i = stack.pop()
+        if nodes[i]['sphere_count'] == 0:
+            child = nodes[i]['contents']
+            for j in range(2):
+                depths[child + j] = depths[i] + 1
+                stack.append(child + j)
+        deepest = max(deepest, depths[i])
+    
+    return deepest
+
+@njit(cache = True)
+def wide_bvh_depth(wide_nodes: np.ndarray, wide_count: int) -> int:
+    """
+        Levels below the root of a wide tree. Traversal pushes
+        at most width - 1 nodes per level.
+    """
+
+    depths = np.zeros(wide_count, dtype = np.int32)
+    deepest = 0
+    #breadth first, so children always come after their parent
+    for i in range(wide_count):
+        deepest = max(deepest, depths[i])
+        for j in range(len(wide_nodes[i]['count'])):
+            if wide_nodes[i]['count'][j] == 0:
+                depths[wide_nodes[i]['child'][j]] = depths[i] + 1
+    
+    return deepest
+#endregion
@@ -0,0 +1,173 @@
+from config import *
+import collections
+import bvh_backend
+
+class RebuildScheduler:
+    """
+        Decides when a refitted bvh has degraded enough to be
+        worth rebuilding, by comparing its SAH cost against
+        the cost it had just after its last build.
+    """
+
+    def __init__(self, node_count: int,
+        rebuild_ratio: float = 2.0,
+        partial_rebuild: bool = False,
+        partial_ratio: float = 1.5,
+        partial_depth: int = 3,
+        history: int = 600):
+        """
+            Parameters:
+                node_count (int): size of the node arrays
+                rebuild_ratio (float): rebuild the whole tree once its
+                    cost grows past this multiple of the built cost
+                partial_rebuild (bool): first try rebuilding just the
+                    subtrees that have degraded the most
+                partial_ratio (float): degradation at which a subtree
+                    is rebuilt
+                partial_depth (int): depth of the candidate subtrees
+                history (int): how many frames of metrics to keep
+        """
+
+        self.rebuild_ratio = rebuild_ratio
+        self.partial_rebuild = partial_rebuild
+        self.partial_ratio = partial_ratio
+        self.partial_depth = partial_depth
+
+        self.costs = np.zeros(node_count, dtype = np.float64)
+        self.built_costs = np.zeros(node_count, dtype = np.float64)
+        self.firsts = np.zeros(node_count, dtype = np.int32)
+        self.counts = np.zeros(node_count, dtype = np.int32)
+        self.sizes = np.zeros(node_count, dtype = np.int32)
+        self.depths = np.zeros(node_count, dtype = np.int32)
+
+        self.built_cost = 0.0
+        self.frame = 0
+        self.metrics: collections.deque[dict] = collections.deque(maxlen = history)
+
+    def measure(self, nodes: np.ndarray, node_count: int) -> float:
+        """
+            Returns the SAH cost of the tree.
+        """
+
+        return bvh_backend.measure_subtrees(
+            nodes, node_count, self.costs, self.firsts,
+            self.counts, self.sizes, self.depths)
+
+    def on_build(self, nodes: np.ndarray, node_count: int) -> None:
+        """
+            Record the quality of a freshly built tree.
+        """
+
+        self.built_cost = float(self.measure(nodes, node_count))
+        self.built_costs[:] = self.costs
+
+    def refit(self, nodes: np.ndarray, spheres: np.ndarray,
+        sphere_ids: np.ndarray, node_count: int, 
+        fresh: bool = False, pending: bool = False,
+        level_offsets: np.ndarray = None) -> str:
+        """
+            Refit the tree, then decide what to do about it.
+
+            Parameters:
+                fresh (bool): the tree has just been swapped in from
+                    a rebuild, take its refitted cost as the new bar
+                pending (bool): a rebuild has been started and
+                    hasn't finished, so another isn't asked for
+                level_offsets: set if the tree is level ordered, it's
+                    then refit a level at a time. Partial rebuilds
+                    need depth first numbering, so are skipped.
+
+            Returns one of:
+                "refit": the tree is still good enough
+                "partial": some subtrees were rebuilt in place
+                "rebuild": the caller should rebuild the whole tree
+                "pending": the tree needs a rebuild, which is
+                    already under way
+                "fresh": a new tree was measured
+        """
+
+        start = time.perf_counter()
+        if level_offsets is None:
+            bvh_backend.refit_bvh(nodes, spheres, sphere_ids, node_count)
+        else:
+            bvh_backend.refit_bvh_levels(nodes, spheres, sphere_ids, level_offsets)
+        refit_ms = 1000 * (time.perf_counter() - start)
+
+        cost = self.measure(nodes, node_count)
+        if fresh:
+            self.built_cost = cost
+            self.built_costs[:] = self.costs
+        ratio = cost / max(self.built_cost, 1e-9)
+
+        decision = "fresh" if fresh else "refit"
+        subtrees = 0
+        if not fresh and self.partial_rebuild and level_offsets is None \
+            and ratio > self.partial_ratio:
+            subtrees = self.rebuild_worst_subtrees(
+                nodes, spheres, sphere_ids, node_count)
+            if subtrees > 0:
+                decision = "partial"
+                cost = float(self.costs[0])
+                ratio = cost / max(self.built_cost, 1e-9)
+
+        if not fresh and ratio > self.rebuild_ratio:
+            decision = "pending" if pending else "rebuild"
+
+        self.metrics.append({
+            "frame": self.frame,
+            "cost": cost,
+            "cost_ratio": ratio,
+            "refit_ms": refit_ms,
+            "decision": decision,
+            "subtrees_rebuilt": subtrees,
+        })
+        self.frame += 1
+
+        return decision
+
+    def rebuild_worst_subtrees(self, nodes: np.ndarray, spheres: np.ndarray,
+        sphere_ids: np.ndarray, node_count: int) -> int:
+        """
+            Rebuild, in place, the subtrees at the candidate depth
+            whose cost has grown the most.
+
+            Returns how many were rebuilt.
+        """
+
+        candidates = np.nonzero(
+            (self.depths[:node_count] == self.partial_depth)
+            & (self.sizes[:node_count] > 0))[0]
+        if len(candidates) == 0:
+            return 0
+
+        ratios = self.costs[candidates] / np.maximum(self.built_costs[candidates], 1e-9)
+        order = np.argsort(-ratios)
+        bounds = bvh_backend.primitive_bounds(spheres)
+
+        rebuilt = []
+        for k in order:
+            if ratios[k] < self.partial_ratio:
+                break
+            i = candidates[k]
+            if bvh_backend.rebuild_subtree(
+                nodes, bounds, sphere_ids, i,
+                self.firsts[i], self.counts[i], self.sizes[i]):
+                rebuilt.append(i)
+
+        if len(rebuilt) > 0:
+            #the rebuilt subtrees set a new bar for the whole tree
+            self.measure(nodes, node_count)
+            for i in rebuilt:
+                self.built_cost += float(self.costs[i] - self.built_costs[i])
+                self.built_costs[i] = self.costs[i]
+
+        return len(rebuilt)
+
+    def latest(self) -> dict:
+        """
+            Metrics for the most recent frame.
+        """
+
+        if len(self.metrics) == 0:
+            return {}
+        return self.metrics[-1]
@@ -0,0 +1,80 @@
+from config import *
+import engine
+import scene
+import cpu_tracer
+
+#---- CPU vs GPU                     ----#
+# Renders one still frame with the       #
+# compute shader and with cpu_tracer, at #
+# a size which isn't square, and counts  #
+# the pixels where they disagree. Needs  #
+# an OpenGL 4.3 context, the window is   #
+# kept hidden.                           #
+#----------------------------------------#
+
+screenWidth = 240
+screenHeight = 120
+#half floats, the sky's filtering and grazing rays on the
+#edges of spheres shift colours a little
+tolerance = 0.2
+maxMismatch = 0.01
+
+class StillEngine(engine.Engine):
+    """
+        Renders each frame from scratch, without the jitter
+        and blending of accumulation.
+    """
+
+    def makeAssets(self, _scene: scene.Scene) -> None:
+
+        self.accumulate = False
+        super().makeAssets(_scene)
+
+def read_gpu_image(graphicsEngine: engine.Engine) -> np.ndarray:
+    """
+        Returns the engine's last frame, as a (height, width, 3)
+        float32 array with row 0 at the bottom.
+    """
+
+    width, height = graphicsEngine.colorBuffer.renderSize
+    pixels = np.zeros((screenHeight, screenWidth, 4), dtype = np.float32)
+    glFinish()
+    glBindTexture(GL_TEXTURE_2D, graphicsEngine.colorBuffer.texture)
+    glGetTexImage(GL_TEXTURE_2D, 0, GL_RGBA, GL_FLOAT, pixels)
+    return pixels[:height, :width, :3]
+
+if __name__ == "__main__":
+
+    glfw.init()
+    glfw.window_hint(GLFW_CONSTANTS.GLFW_CONTEXT_VERSION_MAJOR,4)
+    glfw.window_hint(GLFW_CONSTANTS.GLFW_CONTEXT_VERSION_MINOR,3)
+    glfw.window_hint(
+        GLFW_CONSTANTS.GLFW_OPENGL_PROFILE,
+        GLFW_CONSTANTS.GLFW_OPENGL_CORE_PROFILE
+    )
+    glfw.window_hint(
+        GLFW_CONSTANTS.GLFW_OPENGL_FORWARD_COMPAT,
+        GLFW_CONSTANTS.GLFW_TRUE
+    )
+    glfw.window_hint(GLFW_CONSTANTS.GLFW_VISIBLE, False)
+    window = glfw.create_window(screenWidth, screenHeight, "Compare", None, None)
+    glfw.make_context_current(window)
+
+    myScene = scene.Scene()
+    myScene.animate = False
+    myScene.async_rebuild = False
+
+    graphicsEngine = StillEngine(screenWidth, screenHeight, myScene)
+    graphicsEngine.logResolution = False
+    graphicsEngine.renderScene(myScene)
+    gpuImage = read_gpu_image(graphicsEngine)
+
+    cpuImage, _ = cpu_tracer.render(myScene, screenWidth, screenHeight)
+
+    difference = np.abs(np.clip(gpuImage, 0, 1) - np.clip(cpuImage, 0, 1)).max(axis = 2)
+    mismatch = np.count_nonzero(difference > tolerance) / difference.size
+    print(f"{screenWidth}x{screenHeight}: {100 * mismatch:.2f}% of pixels differ "
+          f"by more than {tolerance}, largest difference {difference.max():.3f}")
+    print("match" if mismatch <= maxMismatch else "MISMATCH")
+
+    glfw.terminate()
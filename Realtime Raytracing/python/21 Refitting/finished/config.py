@@ -6,10 +6,22 @@ import numpy as np
 import pyrr
 import time
 from PIL import Image, ImageOps
-from numba import njit
+import numba
+from numba import njit, prange
 
 np.random.seed(0)
 
+def make_generator(seed: int = None) -> np.random.Generator:
+    """
+        A generator for vectorized random draws. Without a seed,
+        one is drawn from the global state, so np.random.seed
+        still decides the scene.
+    """
+
+    if seed is None:
+        seed = np.random.randint(0, 2**31)
+    return np.random.default_rng(seed)
+
 data_type_sphere = np.dtype({
     'names':   [       'x',        'y',        'z',   'radius',       'vx',       'vy',       'vz', 'material'], 
     'formats': [np.float32, np.float32, np.float32, np.float32, np.float32, np.float32, np.float32,  np.uint32],
@@ -17,13 +29,56 @@ data_type_sphere = np.dtype({
     'itemsize': 32})
 
 data_type_material = np.dtype({
-    'names':   [       'r',        'g',        'b', 'reflectance',      'eta'], 
-    'formats': [np.float32, np.float32, np.float32,    np.float32, np.float32],
-    'offsets': [         0,          4,          8,            12,         16],
+    'names':   [       'r',        'g',        'b', 'reflectance',      'eta', 'roughness'], 
+    'formats': [np.float32, np.float32, np.float32,    np.float32, np.float32,  np.float32],
+    'offsets': [         0,          4,          8,            12,         16,          20],
     'itemsize': 32})
 
 data_type_bvh_node = np.dtype({
     'names':   [   'min_x',    'min_y',    'min_z', 'sphere_count',    'max_x',    'max_y',    'max_z', 'contents'], 
     'formats': [np.float32, np.float32, np.float32,       np.int32, np.float32, np.float32, np.float32,   np.int32],
     'offsets': [         0,          4,          8,             12,         16,         20,         24,         28],
-    'itemsize': 32})
\ No newline at end of file
+    'itemsize': 32})
+
+def make_wide_node_type(width: int) -> np.dtype:
+    """
+        A node of a wide bvh, holding the bounds of up to width
+        children, one array per coordinate. For each child slot,
+        count > 0 is a leaf (child is its first sphere index),
+        count == 0 is another wide node (child is its index) and
+        count < 0 is empty.
+    """
+
+    names = ['min_x', 'min_y', 'min_z', 'max_x', 'max_y', 'max_z', 'child', 'count']
+    formats = [(np.float32, (width,))] * 6 + [(np.int32, (width,))] * 2
+    offsets = [4 * width * i for i in range(8)]
+
+    return np.dtype({
+        'names': names, 'formats': formats, 'offsets': offsets,
+        'itemsize': 32 * width})
+
+data_type_bvh4_node = make_wide_node_type(4)
+data_type_bvh8_node = make_wide_node_type(8)
+
+data_type_triangle = np.dtype({
+    'names':   [     'ax',       'ay',       'az', 'material',       'bx',       'by',       'bz',
+                     'cx',       'cy',       'cz',       'nx',       'ny',       'nz', 'dominant_axis'], 
+    'formats': [np.float32, np.float32, np.float32,   np.uint32, np.float32, np.float32, np.float32,
+                np.float32, np.float32, np.float32, np.float32, np.float32, np.float32,       np.int32],
+    'offsets': [         0,          4,          8,          12,         16,         20,         24,
+                        32,         36,         40,         48,         52,         56,             60],
+    'itemsize': 64})
+
+#Anything the bvh can be built over is first boiled down to these
+data_type_primitive_bounds = np.dtype({
+    'names':   [   'min_x',    'min_y',    'min_z',    'max_x',    'max_y',    'max_z',        'x',        'y',        'z'], 
+    'formats': [np.float32, np.float32, np.float32, np.float32, np.float32, np.float32, np.float32, np.float32, np.float32],
+    'offsets': [         0,          4,          8,         12,         16,         20,         24,         28,         32],
+    'itemsize': 36})
+
+#world_to_object is a 3x4 affine matrix, stored by rows
+data_type_instance = np.dtype({
+    'names':   ['world_to_object',   'root'], 
+    'formats': [(np.float32, (3, 4)), np.int32],
+    'offsets': [                   0,       48],
+    'itemsize': 64})
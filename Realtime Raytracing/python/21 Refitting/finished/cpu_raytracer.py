@@ -0,0 +1,33 @@
+from config import *
+import scene
+import cpu_tracer
+
+#---- Headless Rendering             ----#
+# Renders the scene on the cpu, without  #
+# opening a window. Handy for render     #
+# nodes and CI, where there's no GPU.    #
+#----------------------------------------#
+
+screenWidth = 800
+screenHeight = 600
+frameCount = 4
+outputPath = "cpu_render.png"
+
+if __name__ == "__main__":
+
+    myScene = scene.Scene()
+    #render_tiles and the rebuild thread would both want the
+    #numba thread pool, so rebuild between frames instead.
+    myScene.async_rebuild = False
+    sky = cpu_tracer.load_sky("gfx/sky")
+
+    #The first frame pays for compilation
+    cpu_tracer.render(myScene, 8, 8, sky)
+
+    for _ in range(frameCount):
+        myScene.update(1.0)
+        image, stats = cpu_tracer.render(myScene, screenWidth, screenHeight, sky)
+        print(f"cpu render took {stats['seconds'] * 1000} ms, "
+              f"{stats['rays_per_second'] / 1e6} million rays per second.")
+
+    cpu_tracer.save_image(image, outputPath)
@@ -0,0 +1,797 @@
+from config import *
+#---- CPU Ray Tracing                ----#
+# A compiled port of shaders/rayTracer,  #
+# walking the same node, sphere, index   #
+# and material arrays. Lets us render    #
+# on machines with no GPU at all.        #
+#----------------------------------------#
+
+#Shared with the shader
+MAX_BOUNCES = 2
+RAY_STACK_SIZE = 4
+NODE_STACK_SIZE = 64
+ambient = np.array((176.0 / 255, 1.0, 188.0 / 255), dtype = np.float32)
+
+#---- Sky                            ----#
+#region
+def load_sky(filepath: str) -> np.ndarray:
+    """
+        Load the six faces of a cubemap, in OpenGL face order
+        (+x, -x, +y, -y, +z, -z), applying the same flips and
+        rotations as materials.CubeMapMaterial.
+
+        Returns an empty array if the faces can't be found,
+        in which case the ambient colour is used as the sky.
+    """
+
+    face_files = (
+        ("front", lambda img: img.rotate(90)),
+        ("back", lambda img: img.rotate(-90)),
+        ("right", lambda img: ImageOps.mirror(ImageOps.flip(img))),
+        ("left", lambda img: img),
+        ("top", lambda img: img.rotate(90)),
+        ("bottom", lambda img: img),
+    )
+
+    faces = []
+    try:
+        for name, transform in face_files:
+            with Image.open(f"{filepath}_{name}.png", mode = "r") as img:
+                img = transform(img).convert('RGB')
+                faces.append(np.asarray(img, dtype = np.float32) / 255.0)
+    except FileNotFoundError:
+        return np.zeros((0, 0, 0, 3), dtype = np.float32)
+
+    return np.ascontiguousarray(np.stack(faces))
+
+@njit(cache = True)
+def sample_sky(sky: np.ndarray,
+    d_x: float, d_y: float, d_z: float) -> tuple[float, float, float]:
+    """
+        Nearest neighbour cubemap lookup, following the face
+        selection rules of the OpenGL spec.
+    """
+
+    if sky.shape[0] == 0:
+        return (ambient[0], ambient[1], ambient[2])
+
+    a_x = abs(d_x)
+    a_y = abs(d_y)
+    a_z = abs(d_z)
+
+    if a_x >= a_y and a_x >= a_z:
+        major = a_x
+        if d_x > 0:
+            face, sc, tc = 0, -d_z, -d_y
+        else:
+            face, sc, tc = 1, d_z, -d_y
+    elif a_y >= a_z:
+        major = a_y
+        if d_y > 0:
+            face, sc, tc = 2, d_x, d_z
+        else:
+            face, sc, tc = 3, d_x, -d_z
+    else:
+        major = a_z
+        if d_z > 0:
+            face, sc, tc = 4, d_x, -d_y
+        else:
+            face, sc, tc = 5, -d_x, -d_y
+
+    if major == 0:
+        return (ambient[0], ambient[1], ambient[2])
+
+    height = sky.shape[1]
+    width = sky.shape[2]
+    s = 0.5 * (sc / major + 1.0)
+    t = 0.5 * (tc / major + 1.0)
+    column = max(0, min(width - 1, int(s * width)))
+    row = max(0, min(height - 1, int(t * height)))
+
+    return (sky[face, row, column, 0],
+            sky[face, row, column, 1],
+            sky[face, row, column, 2])
+#endregion
+#---- Intersection Tests             ----#
+#region
+@njit(cache = True)
+def hit_sphere(o_x: float, o_y: float, o_z: float,
+    d_x: float, d_y: float, d_z: float,
+    sphere: np.record, t_min: float, t_max: float) -> tuple[float, bool]:
+    """
+        Returns the distance to the sphere and whether the
+        backface was hit, or a negative distance on a miss.
+    """
+
+    co_x = o_x - sphere['x']
+    co_y = o_y - sphere['y']
+    co_z = o_z - sphere['z']
+    r = sphere['radius']
+
+    a = d_x * d_x + d_y * d_y + d_z * d_z
+    b = 2 * (d_x * co_x + d_y * co_y + d_z * co_z)
+    c = co_x * co_x + co_y * co_y + co_z * co_z - r * r
+    discriminant = b * b - 4 * a * c
+
+    if discriminant > 0.0:
+        root = np.sqrt(discriminant)
+        t1 = (-b - root) / (2 * a)
+        if t1 > t_min and t1 < t_max:
+            return (t1, False)
+        t2 = (-b + root) / (2 * a)
+        if t2 > t_min and t2 < t_max:
+            return (t2, True)
+
+    return (-1.0, False)
+
+@njit(cache = True)
+def hit_node(o_x: float, o_y: float, o_z: float,
+    inv_x: float, inv_y: float, inv_z: float,
+    node: np.record, nearest_hit: float) -> float:
+    """
+        Slab test, returns the entry distance or a huge
+        number on a miss.
+    """
+
+    t_min_x = (node['min_x'] - o_x) * inv_x
+    t_max_x = (node['max_x'] - o_x) * inv_x
+    t_min_y = (node['min_y'] - o_y) * inv_y
+    t_max_y = (node['max_y'] - o_y) * inv_y
+    t_min_z = (node['min_z'] - o_z) * inv_z
+    t_max_z = (node['max_z'] - o_z) * inv_z
+
+    t_near = max(max(min(t_min_x, t_max_x), min(t_min_y, t_max_y)),
+                 min(t_min_z, t_max_z))
+    t_far = min(min(max(t_min_x, t_max_x), max(t_min_y, t_max_y)),
+                max(t_min_z, t_max_z))
+
+    if t_near <= t_far and t_far > 0 and t_near < nearest_hit:
+        return t_near
+    return 999999999.0
+
+@njit(cache = True)
+def safe_inverse(x: float) -> float:
+
+    if abs(x) < 1e-20:
+        if x < 0:
+            return -1e20
+        return 1e20
+    return 1.0 / x
+
+@njit(cache = True)
+def trace(nodes: np.ndarray,
+    spheres: np.ndarray,
+    sphere_ids: np.ndarray,
+    o_x: float, o_y: float, o_z: float,
+    d_x: float, d_y: float, d_z: float,
+    stack: np.ndarray) -> tuple[bool, float, int, bool]:
+    """
+        Find the closest hit along a ray, returns
+        (hit, t, sphere index, backface).
+    """
+
+    inv_x = safe_inverse(d_x)
+    inv_y = safe_inverse(d_y)
+    inv_z = safe_inverse(d_z)
+
+    nearest_hit = 9999999.0
+    hit_something = False
+    hit_index = -1
+    hit_backface = False
+
+    node_index = 0
+    stack_pos = 0
+
+    while True:
+
+        _node = nodes[node_index]
+        contents = int(_node['contents'])
+        sphere_count = int(_node['sphere_count'])
+
+        if sphere_count > 0:
+
+            for i in range(sphere_count):
+
+                sphere_index = sphere_ids[contents + i]
+                t, backface = hit_sphere(
+                    o_x, o_y, o_z, d_x, d_y, d_z,
+                    spheres[sphere_index], 0.001, nearest_hit)
+
+                if t > 0:
+                    nearest_hit = t
+                    hit_something = True
+                    hit_index = sphere_index
+                    hit_backface = backface
+
+            if stack_pos == 0:
+                break
+            stack_pos -= 1
+            node_index = stack[stack_pos]
+            continue
+
+        left_index = contents
+        right_index = contents + 1
+        dist1 = hit_node(o_x, o_y, o_z, inv_x, inv_y, inv_z, nodes[left_index], nearest_hit)
+        dist2 = hit_node(o_x, o_y, o_z, inv_x, inv_y, inv_z, nodes[right_index], nearest_hit)
+
+        if dist1 > dist2:
+            left_index, right_index = right_index, left_index
+            dist1, dist2 = dist2, dist1
+
+        if dist1 > nearest_hit:
+            if stack_pos == 0:
+                break
+            stack_pos -= 1
+            node_index = stack[stack_pos]
+        else:
+            node_index = left_index
+            if dist2 <= nearest_hit and stack_pos < stack.shape[0]:
+                stack[stack_pos] = right_index
+                stack_pos += 1
+
+    return (hit_something, nearest_hit, hit_index, hit_backface)
+
+@njit(cache = True)
+def hit_box(o_x: float, o_y: float, o_z: float,
+    inv_x: float, inv_y: float, inv_z: float,
+    wide_node: np.record, j: int, nearest_hit: float) -> float:
+    """
+        hit_node, for child j of a wide node.
+    """
+
+    t_min_x = (wide_node['min_x'][j] - o_x) * inv_x
+    t_max_x = (wide_node['max_x'][j] - o_x) * inv_x
+    t_min_y = (wide_node['min_y'][j] - o_y) * inv_y
+    t_max_y = (wide_node['max_y'][j] - o_y) * inv_y
+    t_min_z = (wide_node['min_z'][j] - o_z) * inv_z
+    t_max_z = (wide_node['max_z'][j] - o_z) * inv_z
+
+    t_near = max(max(min(t_min_x, t_max_x), min(t_min_y, t_max_y)),
+                 min(t_min_z, t_max_z))
+    t_far = min(min(max(t_min_x, t_max_x), max(t_min_y, t_max_y)),
+                max(t_min_z, t_max_z))
+
+    if t_near <= t_far and t_far > 0 and t_near < nearest_hit:
+        return t_near
+    return 999999999.0
+
+@njit(cache = True)
+def trace_wide(wide_nodes: np.ndarray,
+    spheres: np.ndarray,
+    sphere_ids: np.ndarray,
+    o_x: float, o_y: float, o_z: float,
+    d_x: float, d_y: float, d_z: float,
+    stack: np.ndarray) -> tuple[bool, float, int, bool]:
+    """
+        trace, through a wide bvh. Every child box of a node is
+        tested at once: leaves are opened straight away, the
+        rest are visited nearest first.
+    """
+
+    inv_x = safe_inverse(d_x)
+    inv_y = safe_inverse(d_y)
+    inv_z = safe_inverse(d_z)
+
+    nearest_hit = 9999999.0
+    hit_something = False
+    hit_index = -1
+    hit_backface = False
+
+    width = len(wide_nodes[0]['count'])
+    order = np.empty(width, dtype = np.int32)
+    distances = np.empty(width, dtype = np.float32)
+
+    node_index = 0
+    stack_pos = 0
+
+    while True:
+
+        wide_node = wide_nodes[node_index]
+        hits = 0
+
+        for j in range(width):
+
+            count = wide_node['count'][j]
+            if count < 0:
+                continue
+
+            distance = hit_box(o_x, o_y, o_z, inv_x, inv_y, inv_z,
+                wide_node, j, nearest_hit)
+            if distance > nearest_hit:
+                continue
+
+            if count > 0:
+                contents = wide_node['child'][j]
+                for i in range(count):
+
+                    sphere_index = sphere_ids[contents + i]
+                    t, backface = hit_sphere(
+                        o_x, o_y, o_z, d_x, d_y, d_z,
+                        spheres[sphere_index], 0.001, nearest_hit)
+
+                    if t > 0:
+                        nearest_hit = t
+                        hit_something = True
+                        hit_index = sphere_index
+                        hit_backface = backface
+                continue
+
+            #insertion sort, nearest first
+            k = hits
+            while k > 0 and distances[k - 1] > distance:
+                distances[k] = distances[k - 1]
+                order[k] = order[k - 1]
+                k -= 1
+            distances[k] = distance
+            order[k] = wide_node['child'][j]
+            hits += 1
+
+        if hits == 0:
+            if stack_pos == 0:
+                break
+            stack_pos -= 1
+            node_index = stack[stack_pos]
+            continue
+
+        for k in range(hits - 1, 0, -1):
+            if stack_pos < stack.shape[0]:
+                stack[stack_pos] = order[k]
+                stack_pos += 1
+        node_index = order[0]
+
+    return (hit_something, nearest_hit, hit_index, hit_backface)
+
+@njit(cache = True)
+def hit_triangle(o_x: float, o_y: float, o_z: float,
+    d_x: float, d_y: float, d_z: float,
+    triangle: np.record, t_min: float, t_max: float) -> float:
+    """
+        Moller-Trumbore test, returns the distance to the
+        triangle or a negative distance on a miss.
+    """
+
+    e1_x = triangle['bx'] - triangle['ax']
+    e1_y = triangle['by'] - triangle['ay']
+    e1_z = triangle['bz'] - triangle['az']
+    e2_x = triangle['cx'] - triangle['ax']
+    e2_y = triangle['cy'] - triangle['ay']
+    e2_z = triangle['cz'] - triangle['az']
+
+    p_x = d_y * e2_z - d_z * e2_y
+    p_y = d_z * e2_x - d_x * e2_z
+    p_z = d_x * e2_y - d_y * e2_x
+    determinant = e1_x * p_x + e1_y * p_y + e1_z * p_z
+    if abs(determinant) < 1e-12:
+        return -1.0
+    inv_determinant = 1.0 / determinant
+
+    s_x = o_x - triangle['ax']
+    s_y = o_y - triangle['ay']
+    s_z = o_z - triangle['az']
+    u = (s_x * p_x + s_y * p_y + s_z * p_z) * inv_determinant
+    if u < 0.0 or u > 1.0:
+        return -1.0
+
+    q_x = s_y * e1_z - s_z * e1_y
+    q_y = s_z * e1_x - s_x * e1_z
+    q_z = s_x * e1_y - s_y * e1_x
+    v = (d_x * q_x + d_y * q_y + d_z * q_z) * inv_determinant
+    if v < 0.0 or u + v > 1.0:
+        return -1.0
+
+    t = (e2_x * q_x + e2_y * q_y + e2_z * q_z) * inv_determinant
+    if t > t_min and t < t_max:
+        return t
+    return -1.0
+
+@njit(cache = True)
+def trace_triangles(nodes: np.ndarray,
+    triangles: np.ndarray,
+    triangle_ids: np.ndarray,
+    o_x: float, o_y: float, o_z: float,
+    d_x: float, d_y: float, d_z: float,
+    stack: np.ndarray) -> tuple[bool, float, int]:
+    """
+        Find the closest hit along a ray through a triangle
+        mesh's bvh, returns (hit, t, triangle index).
+    """
+
+    inv_x = safe_inverse(d_x)
+    inv_y = safe_inverse(d_y)
+    inv_z = safe_inverse(d_z)
+
+    nearest_hit = 9999999.0
+    hit_something = False
+    hit_index = -1
+
+    node_index = 0
+    stack_pos = 0
+
+    while True:
+
+        _node = nodes[node_index]
+        contents = int(_node['contents'])
+        triangle_count = int(_node['sphere_count'])
+
+        if triangle_count > 0:
+
+            for i in range(triangle_count):
+
+                triangle_index = triangle_ids[contents + i]
+                t = hit_triangle(
+                    o_x, o_y, o_z, d_x, d_y, d_z,
+                    triangles[triangle_index], 0.001, nearest_hit)
+
+                if t > 0:
+                    nearest_hit = t
+                    hit_something = True
+                    hit_index = triangle_index
+
+            if stack_pos == 0:
+                break
+            stack_pos -= 1
+            node_index = stack[stack_pos]
+            continue
+
+        left_index = contents
+        right_index = contents + 1
+        dist1 = hit_node(o_x, o_y, o_z, inv_x, inv_y, inv_z, nodes[left_index], nearest_hit)
+        dist2 = hit_node(o_x, o_y, o_z, inv_x, inv_y, inv_z, nodes[right_index], nearest_hit)
+
+        if dist1 > dist2:
+            left_index, right_index = right_index, left_index
+            dist1, dist2 = dist2, dist1
+
+        if dist1 > nearest_hit:
+            if stack_pos == 0:
+                break
+            stack_pos -= 1
+            node_index = stack[stack_pos]
+        else:
+            node_index = left_index
+            if dist2 <= nearest_hit and stack_pos < stack.shape[0]:
+                stack[stack_pos] = right_index
+                stack_pos += 1
+
+    return (hit_something, nearest_hit, hit_index)
+#endregion
+#---- Ray-Surface Interactions       ----#
+#region
+@njit(cache = True)
+def shade_pixel(nodes: np.ndarray,
+    spheres: np.ndarray,
+    sphere_ids: np.ndarray,
+    materials: np.ndarray,
+    sky: np.ndarray,
+    o_x: float, o_y: float, o_z: float,
+    d_x: float, d_y: float, d_z: float,
+    rays: np.ndarray, node_stack: np.ndarray,
+    pixel: np.ndarray) -> int:
+    """
+        Trace a primary ray and all of its reflections and
+        refractions, accumulating into pixel.
+        Returns the number of rays traced.
+
+        Each row of rays holds a pending reflection ray:
+        (origin xyz, direction xyz, energy rgb, depth).
+    """
+
+    pixel[:] = 0.0
+    e_r = 1.0
+    e_g = 1.0
+    e_b = 1.0
+    depth = 0
+    early_exit = False
+
+    ray_count = 0
+    stack_pos = 0
+    while True:
+
+        hit = False
+        if not early_exit:
+            hit, t, index, backface = trace(
+                nodes, spheres, sphere_ids,
+                o_x, o_y, o_z, d_x, d_y, d_z, node_stack)
+            ray_count += 1
+
+        if hit:
+            sphere = spheres[index]
+            material = materials[sphere['material']]
+
+            h_x = o_x + t * d_x
+            h_y = o_y + t * d_y
+            h_z = o_z + t * d_z
+            n_x = h_x - sphere['x']
+            n_y = h_y - sphere['y']
+            n_z = h_z - sphere['z']
+            length = np.sqrt(n_x * n_x + n_y * n_y + n_z * n_z)
+            n_x /= length
+            n_y /= length
+            n_z /= length
+
+            if backface:
+                n_x = -n_x
+                n_y = -n_y
+                n_z = -n_z
+                eta = 1.0 / material['eta']
+            else:
+                eta = material['eta']
+
+                #spawn a reflection ray
+                i_dot_n = d_x * n_x + d_y * n_y + d_z * n_z
+                r_x = d_x - 2.0 * i_dot_n * n_x
+                r_y = d_y - 2.0 * i_dot_n * n_y
+                r_z = d_z - 2.0 * i_dot_n * n_z
+                length = np.sqrt(r_x * r_x + r_y * r_y + r_z * r_z)
+                if depth + 1 < MAX_BOUNCES and stack_pos < RAY_STACK_SIZE:
+                    reflectance = material['reflectance']
+                    rays[stack_pos, 0] = h_x
+                    rays[stack_pos, 1] = h_y
+                    rays[stack_pos, 2] = h_z
+                    rays[stack_pos, 3] = r_x / length
+                    rays[stack_pos, 4] = r_y / length
+                    rays[stack_pos, 5] = r_z / length
+                    rays[stack_pos, 6] = e_r * reflectance
+                    rays[stack_pos, 7] = e_g * reflectance
+                    rays[stack_pos, 8] = e_b * reflectance
+                    rays[stack_pos, 9] = depth + 1
+                    stack_pos += 1
+
+            #the sphere tints the ray as it passes through
+            transmittance = 1.0 - material['reflectance']
+            e_r = transmittance * e_r * material['r']
+            e_g = transmittance * e_g * material['g']
+            e_b = transmittance * e_b * material['b']
+
+            #refract, as GLSL's refract does
+            i_dot_n = d_x * n_x + d_y * n_y + d_z * n_z
+            k = 1.0 - eta * eta * (1.0 - i_dot_n * i_dot_n)
+            o_x = h_x
+            o_y = h_y
+            o_z = h_z
+            if k < 0.0:
+                #total internal reflection, glsl hands back a zero vector
+                d_x = 0.0
+                d_y = 0.0
+                d_z = 0.0
+                early_exit = True
+            else:
+                factor = eta * i_dot_n + np.sqrt(k)
+                d_x = eta * d_x - factor * n_x
+                d_y = eta * d_y - factor * n_y
+                d_z = eta * d_z - factor * n_z
+                length = np.sqrt(d_x * d_x + d_y * d_y + d_z * d_z)
+                if length < 0.000001:
+                    early_exit = True
+                else:
+                    d_x /= length
+                    d_y /= length
+                    d_z /= length
+
+            if not backface:
+                depth += 1
+                early_exit = early_exit or depth >= MAX_BOUNCES
+            continue
+
+        #miss, or the ray gave up early
+        s_r, s_g, s_b = sample_sky(sky, d_x, d_y, d_z)
+        pixel[0] += e_r * s_r
+        pixel[1] += e_g * s_g
+        pixel[2] += e_b * s_b
+
+        if stack_pos == 0:
+            break
+        stack_pos -= 1
+        o_x = rays[stack_pos, 0]
+        o_y = rays[stack_pos, 1]
+        o_z = rays[stack_pos, 2]
+        d_x = rays[stack_pos, 3]
+        d_y = rays[stack_pos, 4]
+        d_z = rays[stack_pos, 5]
+        e_r = rays[stack_pos, 6]
+        e_g = rays[stack_pos, 7]
+        e_b = rays[stack_pos, 8]
+        depth = int(rays[stack_pos, 9])
+        early_exit = False
+
+    return ray_count
+#endregion
+#---- Rendering                      ----#
+#region
+@njit(cache = True, parallel = True)
+def render_tiles(image: np.ndarray,
+    nodes: np.ndarray,
+    spheres: np.ndarray,
+    sphere_ids: np.ndarray,
+    materials: np.ndarray,
+    sky: np.ndarray,
+    position: np.ndarray, forwards: np.ndarray,
+    right: np.ndarray, up: np.ndarray,
+    tile_size: int) -> int:
+    """
+        Render the scene into image (height, width, 3), one
+        tile per task. Returns the number of rays traced.
+    """
+
+    height = image.shape[0]
+    width = image.shape[1]
+    tiles_x = (width + tile_size - 1) // tile_size
+    tiles_y = (height + tile_size - 1) // tile_size
+    tile_count = tiles_x * tiles_y
+    ray_counts = np.zeros(tile_count, dtype = np.int64)
+
+    for tile in prange(tile_count):
+
+        #per task scratch memory
+        rays = np.empty((RAY_STACK_SIZE, 10), dtype = np.float32)
+        node_stack = np.empty(NODE_STACK_SIZE, dtype = np.int32)
+        pixel = np.empty(3, dtype = np.float32)
+
+        x0 = (tile % tiles_x) * tile_size
+        y0 = (tile // tiles_x) * tile_size
+        for y in range(y0, min(y0 + tile_size, height)):
+
+            vertical = (y * 2.0 - height) / height
+
+            for x in range(x0, min(x0 + tile_size, width)):
+
+                horizontal = (x * 2.0 - width) / width
+
+                d_x = forwards[0] + horizontal * right[0] + vertical * up[0]
+                d_y = forwards[1] + horizontal * right[1] + vertical * up[1]
+                d_z = forwards[2] + horizontal * right[2] + vertical * up[2]
+
+                ray_counts[tile] += shade_pixel(
+                    nodes, spheres, sphere_ids, materials, sky,
+                    position[0], position[1], position[2],
+                    d_x, d_y, d_z, rays, node_stack, pixel)
+
+                image[y, x, 0] = pixel[0]
+                image[y, x, 1] = pixel[1]
+                image[y, x, 2] = pixel[2]
+
+    return ray_counts.sum()
+
+def render(_scene, width: int, height: int,
+    sky: np.ndarray = None, tile_size: int = 8) -> tuple[np.ndarray, dict[str, float]]:
+    """
+        Render a scene on the cpu.
+
+            Parameters:
+                _scene (scene.Scene): the scene to draw
+                width, height (int): image size in pixels
+                sky: cubemap from load_sky, defaults to the ambient colour
+                tile_size (int): width and height of a tile in pixels
+
+            Returns:
+                The image, as a (height, width, 3) float32 array with
+                row 0 at the bottom (like the gpu's texture), and timing
+                stats.
+    """
+
+    if sky is None:
+        sky = load_sky("gfx/sky")
+
+    image = np.zeros((height, width, 3), dtype = np.float32)
+    camera = _scene.camera
+    correction_factor = height / width
+    up = (correction_factor * camera.up).astype(np.float32)
+
+    start = time.perf_counter()
+    ray_count = render_tiles(
+        image, _scene.nodes, _scene.spheres, _scene.sphere_ids,
+        _scene.materials, sky,
+        camera.position.astype(np.float32), camera.forwards.astype(np.float32),
+        camera.right.astype(np.float32), up, tile_size)
+    seconds = time.perf_counter() - start
+
+    stats = {
+        "rays": int(ray_count),
+        "seconds": seconds,
+        "rays_per_second": ray_count / max(seconds, 1e-9),
+    }
+
+    return image, stats
+
+@njit(cache = True, parallel = True)
+def render_mesh_tiles(image: np.ndarray,
+    nodes: np.ndarray,
+    triangles: np.ndarray,
+    triangle_ids: np.ndarray,
+    materials: np.ndarray,
+    sky: np.ndarray,
+    position: np.ndarray, forwards: np.ndarray,
+    right: np.ndarray, up: np.ndarray,
+    tile_size: int) -> int:
+    """
+        Render a triangle mesh into image (height, width, 3),
+        primary rays only, lit from the camera.
+        Returns the number of rays traced.
+    """
+
+    height = image.shape[0]
+    width = image.shape[1]
+    tiles_x = (width + tile_size - 1) // tile_size
+    tiles_y = (height + tile_size - 1) // tile_size
+    tile_count = tiles_x * tiles_y
+
+    for tile in prange(tile_count):
+
+        node_stack = np.empty(NODE_STACK_SIZE, dtype = np.int32)
+
+        x0 = (tile % tiles_x) * tile_size
+        y0 = (tile // tiles_x) * tile_size
+        for y in range(y0, min(y0 + tile_size, height)):
+
+            vertical = (y * 2.0 - height) / height
+
+            for x in range(x0, min(x0 + tile_size, width)):
+
+                horizontal = (x * 2.0 - width) / width
+
+                d_x = forwards[0] + horizontal * right[0] + vertical * up[0]
+                d_y = forwards[1] + horizontal * right[1] + vertical * up[1]
+                d_z = forwards[2] + horizontal * right[2] + vertical * up[2]
+
+                hit, t, index = trace_triangles(
+                    nodes, triangles, triangle_ids,
+                    position[0], position[1], position[2],
+                    d_x, d_y, d_z, node_stack)
+
+                if not hit:
+                    r, g, b = sample_sky(sky, d_x, d_y, d_z)
+                    image[y, x, 0] = r
+                    image[y, x, 1] = g
+                    image[y, x, 2] = b
+                    continue
+
+                triangle = triangles[index]
+                material = materials[triangle['material']]
+                length = np.sqrt(d_x * d_x + d_y * d_y + d_z * d_z)
+                light = abs(triangle['nx'] * d_x + triangle['ny'] * d_y
+                    + triangle['nz'] * d_z) / length
+                light = 0.2 + 0.8 * light
+                image[y, x, 0] = light * material['r']
+                image[y, x, 1] = light * material['g']
+                image[y, x, 2] = light * material['b']
+
+    return width * height
+
+def render_mesh(nodes: np.ndarray, triangles: np.ndarray,
+    triangle_ids: np.ndarray, materials: np.ndarray, camera,
+    width: int, height: int, sky: np.ndarray = None,
+    tile_size: int = 8) -> tuple[np.ndarray, dict[str, float]]:
+    """
+        Render a triangle mesh on the cpu, see render.
+    """
+
+    if sky is None:
+        sky = load_sky("gfx/sky")
+
+    image = np.zeros((height, width, 3), dtype = np.float32)
+    correction_factor = height / width
+    up = (correction_factor * camera.up).astype(np.float32)
+
+    start = time.perf_counter()
+    ray_count = render_mesh_tiles(
+        image, nodes, triangles, triangle_ids, materials, sky,
+        camera.position.astype(np.float32), camera.forwards.astype(np.float32),
+        camera.right.astype(np.float32), up, tile_size)
+    seconds = time.perf_counter() - start
+
+    stats = {
+        "rays": int(ray_count),
+        "seconds": seconds,
+        "rays_per_second": ray_count / max(seconds, 1e-9),
+    }
+
+    return image, stats
+
+def save_image(image: np.ndarray, filepath: str) -> None:
+    """
+        Write a rendered image to disk.
+    """
+
+    pixels = np.clip(255 * image, 0, 255).astype(np.uint8)
+    Image.fromarray(pixels[::-1]).save(filepath)
+#endregion
@@ -5,25 +5,51 @@ import node
 import materials
 import screen_quad
 import buffer
+import bvh_backend
+import resolution
+import profiler
 
 class Engine:
     """
         Responsible for drawing scenes
     """
 
-    def __init__(self, width, height, _scene: scene.Scene):
+    def __init__(self, width, height, _scene: scene.Scene, traversal: str = "ray"):
         """
             Initialize a flat raytracing context
             
                 Parameters:
                     width (int): width of screen
                     height (int): height of screen
+                    traversal (str): "ray", each ray walks the tree 
+                        alone, or "packet", each workgroup walks it 
+                        together for primary rays (on the binary tree)
         """
         self.screenWidth = width
         self.screenHeight = height
+        self.traversal = traversal
 
         self.targetFrameRate = 60
-        self.frameRateMargin = 10
+        #gpu time (ms) kept free for everything else in the frame
+        self.frameTimeMargin = 2.0
+        #print the render scale and gpu time of every frame
+        self.logResolution = True
+        self.renderScale = 1.0
+        self.gpuTime = 0.0
+        #write scene data through persistently mapped ring buffers
+        self.persistentBuffers = False
+        self.bytesUploaded = 0
+
+        #blend each frame into the last, while the view holds still
+        self.accumulate = True
+        self.maxSamples = 256
+        #small camera moves keep their history, moved to match
+        self.reproject = True
+        self.maxReprojectedSamples = 8
+        self.reprojectDistance = 0.5
+        self.reprojectAngle = np.radians(5)
+        self.previousCamera: np.ndarray = None
+        self.frameSeed = 0
 
         self.makeAssets(_scene)
         
@@ -34,32 +60,138 @@ class Engine:
         """ Make all the stuff. """
 
         self.screenQuad = screen_quad.ScreenQuad()
-        self.colorBuffer = materials.Material(minDetail = 8, maxDetail = 1024)
+        self.colorBuffer = materials.ScaledMaterial(self.screenWidth, self.screenHeight)
+        #last frame's colors, swapped with colorBuffer every frame
+        self.historyBuffer = materials.ScaledMaterial(self.screenWidth, self.screenHeight)
+
+        self.profiler = profiler.Profiler()
+        self.resolutionController = resolution.ResolutionController(
+            budget = 1000 / self.targetFrameRate - self.frameTimeMargin)
         """
         self.colorBuffer = materials.MaterialFixed(
             width = self.screenWidth, 
             height = self.screenHeight)
         """
 
+        persistent = self.persistentBuffers
         sphere_count = int(len(_scene.spheres))
         self.sphereBuffer = buffer.Buffer(
-            size = sphere_count, binding = 1, dtype=data_type_sphere)
+            size = sphere_count, binding = 1, dtype=data_type_sphere,
+            persistent = persistent)
+        self.wideNodes = self.usesWideNodes(_scene)
+        gpuNodes = _scene.wide_nodes if self.wideNodes else _scene.nodes
         self.nodeBuffer = buffer.Buffer(
-            size = len(_scene.nodes), binding = 2, dtype=data_type_bvh_node)
+            size = len(gpuNodes), binding = 2, dtype=gpuNodes.dtype,
+            persistent = persistent)
         self.indexBuffer = buffer.Buffer(
-            size = len(_scene.sphere_ids), binding = 3, dtype=np.int32)
+            size = len(_scene.sphere_ids), binding = 3, dtype=np.int32,
+            persistent = persistent)
+        #never changes, so no point in a ring
         self.materialBuffer = buffer.Buffer(
             size = len(_scene.materials), binding = 4, dtype=data_type_material)
+        self.sceneBuffers = [
+            self.sphereBuffer, self.nodeBuffer, 
+            self.indexBuffer, self.materialBuffer]
+        
+        if _scene.instanced:
+            instance_count = int(len(_scene.instances))
+            self.instanceBuffer = buffer.Buffer(
+                size = instance_count, binding = 5, dtype=data_type_instance,
+                persistent = persistent)
+            self.tlasNodeBuffer = buffer.Buffer(
+                size = len(_scene.tlas_nodes), binding = 6, dtype=data_type_bvh_node,
+                persistent = persistent)
+            self.instanceIndexBuffer = buffer.Buffer(
+                size = instance_count, binding = 7, dtype=np.int32,
+                persistent = persistent)
+            self.sceneBuffers += [
+                self.instanceBuffer, self.tlasNodeBuffer, self.instanceIndexBuffer]
 
         self.shader = self.createShader("shaders/frameBufferVertex.txt",
                                         "shaders/frameBufferFragment.txt")
-        
-        self.rayTracerShader = self.createComputeShader("shaders/rayTracer.txt")
 
         self.skyBoxMaterial = materials.CubeMapMaterial("gfx/sky")
+        self.rayTracerShader = None
+        self.makeRayTracerShader(_scene)
+    
+    def makeRayTracerShader(self, _scene: scene.Scene) -> None:
+        """
+            Compile the raytracer for the scene, replacing any
+            earlier build. The traversal stack is sized from the
+            scene's tree as it is now.
+        """
+
+        self.stackCapacity = self.stackSize(_scene)
+
+        defines = []
+        if _scene.instanced:
+            defines.append("INSTANCED")
+        if self.wideNodes:
+            defines += ["WIDE_BVH", f"BVH_WIDTH {_scene.bvh_width}"]
+        if self.traversal == "packet":
+            defines.append("PACKET_TRAVERSAL")
+        defines.append(f"STACK_SIZE {self.stackCapacity}")
+        if self.accumulate:
+            defines.append("ACCUMULATE")
+
+        if self.rayTracerShader is not None:
+            glDeleteProgram(self.rayTracerShader)
+        self.rayTracerShader = self.createComputeShader(
+            "shaders/rayTracer.txt", defines)
+
         glUseProgram(self.rayTracerShader)
         glUniform1i(glGetUniformLocation(self.rayTracerShader, "sky_cube"), 4)
     
+    def fitStack(self, _scene: scene.Scene) -> None:
+        """
+            Rebuilds can leave the tree deeper than the shader's
+            stack, which would then drop pushes, and whole subtrees
+            with them. Recompile with a bigger stack when that
+            happens. Refits keep the tree's shape, so only frames
+            with a new tree are checked.
+        """
+
+        rebuilt = _scene.sphere_ids_changed \
+            or (_scene.instanced and _scene.instance_ids_changed)
+        if rebuilt and self.stackDepth(_scene) > self.stackCapacity:
+            self.makeRayTracerShader(_scene)
+    
+    def usesWideNodes(self, _scene: scene.Scene) -> bool:
+        """
+            Whether the shader walks the scene's wide tree. Packets
+            and instances only know the binary one.
+        """
+
+        return not _scene.instanced and _scene.bvh_width > 2 \
+            and self.traversal == "ray"
+    
+    def stackSize(self, _scene: scene.Scene) -> int:
+        """
+            How many entries to give the shader's traversal stack,
+            with room to spare for rebuilds making the tree deeper.
+        """
+
+        return max(16, 2 * self.stackDepth(_scene))
+    
+    def stackDepth(self, _scene: scene.Scene) -> int:
+        """
+            How many entries the shader's traversal stack needs
+            for the scene's tree as it is now.
+        """
+
+        if _scene.instanced:
+            needed = max(
+                bvh_backend.bvh_depth(_scene.tlas_nodes),
+                bvh_backend.bvh_depth(_scene.nodes))
+        elif self.wideNodes:
+            #each level can push all but one of its children
+            needed = (_scene.bvh_width - 1) * bvh_backend.wide_bvh_depth(
+                _scene.wide_nodes, _scene.wide_count)
+        else:
+            needed = bvh_backend.bvh_depth(_scene.nodes)
+
+        return needed
+    
     def createShader(self, vertexFilepath, fragmentFilepath):
         """
             Read source code, compile and link shaders.
@@ -77,15 +209,20 @@ class Engine:
         
         return shader
     
-    def createComputeShader(self, filepath):
+    def createComputeShader(self, filepath, defines = ()):
         """
             Read source code, compile and link shaders.
+            Each of the given defines is switched on, just 
+            after the version directive.
             Returns the compiled and linked program.
         """
 
         with open(filepath,'r') as f:
             compute_src = f.readlines()
         
+        for define in defines:
+            compute_src.insert(1, f"#define {define}\n")
+        
         shader = compileProgram(compileShader(compute_src, GL_COMPUTE_SHADER))
         
         return shader
@@ -96,19 +233,58 @@ class Engine:
 
         glUseProgram(self.rayTracerShader)
         
-        self.sphereBuffer.blit(scene.spheres)
+        #Only send what's changed
+        if scene.spheres_changed:
+            self.sphereBuffer.blit(scene.spheres)
+            self.sphereBuffer.readFrom()
+            scene.spheres_changed = False
         
-        self.nodeBuffer.blit(scene.nodes)
+        if scene.nodes_changed:
+            self.nodeBuffer.blit(scene.wide_nodes if self.wideNodes else scene.nodes)
+            self.nodeBuffer.readFrom()
+            scene.nodes_changed = False
 
-        self.indexBuffer.blit(scene.sphere_ids)
+        if scene.sphere_ids_changed:
+            self.indexBuffer.blit(scene.sphere_ids)
+            self.indexBuffer.readFrom()
+            scene.sphere_ids_changed = False
 
-        self.materialBuffer.blit(scene.materials)
+        if scene.materials_changed:
+            self.materialBuffer.blit(scene.materials)
+            self.materialBuffer.readFrom()
+            scene.materials_changed = False
+        
+        if scene.instanced:
+            self.updateInstances(scene)
+
+        for sceneBuffer in self.sceneBuffers:
+            self.bytesUploaded += sceneBuffer.takeUploadCount()
+    
+    def updateInstances(self, scene: scene.InstancedScene):
+
+        if scene.instances_changed:
+            self.instanceBuffer.blit(scene.instances)
+            self.instanceBuffer.readFrom()
+            scene.instances_changed = False
+
+        if scene.tlas_nodes_changed:
+            self.tlasNodeBuffer.blit(scene.tlas_nodes)
+            self.tlasNodeBuffer.readFrom()
+            scene.tlas_nodes_changed = False
+
+        if scene.instance_ids_changed:
+            self.instanceIndexBuffer.blit(scene.instance_ids)
+            self.instanceIndexBuffer.readFrom()
+            scene.instance_ids_changed = False
 
     def prepareScene(self, scene: scene.Scene):
         """
             Send scene data to the shader.
         """
 
+        if scene.outDated:
+            self.fitStack(scene)
+
         glUseProgram(self.rayTracerShader)
 
         correction_factor = self.screenHeight / self.screenWidth
@@ -117,56 +293,116 @@ class Engine:
         glUniform3fv(glGetUniformLocation(self.rayTracerShader, "viewer.forwards"), 1, scene.camera.forwards)
         glUniform3fv(glGetUniformLocation(self.rayTracerShader, "viewer.right"), 1, scene.camera.right)
         glUniform3fv(glGetUniformLocation(self.rayTracerShader, "viewer.up"), 1, correction_factor * scene.camera.up)
+        glUniform2iv(glGetUniformLocation(self.rayTracerShader, "render_size"), 1, self.colorBuffer.renderSize)
+
+        if self.accumulate:
+            self.prepareHistory(scene)
 
         if scene.outDated:
             self.updateScene(scene)
-        
-        self.sphereBuffer.readFrom()
-        self.nodeBuffer.readFrom()
-        self.indexBuffer.readFrom()
-        self.materialBuffer.readFrom()
 
         self.skyBoxMaterial.use()
         
+    def prepareHistory(self, scene: scene.Scene):
+        """
+            Decide how much of last frame can be blended into this
+            one, and tell the shader where last frame's camera was.
+        """
+
+        correction_factor = self.screenHeight / self.screenWidth
+        camera = np.concatenate((
+            scene.camera.position, scene.camera.forwards, 
+            scene.camera.right, correction_factor * scene.camera.up))
+
+        if self.previousCamera is None:
+            self.previousCamera = camera
+
+        mode = 0
+        if not scene.outDated:
+
+            if np.array_equal(camera, self.previousCamera) \
+                and self.colorBuffer.renderSize == self.historyBuffer.renderSize:
+                mode = 1
+            elif self.reproject:
+                distance = np.linalg.norm(camera[0:3] - self.previousCamera[0:3])
+                cosine = np.dot(camera[3:6], self.previousCamera[3:6])
+                if distance < self.reprojectDistance \
+                    and cosine > np.cos(self.reprojectAngle):
+                    mode = 2
+
+        glUniform1i(glGetUniformLocation(self.rayTracerShader, "history_mode"), mode)
+        glUniform3fv(glGetUniformLocation(self.rayTracerShader, "previous_viewer.position"), 1, self.previousCamera[0:3])
+        glUniform3fv(glGetUniformLocation(self.rayTracerShader, "previous_viewer.forwards"), 1, self.previousCamera[3:6])
+        glUniform3fv(glGetUniformLocation(self.rayTracerShader, "previous_viewer.right"), 1, self.previousCamera[6:9])
+        glUniform3fv(glGetUniformLocation(self.rayTracerShader, "previous_viewer.up"), 1, self.previousCamera[9:12])
+        glUniform2iv(glGetUniformLocation(self.rayTracerShader, "previous_render_size"), 1, self.historyBuffer.renderSize)
+        glUniform1f(glGetUniformLocation(self.rayTracerShader, "max_samples"), self.maxSamples)
+        glUniform1f(glGetUniformLocation(self.rayTracerShader, "max_reprojected_samples"), self.maxReprojectedSamples)
+        glUniform1ui(glGetUniformLocation(self.rayTracerShader, "frame_seed"), self.frameSeed)
+
+        self.previousCamera = camera
+        self.frameSeed = (self.frameSeed + 1) % 2**32
+    
     def renderScene(self, scene: scene.Scene):
         """
             Draw all objects in the scene
         """
         
-        start = time.time()
+        self.profiler.beginFrame()
         glUseProgram(self.rayTracerShader)
 
-        self.prepareScene(scene)
-
+        #the history keeps the size it was rendered at
+        if self.accumulate:
+            self.colorBuffer, self.historyBuffer = self.historyBuffer, self.colorBuffer
+            self.historyBuffer.readFromImage(1)
+        self.colorBuffer.setScale(self.renderScale)
         self.colorBuffer.writeTo()
-        
-        subgroup_x_count = int(self.colorBuffer.sizes[self.colorBuffer.detailLevel] / 8)
-        subgroup_y_count = int(self.colorBuffer.sizes[self.colorBuffer.detailLevel] / 8)
 
-        glDispatchCompute(subgroup_x_count, subgroup_y_count, 1)
-        
-        glMemoryBarrier(GL_SHADER_IMAGE_ACCESS_BARRIER_BIT)
+        with self.profiler.scope("prepare scene"):
+            self.prepareScene(scene)
 
-        self.drawScreen()
-        finish = time.time()
-        #print(f"render took {(finish - start) * 1000} milliseconds.")
+        with self.profiler.scope("trace"):
+            width, height = self.colorBuffer.renderSize
+            subgroup_x_count = (width + 7) // 8
+            subgroup_y_count = (height + 7) // 8
+
+            glDispatchCompute(subgroup_x_count, subgroup_y_count, 1)
+
+            for sceneBuffer in self.sceneBuffers:
+                sceneBuffer.fence()
+            
+            glMemoryBarrier(GL_SHADER_IMAGE_ACCESS_BARRIER_BIT)
+
+        with self.profiler.scope("present"):
+            self.drawScreen()
+
+        self.profiler.endFrame()
+        self.adaptResolution()
 
     def drawScreen(self):
         glUseProgram(self.shader)
         glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        glUniform2fv(glGetUniformLocation(self.shader, "region"), 1, self.colorBuffer.region())
         self.colorBuffer.readFrom()
         self.screenQuad.draw()
         glFlush()
         self.numFrames += 1
     
-    def adaptResolution(self, frameRate):
-
-        if frameRate > self.targetFrameRate + self.frameRateMargin:
-            #increase resolution
-            self.colorBuffer.upsize()
-        elif frameRate < self.targetFrameRate - self.frameRateMargin:
-            #reduce resolution
-            self.colorBuffer.downsize()
+    def adaptResolution(self):
+        """
+            Steer the render scale with the latest gpu frame time.
+            Timings arrive a few frames late, and some frames
+            have none.
+        """
+
+        gpuTime = self.profiler.takeFrameGpuTime()
+        if gpuTime is None:
+            return
+
+        self.gpuTime = gpuTime
+        self.renderScale = self.resolutionController.update(gpuTime)
+        if self.logResolution:
+            print(f"render scale {self.renderScale:.3f}, gpu time {gpuTime:.2f} ms")
     
     def destroy(self):
         """
@@ -178,4 +414,5 @@ class Engine:
         glDeleteVertexArrays(1, (self.vao,))
         glDeleteBuffers(1, (self.vbo,))
         glDeleteTextures(1, (self.colorBuffer,))
+        self.profiler.destroy()
         glDeleteProgram(self.shader)
\ No newline at end of file
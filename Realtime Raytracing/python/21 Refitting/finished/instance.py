@@ -0,0 +1,194 @@
+from config import *
+import node
+import bvh_backend
+
+#---- Instancing                     ----#
+# Each instance is a transform and the   #
+# root of a shared bottom level bvh      #
+# (blas). A top level bvh (tlas) is      #
+# built over the instances, so moving    #
+# one only refits the top level.         #
+#----------------------------------------#
+
+#region
+def build_blas(spheres: np.ndarray) -> tuple[np.ndarray, np.ndarray, int]:
+    """
+        Build a bottom level bvh over object space spheres.
+
+        Returns the nodes, sphere indices and number of nodes used.
+    """
+
+    sphere_count = len(spheres)
+    nodes = node.make_nodes(2 * sphere_count + 1)
+    sphere_ids = np.arange(sphere_count, dtype = np.int32)
+    nodes_used = bvh_backend.build_bvh_parallel(
+        nodes, spheres, sphere_ids, sphere_count)
+
+    return (nodes, sphere_ids, nodes_used)
+
+def pack_blases(clusters: list[np.ndarray]) -> tuple[
+    np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+        Build a blas for each cluster of spheres, and pack them
+        all into single node, index and sphere arrays, like the
+        gpu wants them.
+
+        Returns the nodes, sphere indices, spheres and the root
+        node of each blas.
+    """
+
+    built = [build_blas(spheres) for spheres in clusters]
+
+    node_count = sum(nodes_used for _, _, nodes_used in built)
+    sphere_count = sum(len(spheres) for spheres in clusters)
+    nodes = node.make_nodes(node_count)
+    sphere_ids = np.zeros(sphere_count, dtype = np.int32)
+    spheres = np.concatenate(clusters)
+    roots = np.zeros(len(clusters), dtype = np.int32)
+
+    node_offset = 0
+    id_offset = 0
+    for i, (blas_nodes, blas_ids, nodes_used) in enumerate(built):
+
+        roots[i] = node_offset
+        offset_blas(nodes, blas_nodes, nodes_used, node_offset, id_offset)
+        sphere_ids[id_offset : id_offset + len(blas_ids)] = blas_ids + id_offset
+
+        node_offset += nodes_used
+        id_offset += len(blas_ids)
+
+    return (nodes, sphere_ids, spheres, roots)
+
+@njit(cache = True)
+def offset_blas(nodes: np.ndarray, blas_nodes: np.ndarray, nodes_used: int,
+    node_offset: int, id_offset: int) -> None:
+    """
+        Copy a blas into the packed nodes, shifting its child and
+        sphere index pointers to match.
+    """
+
+    for i in range(nodes_used):
+
+        nodes[node_offset + i] = blas_nodes[i]
+        if blas_nodes[i]['sphere_count'] > 0:
+            nodes[node_offset + i]['contents'] += id_offset
+        else:
+            nodes[node_offset + i]['contents'] += node_offset
+
+def make_instances(count: int, roots: np.ndarray) -> tuple[
+    np.ndarray, np.ndarray, np.ndarray]:
+    """
+        Scatter instances of the given blases through the same
+        volume as the loose spheres.
+
+        Returns the instances, their object to world transforms
+        and their velocities, as (x, y, z, spin) rows.
+    """
+
+    instances = np.zeros(count, dtype = data_type_instance)
+    instances['root'] = roots[np.random.randint(low = 0, high = len(roots), size = count)]
+
+    transforms = np.zeros((count, 3, 4), dtype = np.float32)
+    scales = np.random.uniform(low = 0.5, high = 1.5, size = count)
+    transforms[:, 0, 0] = scales
+    transforms[:, 1, 1] = scales
+    transforms[:, 2, 2] = scales
+    transforms[:, 0, 3] = np.random.uniform(low = -95.0, high = 95.0, size = count)
+    transforms[:, 1, 3] = np.random.uniform(low = -95.0, high = 95.0, size = count)
+    transforms[:, 2, 3] = np.random.uniform(low = -15.0, high = 15.0, size = count)
+
+    velocities = np.random.uniform(low = -1.0, high = 1.0, size = (count, 4)).astype(np.float32)
+    velocities[:, 3] *= 0.05
+
+    return (instances, transforms, velocities)
+
+@njit(cache = True, parallel = True)
+def update_instances(transforms: np.ndarray, velocities: np.ndarray, dt: float) -> None:
+    """
+        Move and spin (about z) each instance, bouncing off the
+        same walls as the spheres.
+    """
+
+    for i in prange(len(transforms)):
+
+        for axis, wall in ((0, 95.0), (1, 95.0), (2, 15.0)):
+            if abs(transforms[i, axis, 3]) > wall:
+                velocities[i, axis] *= -1
+            transforms[i, axis, 3] += dt * velocities[i, axis]
+
+        c = np.cos(dt * velocities[i, 3])
+        s = np.sin(dt * velocities[i, 3])
+        for column in range(3):
+            x = transforms[i, 0, column]
+            y = transforms[i, 1, column]
+            transforms[i, 0, column] = c * x - s * y
+            transforms[i, 1, column] = s * x + c * y
+
+@njit(cache = True)
+def invert_linear(m: np.ndarray, inverse: np.ndarray) -> None:
+    """
+        Write the inverse of the 3x3 matrix m into the first
+        three columns of inverse, by cofactors.
+    """
+
+    c00 = m[1, 1] * m[2, 2] - m[1, 2] * m[2, 1]
+    c01 = m[1, 2] * m[2, 0] - m[1, 0] * m[2, 2]
+    c02 = m[1, 0] * m[2, 1] - m[1, 1] * m[2, 0]
+    inv_determinant = 1.0 / (m[0, 0] * c00 + m[0, 1] * c01 + m[0, 2] * c02)
+
+    inverse[0, 0] = c00 * inv_determinant
+    inverse[1, 0] = c01 * inv_determinant
+    inverse[2, 0] = c02 * inv_determinant
+    inverse[0, 1] = (m[0, 2] * m[2, 1] - m[0, 1] * m[2, 2]) * inv_determinant
+    inverse[1, 1] = (m[0, 0] * m[2, 2] - m[0, 2] * m[2, 0]) * inv_determinant
+    inverse[2, 1] = (m[0, 1] * m[2, 0] - m[0, 0] * m[2, 1]) * inv_determinant
+    inverse[0, 2] = (m[0, 1] * m[1, 2] - m[0, 2] * m[1, 1]) * inv_determinant
+    inverse[1, 2] = (m[0, 2] * m[1, 0] - m[0, 0] * m[1, 2]) * inv_determinant
+    inverse[2, 2] = (m[0, 0] * m[1, 1] - m[0, 1] * m[1, 0]) * inv_determinant
+
+@njit(cache = True, parallel = True)
+def write_instances(instances: np.ndarray, transforms: np.ndarray,
+    nodes: np.ndarray, bounds: np.ndarray) -> None:
+    """
+        Invert each instance's transform for the gpu, and find its
+        world space bounds, for the tlas.
+    """
+
+    for i in prange(len(instances)):
+
+        linear = transforms[i, :, :3]
+        translation = transforms[i, :, 3]
+        world_to_object = instances[i]['world_to_object']
+        invert_linear(linear, world_to_object)
+        for row in range(3):
+            world_to_object[row, 3] = -(world_to_object[row, 0] * translation[0]
+                + world_to_object[row, 1] * translation[1]
+                + world_to_object[row, 2] * translation[2])
+
+        #transform the blas root's box by its centre and half size
+        root = nodes[instances[i]['root']]
+        c_x = 0.5 * (root['min_x'] + root['max_x'])
+        c_y = 0.5 * (root['min_y'] + root['max_y'])
+        c_z = 0.5 * (root['min_z'] + root['max_z'])
+        e_x = 0.5 * (root['max_x'] - root['min_x'])
+        e_y = 0.5 * (root['max_y'] - root['min_y'])
+        e_z = 0.5 * (root['max_z'] - root['min_z'])
+
+        for row in range(3):
+            center = translation[row] + linear[row, 0] * c_x \
+                + linear[row, 1] * c_y + linear[row, 2] * c_z
+            extent = abs(linear[row, 0]) * e_x \
+                + abs(linear[row, 1]) * e_y + abs(linear[row, 2]) * e_z
+            if row == 0:
+                bounds[i]['min_x'] = center - extent
+                bounds[i]['max_x'] = center + extent
+                bounds[i]['x'] = center
+            elif row == 1:
+                bounds[i]['min_y'] = center - extent
+                bounds[i]['max_y'] = center + extent
+                bounds[i]['y'] = center
+            else:
+                bounds[i]['min_z'] = center - extent
+                bounds[i]['max_z'] = center + extent
+                bounds[i]['z'] = center
+#endregion
@@ -135,6 +135,14 @@ class Material:
 
         glActiveTexture(GL_TEXTURE0)
         glBindTexture(GL_TEXTURE_2D, self.textures[self.detailLevel])
+
+    def readFromImage(self, unit: int) -> None:
+        """
+            Bind as an image for a compute shader to load from,
+            eg. last frame's colors when accumulating.
+        """
+
+        glBindImageTexture(unit, self.textures[self.detailLevel], 0, GL_FALSE, 0, GL_READ_ONLY, GL_RGBA16F)
     
     def destroy(self) -> None:
 
@@ -187,20 +195,108 @@ class MaterialFixed:
 
         glActiveTexture(GL_TEXTURE0)
         glBindTexture(GL_TEXTURE_2D, self.texture)
+
+    def readFromImage(self, unit: int) -> None:
+        """
+            Bind as an image for a compute shader to load from,
+            eg. last frame's colors when accumulating.
+        """
+
+        glBindImageTexture(unit, self.texture, 0, GL_FALSE, 0, GL_READ_ONLY, GL_RGBA16F)
     
     def destroy(self) -> None:
 
         pass
 
-def make_materials(count: int) -> np.ndarray:
+class ScaledMaterial:
+    """
+        One screen sized texture, of which only a corner
+        (scale * width, scale * height) is rendered and shown.
+        Any scale works, and the aspect ratio is kept.
+    """
+        
+    def __init__(self, width: int, height: int):
+
+        self.size = (width, height)
+        self.setScale(1.0)
+        
+        self.texture = glGenTextures(1)
+        glActiveTexture(GL_TEXTURE0)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+    
+        glTexStorage2D(GL_TEXTURE_2D, 1, GL_RGBA16F, width, height)
+        
+        self.clearColor = np.zeros(width * height * 4, dtype = np.float16)
+    
+    def setScale(self, scale: float) -> None:
+        """
+            Set the fraction of each side which is rendered.
+        """
+
+        self.scale = scale
+        self.renderSize = (
+            max(1, min(self.size[0], round(scale * self.size[0]))),
+            max(1, min(self.size[1], round(scale * self.size[1]))))
+    
+    def region(self) -> tuple[float, float]:
+        """
+            The rendered corner, in texture coordinates.
+        """
+
+        return (self.renderSize[0] / self.size[0], self.renderSize[1] / self.size[1])
+    
+    def clear(self) -> None:
+
+        glActiveTexture(GL_TEXTURE0)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glTexSubImage2D(GL_TEXTURE_2D,0,0,0,self.size[0],self.size[1],GL_RGBA,GL_HALF_FLOAT,self.clearColor)
+    
+    def writeTo(self) -> None:
+
+        glActiveTexture(GL_TEXTURE0)
+        glBindImageTexture(0, self.texture, 0, GL_FALSE, 0, GL_READ_ONLY, GL_RGBA16F)
+
+    def readFrom(self) -> None:
+
+        glActiveTexture(GL_TEXTURE0)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+
+    def readFromImage(self, unit: int) -> None:
+        """
+            Bind as an image for a compute shader to load from,
+            eg. last frame's colors when accumulating.
+        """
+
+        glBindImageTexture(unit, self.texture, 0, GL_FALSE, 0, GL_READ_ONLY, GL_RGBA16F)
+    
+    def destroy(self) -> None:
+
+        glDeleteTextures(1, (self.texture,))
+
+def make_materials(count: int, rng: np.random.Generator = None) -> np.ndarray:
+    """
+        Random materials, each field drawn for every material
+        at once.
+
+            Parameters:
+                count (int): number of materials
+                rng: generator to draw from, see make_generator
+    """
+
+    if rng is None:
+        rng = make_generator()
 
-    _materials = []
-    for _ in range(count):
-        r = np.random.uniform(low = 0.0, high = 1.0)
-        g = np.random.uniform(low = 0.0, high = 1.0)
-        b = np.random.uniform(low = 0.0, high = 1.0)
-        reflectance = np.random.uniform(low = 0.2, high = 0.8)
-        eta = np.random.uniform(low = 0.5, high = 0.9)
-        _materials.append((r,g,b,reflectance,eta))
+    _materials = np.zeros(count, dtype=data_type_material)
+    _materials['r'] = rng.uniform(low = 0.0, high = 1.0, size = count)
+    _materials['g'] = rng.uniform(low = 0.0, high = 1.0, size = count)
+    _materials['b'] = rng.uniform(low = 0.0, high = 1.0, size = count)
+    _materials['reflectance'] = rng.uniform(low = 0.2, high = 0.8, size = count)
+    _materials['eta'] = rng.uniform(low = 0.5, high = 0.9, size = count)
+    _materials['roughness'] = rng.uniform(low = 0.0, high = 0.3, size = count)
 
-    return np.array(_materials, dtype=data_type_material)
\ No newline at end of file
+    return _materials
\ No newline at end of file
@@ -1,6 +1,6 @@
 from config import *
 
-@njit(cache = True)
+@njit(cache = True, nogil = True)
 def make_nodes(count: int) -> np.ndarray:
 
     nodes = np.zeros(count, dtype=data_type_bvh_node)
@@ -34,7 +34,7 @@ def make_node() -> np.ndarray:
     
     return _node
 
-@njit(cache = True)
+@njit(cache = True, nogil = True)
 def reset_nodes(nodes: np.ndarray, offset: int, count: int) -> None:
 
     for i in range(count):
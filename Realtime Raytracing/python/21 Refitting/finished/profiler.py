@@ -0,0 +1,214 @@
+from OpenGL.GL import *
+import numpy as np
+import time
+import json
+from collections import deque
+from contextlib import contextmanager
+
+#---- Profiler                       ----#
+# Times named scopes on the cpu, with    #
+# perf_counter, and on the gpu, with     #
+# GL_TIME_ELAPSED queries. Each frame's  #
+# queries sit in a ring slot and are     #
+# only read once the gpu has finished    #
+# them, so profiling never stalls. The   #
+# results can be saved as a Chrome trace #
+# (open it at chrome://tracing or in     #
+# Perfetto).                             #
+#----------------------------------------#
+
+#region
+class FrameSlot:
+    """
+        The gpu queries issued during one frame.
+    """
+
+    def __init__(self):
+
+        self.queries: list[int] = []
+        #(name, cpu start) for each query used this frame
+        self.scopes: list[tuple[str, float]] = []
+        self.frame = -1
+        self.pending = False
+
+class Profiler:
+    """
+        Scoped cpu and gpu timers. Use as:
+
+            profiler.beginFrame()
+            with profiler.scope("lighting pass"):
+                ...
+            profiler.endFrame()
+
+        gpu time queries can't nest, so a scope opened inside
+        another is only timed on the cpu.
+    """
+
+    def __init__(self, ringSize: int = 4, traceLength: int = 100_000):
+        """
+            Parameters:
+                ringSize (int): frames of gpu queries kept in flight
+                traceLength (int): most trace events remembered
+        """
+
+        self.enabled = True
+        self.slots = [FrameSlot() for _ in range(ringSize)]
+        self.slot: FrameSlot = None
+        self.frame = -1
+        self.origin = time.perf_counter()
+
+        self.gpuScopeOpen = False
+        self.available = np.zeros(1, dtype = np.int32)
+        #numpy uint64 arrays have no GL type, so read into ctypes
+        self.result = (GLuint64 * 1)()
+
+        self.events = deque(maxlen = traceLength)
+        #latest gpu and cpu times (ms) for each scope name
+        self.gpuTimes: dict[str, float] = {}
+        self.cpuTimes: dict[str, float] = {}
+        #total gpu time of finished frames, not yet taken
+        self.frameGpuTimes = deque(maxlen = ringSize)
+        self.droppedFrames = 0
+
+    def beginFrame(self) -> None:
+
+        if not self.enabled:
+            return
+
+        self.collect()
+        self.frame += 1
+        self.slot = self.slots[self.frame % len(self.slots)]
+
+        if self.slot.pending:
+            #the gpu is more than a whole ring behind, rather than
+            #wait, throw the old queries away
+            glDeleteQueries(len(self.slot.queries), self.slot.queries)
+            self.slot.queries = []
+            self.droppedFrames += 1
+
+        self.slot.scopes = []
+        self.slot.frame = self.frame
+        self.slot.pending = False
+
+    def endFrame(self) -> None:
+
+        if not self.enabled or self.slot is None:
+            return
+
+        self.slot.pending = len(self.slot.scopes) > 0
+        self.collect()
+
+    @contextmanager
+    def scope(self, name: str, gpu: bool = True):
+        """
+            Time the enclosed block on the cpu, and on the gpu
+            too unless gpu is False or another gpu scope is open.
+        """
+
+        if not self.enabled or self.slot is None:
+            yield
+            return
+
+        timeGpu = gpu and not self.gpuScopeOpen
+        if timeGpu:
+            slot = self.slot
+            index = len(slot.scopes)
+            if index == len(slot.queries):
+                slot.queries.extend(int(query) for query in glGenQueries(4))
+            slot.scopes.append((name, self.now()))
+            glBeginQuery(GL_TIME_ELAPSED, slot.queries[index])
+            self.gpuScopeOpen = True
+
+        start = self.now()
+        try:
+            yield
+        finally:
+            finish = self.now()
+            if timeGpu:
+                glEndQuery(GL_TIME_ELAPSED)
+                self.gpuScopeOpen = False
+
+            self.cpuTimes[name] = (finish - start) / 1000
+            self.events.append({
+                "name": name, "cat": "cpu", "ph": "X",
+                "ts": start, "dur": finish - start,
+                "pid": 0, "tid": 0, "args": {"frame": self.frame}})
+
+    def now(self) -> float:
+        """
+            Microseconds since the profiler was made.
+        """
+
+        return (time.perf_counter() - self.origin) * 1e6
+
+    def collect(self) -> None:
+        """
+            Read back every frame whose queries have all finished,
+            oldest first, without waiting.
+        """
+
+        slots = sorted(
+            (slot for slot in self.slots if slot.pending),
+            key = lambda slot: slot.frame)
+
+        for slot in slots:
+            lastQuery = slot.queries[len(slot.scopes) - 1]
+            glGetQueryObjectiv(lastQuery, GL_QUERY_RESULT_AVAILABLE, self.available)
+            if not self.available[0]:
+                #later frames can't have finished either
+                return
+
+            total = 0.0
+            #the gpu doesn't say when each scope started, so lay
+            #them end to end from when the first was issued
+            ts = slot.scopes[0][1]
+            for (name, _), query in zip(slot.scopes, slot.queries):
+                glGetQueryObjectui64v(query, GL_QUERY_RESULT, self.result)
+                duration = self.result[0] / 1000
+                self.gpuTimes[name] = duration / 1000
+                total += duration / 1000
+                self.events.append({
+                    "name": name, "cat": "gpu", "ph": "X",
+                    "ts": ts, "dur": duration,
+                    "pid": 0, "tid": 1, "args": {"frame": slot.frame}})
+                ts += duration
+
+            self.frameGpuTimes.append(total)
+            slot.pending = False
+
+    def takeFrameGpuTime(self) -> float:
+        """
+            Returns the total gpu time (ms) of the newest finished
+            frame not already taken, or None.
+        """
+
+        if len(self.frameGpuTimes) == 0:
+            return None
+
+        total = self.frameGpuTimes[-1]
+        self.frameGpuTimes.clear()
+        return total
+
+    def exportTrace(self, filename: str) -> None:
+        """
+            Save the remembered events as Chrome trace json.
+        """
+
+        names = [
+            {"name": "thread_name", "ph": "M", "pid": 0, "tid": tid,
+             "args": {"name": name}}
+            for tid, name in ((0, "cpu"), (1, "gpu"))]
+        trace = {
+            "traceEvents": names + list(self.events),
+            "displayTimeUnit": "ms",
+        }
+        with open(filename, 'w') as f:
+            json.dump(trace, f)
+
+    def destroy(self) -> None:
+
+        for slot in self.slots:
+            if slot.queries:
+                glDeleteQueries(len(slot.queries), slot.queries)
+            slot.queries = []
+#endregion
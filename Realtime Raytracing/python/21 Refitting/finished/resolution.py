@@ -0,0 +1,70 @@
+from config import *
+
+#---- Dynamic Resolution             ----#
+# The raytracer renders into a corner of #
+# a screen sized texture. The profiler's #
+# gpu timers measure each frame, and a   #
+# controller nudges the corner's size    #
+# until the frame fits the time budget.  #
+#----------------------------------------#
+
+#region
+class ResolutionController:
+    """
+        Picks a render scale from measured gpu frame times, with
+        an incremental PID controller.
+
+        Time goes with the number of pixels, so the scale (a
+        length) is steered by the error in the square root of
+        the time. Errors inside the deadband are ignored, so a
+        steady frame keeps its resolution and can accumulate.
+    """
+
+    def __init__(self, budget: float, minScale: float = 0.25, maxScale: float = 1.0,
+        kp: float = 0.3, ki: float = 0.1, kd: float = 0.05,
+        deadband: float = 0.05, smoothing: float = 0.2):
+        """
+            Parameters:
+                budget (float): target gpu time per frame, in ms
+                minScale, maxScale (float): limits on the scale
+                kp, ki, kd (float): controller gains
+                deadband (float): relative error which is ignored
+                smoothing (float): weight of each new measurement
+                    in the running average of the frame time
+        """
+
+        self.budget = budget
+        self.minScale = minScale
+        self.maxScale = maxScale
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.deadband = deadband
+        self.smoothing = smoothing
+
+        self.scale = maxScale
+        self.gpuTime: float = None
+        self.errors = [0.0, 0.0]
+
+    def update(self, gpuTime: float) -> float:
+        """
+            Feed in a gpu frame time (ms), returns the new scale.
+        """
+
+        if self.gpuTime is None:
+            self.gpuTime = gpuTime
+        else:
+            self.gpuTime += self.smoothing * (gpuTime - self.gpuTime)
+
+        error = np.sqrt(self.budget / max(self.gpuTime, 1e-3)) - 1.0
+        if abs(error) < self.deadband:
+            error = 0.0
+
+        previous, older = self.errors
+        self.scale += self.kp * (error - previous) + self.ki * error \
+            + self.kd * (error - 2 * previous + older)
+        self.scale = min(self.maxScale, max(self.minScale, self.scale))
+        self.errors = [error, previous]
+
+        return self.scale
+#endregion
@@ -1,52 +1,232 @@
 from config import *
+import threading
 import sphere
 import camera
 import node
 import bvh_backend
+import bvh_scheduler
 import materials
+import instance
+import scene_cache
 
 class Scene:
     """
         Holds pointers to all objects in the scene
     """
 
+    instanced = False
 
-    def __init__(self):
+    def __init__(self, sphere_count: int = 3000):
         """
             Set up scene objects.
         """
         
-        self.rebuild_count = 0
+        #"sah", "lbvh" (morton codes) or "hybrid" (morton top, sah leaves)
+        self.builder = "sah"
+        self.parallel_build = True
+        #number nodes breadth first, so refits can work a level at a time
+        self.level_ordered = False
+        self.async_rebuild = True
+        #load the spheres and tree from disk if they've been built before
+        self.use_cache = True
+        #hold the spheres still, so the renderer can accumulate
+        self.animate = True
+        #children per node the gpu traverses, 4 or 8 collapse the
+        #binary tree into a wide one
+        self.bvh_width = 4
         material_count = 16
-        self.materials = materials.make_materials(material_count)
-        self.sphere_count = 3000
-        self.spheres = sphere.make_spheres(self.sphere_count, material_count)
+        self.sphere_count = sphere_count
         
         self.camera = camera.Camera(
             position = [0.0, 0.0, 1.0]
         )
 
-        self.sphere_ids = np.arange(self.sphere_count, dtype=np.int32)
+        start = time.time()
+        self.make_spheres_and_tree(material_count)
+        finish = time.time()
+        print(f"Scene setup took {(finish - start) * 1000} ms.")
+
+        #Rebuilds whenever the refitted tree gets too slow
+        self.scheduler = bvh_scheduler.RebuildScheduler(len(self.nodes))
+        self.scheduler.on_build(self.nodes, self.nodes_used)
+
+        if self.bvh_width > 2:
+            self.wide_nodes, self.wide_sources = bvh_backend.make_wide_nodes(
+                self.nodes, self.bvh_width)
+            self.wide_count = bvh_backend.collapse_bvh(
+                self.nodes, self.wide_nodes, self.wide_sources)
+
+        #Back buffers, written by the rebuild thread
+        self.back_sphere_ids = self.sphere_ids.copy()
+        self.back_nodes = node.make_nodes(len(self.nodes))
+        self.back_nodes_used = 0
+        self.back_level_offsets = None
+        self.rebuild_thread: threading.Thread = None
+
+        #Which arrays need to be sent to the gpu
+        self.spheres_changed = True
+        self.nodes_changed = True
+        self.sphere_ids_changed = True
+        self.materials_changed = True
+
+        """
+        for i in range(self.nodes_used):
+            node.print_node(self.nodes[i], i)
+        """
+
+        self.outDated = True
+    
+    def make_spheres_and_tree(self, material_count: int) -> None:
+        """
+            Generate the spheres and build their bvh, or memory map
+            the results of doing so last time.
+        """
+
+        if self.use_cache:
+            key = scene_cache.cache_key({
+                "sphere_count": self.sphere_count,
+                "material_count": material_count,
+                "builder": self.builder,
+                "parallel_build": self.parallel_build,
+                "level_ordered": self.level_ordered,
+            })
+            #copy on write, as the spheres and tree will be animated
+            cached = scene_cache.load(key, mmap_mode = 'c')
+            if cached is not None:
+                self.materials = cached["materials"]
+                self.spheres = cached["spheres"]
+                self.sphere_ids = cached["sphere_ids"]
+                self.nodes = cached["nodes"]
+                self.nodes_used = cached["nodes_used"]
+                self.level_offsets = cached["level_offsets"]
+                return
 
+        self.materials = materials.make_materials(material_count)
+        self.spheres = sphere.make_spheres(self.sphere_count, material_count)
+        self.sphere_ids = np.arange(self.sphere_count, dtype=np.int32)
         self.nodes = node.make_nodes(2 * self.sphere_count + 1)
 
         start = time.time()
-        self.nodes_used = bvh_backend.build_bvh(
-            self.nodes, self.spheres, self.sphere_ids, self.sphere_count)
+        self.build()
         finish = time.time()
         print(f"BVH build took {(finish - start) * 1000} ms.")
 
+        if self.use_cache:
+            scene_cache.save(key, {
+                "spheres": self.spheres,
+                "materials": self.materials,
+                "nodes": self.nodes,
+                "sphere_ids": self.sphere_ids,
+                "nodes_used": self.nodes_used,
+                "level_offsets": self.level_offsets,
+            })
+    
+    def build(self) -> None:
         """
-        for i in range(self.nodes_used):
-            node.print_node(self.nodes[i], i)
+            Build the bvh from scratch.
         """
 
-        self.outDated = True
+        self.nodes_used, self.level_offsets = self.build_into(
+            self.nodes, self.spheres, self.sphere_ids)
+    
+    def build_into(self, nodes: np.ndarray, 
+        spheres: np.ndarray, sphere_ids: np.ndarray) -> int:
+        """
+            Build a bvh over the given spheres into the given
+            buffers.
+
+            Returns the number of nodes used and, if the tree is
+            level ordered, its level offsets.
+        """
+
+        nodes_used = self.build_tree(nodes, spheres, sphere_ids)
+        
+        if not self.level_ordered:
+            return (nodes_used, None)
+        
+        level_offsets = bvh_backend.order_by_level(nodes, nodes_used)
+        return (nodes_used, level_offsets)
+    
+    def build_tree(self, nodes: np.ndarray, 
+        spheres: np.ndarray, sphere_ids: np.ndarray) -> int:
+        """
+            Run the selected builder, returns the number of nodes used.
+        """
+
+        if self.builder == "lbvh":
+            return bvh_backend.build_lbvh(
+                nodes, spheres, sphere_ids, self.sphere_count)
+        elif self.builder == "hybrid":
+            return bvh_backend.build_lbvh(
+                nodes, spheres, sphere_ids, self.sphere_count, 
+                sah_below = 256)
+        elif self.parallel_build:
+            return bvh_backend.build_bvh_parallel(
+                nodes, spheres, sphere_ids, self.sphere_count)
+        else:
+            return bvh_backend.build_bvh(
+                nodes, spheres, sphere_ids, self.sphere_count)
+    
+    def start_rebuild(self) -> None:
+        """
+            Kick off a full rebuild on a worker thread, against a
+            snapshot of the spheres as they are now.
+        """
+
+        snapshot = self.spheres.copy()
+        self.back_sphere_ids[:] = self.sphere_ids
+
+        def work() -> None:
+            self.back_nodes_used, self.back_level_offsets = self.build_into(
+                self.back_nodes, snapshot, self.back_sphere_ids)
+
+        self.rebuild_thread = threading.Thread(target = work, daemon = True)
+        self.rebuild_thread.start()
+    
+    def finish_rebuild(self) -> bool:
+        """
+            If the worker has finished, swap its tree in.
+            Only call this between frames.
+
+            Returns whether the tree was swapped.
+        """
+
+        if self.rebuild_thread is None or self.rebuild_thread.is_alive():
+            return False
+        
+        self.rebuild_thread.join()
+        self.rebuild_thread = None
+
+        self.nodes, self.back_nodes = self.back_nodes, self.nodes
+        self.sphere_ids, self.back_sphere_ids = self.back_sphere_ids, self.sphere_ids
+        self.nodes_used, self.back_nodes_used = self.back_nodes_used, self.nodes_used
+        self.level_offsets = self.back_level_offsets
+        self.sphere_ids_changed = True
+
+        return True
     
     def rebuild(self):
 
-        self.nodes_used = bvh_backend.build_bvh(
-            self.nodes, self.spheres, self.sphere_ids, 3000)
+        self.build()
+        self.scheduler.on_build(self.nodes, self.nodes_used)
+        self.sphere_ids_changed = True
+    
+    def update_wide_bvh(self) -> None:
+        """
+            Bring the wide tree up to date with the binary one.
+            Its shape only changes when the binary tree's does,
+            otherwise the boxes are just refit.
+        """
+
+        if self.bvh_width <= 2:
+            return
+
+        if self.sphere_ids_changed:
+            self.wide_count = bvh_backend.collapse_bvh(
+                self.nodes, self.wide_nodes, self.wide_sources)
+        else:
+            bvh_backend.refit_wide_bvh(
+                self.nodes, self.wide_nodes, self.wide_sources, self.wide_count)
     
     def move_player(self, forwardsSpeed, rightSpeed):
         """
@@ -81,14 +261,131 @@ class Scene:
             Update everything in the scene
         """
 
+        if not self.animate:
+            return
+
         self.outDated = True
         sphere.update_spheres(self.spheres, dt)
+        self.spheres_changed = True
+        self.nodes_changed = True
 
-        if self.rebuild_count == 16:
-            self.nodes_used = bvh_backend.build_bvh(
-                self.nodes, self.spheres, 
-                self.sphere_ids, self.sphere_count)
-            self.rebuild_count = 0
-        else:
-            bvh_backend.refit_bvh(self.nodes, self.spheres, self.sphere_ids, self.nodes_used)
-            self.rebuild_count += 1
+        if not self.async_rebuild:
+            decision = self.scheduler.refit(
+                self.nodes, self.spheres, self.sphere_ids, self.nodes_used,
+                level_offsets = self.level_offsets)
+            if decision == "rebuild":
+                self.rebuild()
+            elif decision == "partial":
+                self.sphere_ids_changed = True
+            self.update_wide_bvh()
+            return
+
+        #The new tree was built against older sphere positions,
+        #so it's refit like any other frame.
+        swapped = self.finish_rebuild()
+
+        decision = self.scheduler.refit(
+            self.nodes, self.spheres, self.sphere_ids, self.nodes_used,
+            fresh = swapped, pending = self.rebuild_thread is not None,
+            level_offsets = self.level_offsets)
+        
+        if decision == "rebuild":
+            self.start_rebuild()
+        elif decision == "partial":
+            self.sphere_ids_changed = True
+        self.update_wide_bvh()
+
+
+class InstancedScene(Scene):
+    """
+        Many copies of a few clusters of spheres. Each cluster gets
+        a bottom level bvh (blas), built once, and a top level bvh
+        (tlas) over the instances is refit as they move.
+    """
+
+    instanced = True
+
+    def __init__(self, instance_count: int = 1000, 
+        cluster_count: int = 4, cluster_size: int = 256):
+        """
+            Set up scene objects.
+        """
+
+        self.animate = True
+        #the wide tree is only for the flat scene
+        self.bvh_width = 2
+        material_count = 16
+        self.materials = materials.make_materials(material_count)
+
+        self.camera = camera.Camera(
+            position = [0.0, 0.0, 1.0]
+        )
+
+        start = time.time()
+        clusters = [sphere.make_cluster(cluster_size, 4.0, material_count)
+                    for _ in range(cluster_count)]
+        self.nodes, self.sphere_ids, self.spheres, roots = instance.pack_blases(clusters)
+        self.sphere_count = len(self.spheres)
+        self.nodes_used = len(self.nodes)
+        self.level_offsets = None
+
+        self.instance_count = instance_count
+        self.instances, self.transforms, self.velocities = instance.make_instances(
+            instance_count, roots)
+        self.instance_bounds = np.zeros(instance_count, dtype = data_type_primitive_bounds)
+        instance.write_instances(
+            self.instances, self.transforms, self.nodes, self.instance_bounds)
+
+        self.tlas_nodes = node.make_nodes(2 * instance_count + 1)
+        self.instance_ids = np.arange(instance_count, dtype = np.int32)
+        self.build_tlas()
+        finish = time.time()
+        print(f"BVH build took {(finish - start) * 1000} ms.")
+
+        #Only the top level changes, so only it is scheduled
+        self.scheduler = bvh_scheduler.RebuildScheduler(len(self.tlas_nodes))
+        self.scheduler.on_build(self.tlas_nodes, self.tlas_nodes_used)
+
+        #Which arrays need to be sent to the gpu
+        self.spheres_changed = True
+        self.nodes_changed = True
+        self.sphere_ids_changed = True
+        self.materials_changed = True
+        self.instances_changed = True
+        self.tlas_nodes_changed = True
+        self.instance_ids_changed = True
+
+        self.outDated = True
+    
+    def build_tlas(self) -> None:
+        """
+            Build the top level bvh from scratch. It's small, so
+            this is cheap enough to do between frames.
+        """
+
+        self.tlas_nodes_used = bvh_backend.build_bvh(
+            self.tlas_nodes, self.instance_bounds, 
+            self.instance_ids, self.instance_count)
+    
+    def update(self, dt: float) -> None:
+        """
+            Update everything in the scene
+        """
+
+        if not self.animate:
+            return
+
+        self.outDated = True
+        instance.update_instances(self.transforms, self.velocities, dt)
+        instance.write_instances(
+            self.instances, self.transforms, self.nodes, self.instance_bounds)
+        self.instances_changed = True
+        self.tlas_nodes_changed = True
+
+        decision = self.scheduler.refit(
+            self.tlas_nodes, self.instance_bounds, 
+            self.instance_ids, self.tlas_nodes_used)
+        if decision == "rebuild":
+            self.build_tlas()
+            self.scheduler.on_build(self.tlas_nodes, self.tlas_nodes_used)
+            self.instance_ids_changed = True
@@ -0,0 +1,113 @@
+from config import *
+import os
+import json
+import shutil
+import hashlib
+import inspect
+import tempfile
+import sphere
+import materials
+import bvh_backend
+
+#---- Scene Cache                    ----#
+# Built scenes are saved as plain .npy   #
+# files, one folder per scene, named by  #
+# a hash of everything that went into    #
+# them. Loading memory maps the files,   #
+# so nothing is read until it's used.    #
+#----------------------------------------#
+
+CACHE_VERSION = 1
+CACHE_FOLDER = "cache"
+arrays = ("spheres", "materials", "nodes", "sphere_ids")
+
+#region
+def cache_key(params: dict) -> str:
+    """
+        Hash the scene parameters, the state of the random number
+        generator and the source of everything that generates or
+        builds the scene, so editing any of it misses the cache.
+    """
+
+    digest = hashlib.sha256()
+    digest.update(f"version {CACHE_VERSION}".encode())
+    digest.update(json.dumps(params, sort_keys = True).encode())
+
+    _, keys, position, _, _ = np.random.get_state()
+    digest.update(keys.tobytes())
+    digest.update(str(position).encode())
+
+    for source in (make_generator, sphere.make_spheres,
+        materials.make_materials, bvh_backend):
+        digest.update(inspect.getsource(source).encode())
+
+    return digest.hexdigest()[:32]
+
+def load(key: str, mmap_mode: str = 'r') -> dict:
+    """
+        Memory map a cached scene.
+
+            Parameters:
+                key (str): from cache_key
+                mmap_mode (str): 'r' for scenes which never change,
+                    'c' (copy on write) for scenes which animate
+
+            Returns the arrays and "nodes_used" (plus "level_offsets"
+            if the tree was level ordered), or None on a miss.
+    """
+
+    folder = os.path.join(CACHE_FOLDER, key)
+    try:
+        with open(os.path.join(folder, "meta.json"), 'r') as f:
+            meta = json.load(f)
+        if meta["version"] != CACHE_VERSION or meta["key"] != key:
+            return None
+
+        contents = {name: np.load(os.path.join(folder, f"{name}.npy"),
+                                  mmap_mode = mmap_mode)
+                    for name in arrays}
+        if meta["level_ordered"]:
+            contents["level_offsets"] = np.load(
+                os.path.join(folder, "level_offsets.npy"))
+        else:
+            contents["level_offsets"] = None
+    except (OSError, ValueError, KeyError):
+        return None
+
+    contents["nodes_used"] = meta["nodes_used"]
+    return contents
+
+def save(key: str, contents: dict) -> None:
+    """
+        Write a scene to the cache. The folder is written under a
+        temporary name first, so a crash never leaves a half
+        written entry behind.
+    """
+
+    os.makedirs(CACHE_FOLDER, exist_ok = True)
+    folder = os.path.join(CACHE_FOLDER, key)
+    staging = tempfile.mkdtemp(dir = CACHE_FOLDER)
+
+    for name in arrays:
+        np.save(os.path.join(staging, f"{name}.npy"), contents[name])
+
+    level_offsets = contents.get("level_offsets")
+    if level_offsets is not None:
+        np.save(os.path.join(staging, "level_offsets.npy"), level_offsets)
+
+    meta = {
+        "version": CACHE_VERSION,
+        "key": key,
+        "nodes_used": int(contents["nodes_used"]),
+        "level_ordered": level_offsets is not None,
+    }
+    with open(os.path.join(staging, "meta.json"), 'w') as f:
+        json.dump(meta, f)
+
+    shutil.rmtree(folder, ignore_errors = True)
+    try:
+        os.replace(staging, folder)
+    except OSError:
+        #someone else got there first
+        shutil.rmtree(staging, ignore_errors = True)
+#endregion
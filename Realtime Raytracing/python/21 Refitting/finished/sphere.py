@@ -1,20 +1,52 @@
 from config import *
 
-def make_spheres(count: int, material_count: int) -> np.ndarray:
-
-    spheres = []
-    for _ in range(count):
-        x = np.random.uniform(low = -95.0, high = 95.0)
-        y = np.random.uniform(low = -95.0, high = 95.0)
-        z = np.random.uniform(low = -15.0, high = 15.0)
-        radius = np.random.uniform(low = 0.3, high = 2.0)
-        vx = np.random.uniform(low = -1.0, high = 1.0)
-        vy = np.random.uniform(low = -1.0, high = 1.0)
-        vz = np.random.uniform(low = -1.0, high = 1.0)
-        material = np.random.randint(low = 0, high = material_count)
-        spheres.append((x,y,z,radius,vx,vy,vz,material))
-
-    return np.array(spheres, dtype=data_type_sphere)
+def make_spheres(count: int, material_count: int, 
+    rng: np.random.Generator = None) -> np.ndarray:
+    """
+        Scatter moving spheres through the scene's box, drawing
+        each field for every sphere at once.
+
+            Parameters:
+                count (int): number of spheres
+                material_count (int): materials to pick from
+                rng: generator to draw from, see make_generator
+    """
+
+    if rng is None:
+        rng = make_generator()
+
+    spheres = np.zeros(count, dtype=data_type_sphere)
+    spheres['x'] = rng.uniform(low = -95.0, high = 95.0, size = count)
+    spheres['y'] = rng.uniform(low = -95.0, high = 95.0, size = count)
+    spheres['z'] = rng.uniform(low = -15.0, high = 15.0, size = count)
+    spheres['radius'] = rng.uniform(low = 0.3, high = 2.0, size = count)
+    spheres['vx'] = rng.uniform(low = -1.0, high = 1.0, size = count)
+    spheres['vy'] = rng.uniform(low = -1.0, high = 1.0, size = count)
+    spheres['vz'] = rng.uniform(low = -1.0, high = 1.0, size = count)
+    spheres['material'] = rng.integers(low = 0, high = material_count, size = count)
+
+    return spheres
+
+def make_cluster(count: int, radius: float, material_count: int) -> np.ndarray:
+    """
+        Still spheres scattered through a ball around the origin,
+        to be shared between instances.
+    """
+
+    spheres = np.zeros(count, dtype=data_type_sphere)
+
+    directions = np.random.normal(size = (count, 3))
+    directions /= np.linalg.norm(directions, axis = 1, keepdims = True)
+    distances = radius * np.cbrt(np.random.uniform(size = count))
+    centers = directions * distances[:, np.newaxis]
+
+    spheres['x'] = centers[:, 0]
+    spheres['y'] = centers[:, 1]
+    spheres['z'] = centers[:, 2]
+    spheres['radius'] = np.random.uniform(low = 0.05, high = 0.2, size = count) * radius
+    spheres['material'] = np.random.randint(low = 0, high = material_count, size = count)
+
+    return spheres
 
 @njit(cache = True)
 def update_spheres(spheres: np.ndarray, dt: float) -> None:
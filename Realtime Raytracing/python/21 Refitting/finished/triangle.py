@@ -0,0 +1,83 @@
+from config import *
+
+def make_triangles(vertices: np.ndarray, faces: np.ndarray,
+    material: int = 0) -> np.ndarray:
+    """
+        Pack indexed triangles into an array of data_type_triangle.
+
+            Parameters:
+                vertices: (n, 3) float array of positions
+                faces: (m, 3) int array of corner indices
+                material (int): material index for every triangle
+    """
+
+    corners = vertices[faces].astype(np.float32)
+    a = corners[:, 0]
+    b = corners[:, 1]
+    c = corners[:, 2]
+
+    normals = np.cross(b - a, c - a)
+    lengths = np.linalg.norm(normals, axis = 1, keepdims = True)
+    normals = normals / np.maximum(lengths, 1e-12)
+
+    triangles = np.zeros(len(faces), dtype = data_type_triangle)
+    triangles['ax'], triangles['ay'], triangles['az'] = a.T
+    triangles['bx'], triangles['by'], triangles['bz'] = b.T
+    triangles['cx'], triangles['cy'], triangles['cz'] = c.T
+    triangles['nx'], triangles['ny'], triangles['nz'] = normals.T
+    triangles['material'] = material
+    triangles['dominant_axis'] = np.argmax(np.abs(normals), axis = 1)
+
+    return triangles
+
+def load_obj(filepath: str, material: int = 0) -> np.ndarray:
+    """
+        Read the positions and faces of an obj file into an array
+        of data_type_triangle. Polygons are split into fans.
+    """
+
+    with open(filepath, 'r') as f:
+        lines = f.read().splitlines()
+
+    vertex_tokens = []
+    faces = []
+    for line in lines:
+
+        if line.startswith("v "):
+            vertex_tokens.extend(line.split()[1:4])
+
+        elif line.startswith("f "):
+            corners = [int(token.partition("/")[0]) for token in line.split()[1:]]
+            for i in range(1, len(corners) - 1):
+                faces.append((corners[0], corners[i], corners[i + 1]))
+
+    vertices = np.array(vertex_tokens, dtype = np.float32).reshape(-1, 3)
+    faces = np.array(faces, dtype = np.int64).reshape(-1, 3)
+
+    #obj indices count from 1, negative ones count back from the end
+    faces = np.where(faces > 0, faces - 1, faces + len(vertices))
+
+    return make_triangles(vertices, faces, material)
+
+def make_terrain(size: int, extent: float = 190.0,
+    height: float = 10.0, material: int = 0) -> np.ndarray:
+    """
+        A rolling heightfield of 2 * size * size triangles,
+        handy for testing big meshes.
+    """
+
+    coordinates = np.linspace(-0.5 * extent, 0.5 * extent, size + 1, dtype = np.float32)
+    x, y = np.meshgrid(coordinates, coordinates, indexing = 'ij')
+    z = height * (np.sin(0.1 * x) * np.cos(0.07 * y) - 1.5)
+    vertices = np.stack((x, y, z), axis = -1).reshape(-1, 3)
+
+    index = np.arange((size + 1) * (size + 1)).reshape(size + 1, size + 1)
+    corner_a = index[:-1, :-1].ravel()
+    corner_b = index[1:, :-1].ravel()
+    corner_c = index[1:, 1:].ravel()
+    corner_d = index[:-1, 1:].ravel()
+    faces = np.concatenate((
+        np.stack((corner_a, corner_b, corner_c), axis = 1),
+        np.stack((corner_a, corner_c, corner_d), axis = 1)))
+
+    return make_triangles(vertices, faces, material)
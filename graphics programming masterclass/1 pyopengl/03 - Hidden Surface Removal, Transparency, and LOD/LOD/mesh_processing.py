@@ -0,0 +1,207 @@
+import numpy as np
+
+"""
+    Gets indexed meshes ready for the gpu.
+
+    Identical vertices are merged, triangles are put in an order
+    which keeps reusing the vertices the gpu has just shaded
+    (Tom Forsyth's "Linear-Speed Vertex Cache Optimisation"), then
+    vertices are renumbered in the order the triangles first use
+    them, so they're fetched from memory front to back.
+"""
+
+#vertices the post transform cache is assumed to hold
+CACHE_SIZE = 32
+
+#Forsyth's constants
+CACHE_DECAY_POWER = 1.5
+LAST_TRIANGLE_SCORE = 0.75
+VALENCE_BOOST_SCALE = 2.0
+VALENCE_BOOST_POWER = 0.5
+
+################################## Processing #################################
+
+def process_mesh(vertices: np.ndarray,
+    indices: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+        Weld, then reorder for the vertex cache, then for
+        vertex fetch.
+
+        Parameters:
+
+            vertices: float32 array (vertex count, floats per vertex)
+
+            indices: uint32 array, three per triangle
+
+        Returns:
+
+            The new vertices and indices.
+    """
+
+    vertices, indices = weld_vertices(vertices, indices)
+    indices = optimize_vertex_cache(indices, len(vertices))
+    return optimize_vertex_fetch(vertices, indices)
+
+def weld_vertices(vertices: np.ndarray,
+    indices: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+        Merge vertices whose every float is the same.
+    """
+
+    if len(vertices) == 0:
+        return vertices, indices
+
+    #compare whole rows at once, as raw bytes
+    rows = np.ascontiguousarray(vertices).view(
+        np.dtype((np.void, vertices.dtype.itemsize * vertices.shape[1]))).reshape(-1)
+    _, first, remap = np.unique(rows, return_index = True, return_inverse = True)
+
+    #keep the survivors in their original order
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    remap = rank[remap.reshape(-1)]
+
+    return vertices[first[order]], remap[indices].astype(np.uint32)
+
+def optimize_vertex_cache(indices: np.ndarray, vertex_count: int,
+    cache_size: int = CACHE_SIZE) -> np.ndarray:
+    """
+        Reorder triangles so each one reuses as many recently
+        used vertices as possible.
+
+        Every vertex gets a score from how recently it was used
+        and how many triangles still need it, and the triangle
+        with the highest total goes next. Only triangles touching
+        the cache can change score, so only they are looked at.
+
+        Returns the reordered indices.
+    """
+
+    triangleCount = len(indices) // 3
+    if triangleCount == 0:
+        return indices
+
+    triangles = np.asarray(indices, dtype=np.int64).reshape(-1, 3)
+
+    # triangles around each vertex, packed one vertex after another
+    corners = triangles.reshape(-1)
+    valence = np.bincount(corners, minlength = vertex_count)
+    adjacencyStart = np.concatenate(([0], np.cumsum(valence)))
+    adjacency = (np.argsort(corners, kind = "stable") // 3).tolist()
+    adjacencyStart = adjacencyStart.tolist()
+
+    # scores by cache position, and by triangles left to draw
+    cacheScores = [LAST_TRIANGLE_SCORE] * 3 + [
+        (1.0 - (i - 3) / (cache_size - 3)) ** CACHE_DECAY_POWER
+        for i in range(3, cache_size)]
+    maxValence = int(valence.max())
+    valenceScores = [0.0] + [
+        VALENCE_BOOST_SCALE * count ** -VALENCE_BOOST_POWER
+        for count in range(1, maxValence + 1)]
+
+    remaining = valence.tolist()
+    # which triangles each vertex still needs, swapped to the front
+    activeCount = list(remaining)
+    vertexScores = [valenceScores[count] for count in remaining]
+    triangles = triangles.tolist()
+    drawn = [False] * triangleCount
+
+    cache = []
+    order = []
+    best = max(range(triangleCount),
+        key = lambda t: sum(vertexScores[v] for v in triangles[t]))
+    cursor = 0
+
+    while len(order) < triangleCount:
+
+        if best < 0:
+            #nothing in the cache leads anywhere, take the next triangle left
+            while drawn[cursor]:
+                cursor += 1
+            best = cursor
+
+        drawn[best] = True
+        order.append(best)
+        triangle = triangles[best]
+
+        #forget the triangle in each of its vertices' lists
+        for v in triangle:
+            start = adjacencyStart[v]
+            end = start + activeCount[v] - 1
+            for i in range(start, end + 1):
+                if adjacency[i] == best:
+                    adjacency[i], adjacency[end] = adjacency[end], adjacency[i]
+                    break
+            activeCount[v] -= 1
+            remaining[v] -= 1
+
+        #move its vertices to the front of the cache
+        front = list(dict.fromkeys(triangle))
+        cache = front + [v for v in cache if v not in front]
+        for v in cache[cache_size:]:
+            vertexScores[v] = valenceScores[remaining[v]] if remaining[v] else -1.0
+        del cache[cache_size:]
+
+        #rescore what's in the cache, and the triangles around it
+        for position, v in enumerate(cache):
+            if remaining[v] == 0:
+                vertexScores[v] = -1.0
+            else:
+                vertexScores[v] = cacheScores[position] + valenceScores[remaining[v]]
+
+        best = -1
+        bestScore = -1.0
+        for v in cache:
+            start = adjacencyStart[v]
+            for t in adjacency[start:start + activeCount[v]]:
+                a, b, c = triangles[t]
+                score = vertexScores[a] + vertexScores[b] + vertexScores[c]
+                if score > bestScore:
+                    best = t
+                    bestScore = score
+
+    ordered = np.asarray(triangles, dtype=np.uint32)[order]
+    return ordered.reshape(-1)
+
+def optimize_vertex_fetch(vertices: np.ndarray,
+    indices: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+        Renumber vertices in the order the indices first use
+        them. Vertices no triangle uses are dropped.
+    """
+
+    used, first = np.unique(indices, return_index = True)
+    order = used[np.argsort(first)]
+    remap = np.zeros(len(vertices), dtype=np.uint32)
+    remap[order] = np.arange(len(order), dtype=np.uint32)
+
+    return vertices[order], remap[indices]
+
+################################## Measuring ##################################
+
+def average_cache_miss_ratio(indices: np.ndarray,
+    cache_size: int = CACHE_SIZE) -> float:
+    """
+        Vertices shaded per triangle, on a first in first out
+        cache like the gpu's. 3 is no reuse at all, 0.5 is about
+        the best a big regular grid can do.
+    """
+
+    triangleCount = len(indices) // 3
+    if triangleCount == 0:
+        return 0.0
+
+    cache = []
+    cached = set()
+    misses = 0
+    for v in np.asarray(indices).tolist():
+        if v in cached:
+            continue
+        misses += 1
+        cache.append(v)
+        cached.add(v)
+        if len(cache) > cache_size:
+            cached.discard(cache.pop(0))
+
+    return misses / triangleCount
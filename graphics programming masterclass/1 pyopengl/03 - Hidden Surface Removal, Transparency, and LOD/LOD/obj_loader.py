@@ -0,0 +1,345 @@
+import numpy as np
+import os
+import re
+import json
+import shutil
+import tempfile
+import mesh_processing
+
+"""
+    Loads obj models into indexed vertex and index arrays.
+
+    Each kind of line (v, vt, vn, f) is gathered up and handed
+    to numpy in one go, rather than parsed a float at a time.
+    Corners which share a position, texture coordinate and normal
+    become one vertex, then mesh_processing orders the triangles
+    and vertices for the gpu. The result is saved as .npy files
+    beside the model, so the next load just memory maps them.
+"""
+
+CACHE_VERSION = 3
+
+#floats per vertex for each attribute
+ATTRIBUTE_SIZES = {
+    "position": 3,
+    "texcoord": 2,
+    "normal": 3,
+    "tangent": 3,
+    "bitangent": 3,
+}
+
+################################## Loading ####################################
+
+def load_obj(filename: str,
+    attributes: tuple[str] = ("position", "texcoord", "normal"),
+    cache: bool = True) -> tuple[np.ndarray, np.ndarray]:
+    """
+        Load a mesh from an obj file.
+
+        Parameters:
+
+            filename: the filename.
+
+            attributes: what each vertex holds, in order, from
+                "position", "texcoord", "normal", "tangent" and
+                "bitangent". Anything the file leaves out is zero.
+
+            cache: whether to read and write the binary cache.
+
+        Returns:
+
+            The vertices, as a float32 array (vertex count,
+            floats per vertex), and the uint32 indices, three
+            per triangle.
+    """
+
+    for attribute in attributes:
+        if attribute not in ATTRIBUTE_SIZES:
+            raise ValueError(f"unknown attribute: {attribute}")
+
+    if not cache:
+        return mesh_processing.process_mesh(*parse_obj(filename, attributes))
+
+    layout = "_".join(attributes)
+    contents = load_cache(filename, layout)
+    if contents is None:
+        contents = mesh_processing.process_mesh(*parse_obj(filename, attributes))
+        save_cache(filename, layout, *contents)
+    return contents
+
+def parse_obj(filename: str,
+    attributes: tuple[str]) -> tuple[np.ndarray, np.ndarray]:
+    """
+        Parse an obj file, ignoring any cache, and without
+        reordering anything. See load_obj.
+    """
+
+    #every line starts after a newline, even the first
+    with open(filename, "r") as file:
+        text = "\n" + file.read()
+    #numpy stops reading at the first thing that isn't a number
+    if "#" in text:
+        text = re.sub(r"#[^\n]*", "", text)
+
+    v = read_floats(find_lines("v", text), 3)
+    vt = read_floats(find_lines("vt", text), 2)
+    vn = read_floats(find_lines("vn", text), 3)
+    faces = find_lines("f", text)
+
+    # one row per corner: v, vt, vn (-1 where missing)
+    corners, triangles = read_face_data(faces)
+    if (corners < -1).any():
+        corners = resolve_relative(corners, triangles, text)
+
+    # which corners count as the same vertex
+    wantsTangents = "tangent" in attributes or "bitangent" in attributes
+    key = np.zeros(len(corners), dtype=np.int64)
+    for column, needed in enumerate((True,
+        "texcoord" in attributes or wantsTangents,
+        "normal" in attributes)):
+        if needed and len(corners) > 0:
+            key = key * (corners[:,column].max() + 2) + corners[:,column] + 1
+            _, key = np.unique(key, return_inverse = True)
+    _, first, inverse = np.unique(key, return_index = True, return_inverse = True)
+    corners = corners[first]
+    indices = inverse.reshape(-1).astype(np.uint32)
+
+    #a zero row on the end, for missing elements (index -1) to land on
+    v = np.vstack((v, np.zeros((1, 3))))
+    vt = np.vstack((vt, np.zeros((1, 2))))
+    vn = np.vstack((vn, np.zeros((1, 3))))
+
+    columns = {
+        "position": v[corners[:,0]],
+        "texcoord": vt[corners[:,1]],
+        "normal": vn[corners[:,2]],
+    }
+    if wantsTangents:
+        columns["tangent"], columns["bitangent"] = get_vertex_orientations(
+            columns["position"], columns["texcoord"], indices.reshape(-1, 3))
+
+    vertices = np.hstack([columns[attribute] for attribute in attributes])
+    return vertices.astype(np.float32), indices
+
+def line_pattern(kind: str) -> re.Pattern:
+    """
+        Matches a line of a kind, from the newline before it.
+        Searching for the newline and keyword together is far
+        quicker than anchoring to the start of each line.
+    """
+
+    return re.compile(rf"\n{kind}[ \t]+([^\n]*)")
+
+def find_lines(kind: str, text: str) -> list[str]:
+    """
+        Everything after the keyword, on each line of a kind.
+    """
+
+    return line_pattern(kind).findall(text)
+
+def read_floats(lines: list[str], width: int) -> np.ndarray:
+    """
+        Parse the numbers on some lines, keeping the first
+        width of them from each.
+    """
+
+    if len(lines) == 0:
+        return np.zeros((0, width))
+
+    values = np.fromstring(" ".join(lines), dtype=np.float64, sep=" ")
+    if values.size % len(lines) == 0 and values.size // len(lines) >= width:
+        return values.reshape(len(lines), -1)[:,:width]
+
+    #lines of different lengths, go one at a time
+    return np.array([line.split()[:width] for line in lines], dtype=np.float64)
+
+def read_face_data(faces: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """
+        Parse the faces, and split each one into a fan of
+        triangles.
+
+        Returns the corners, as an int64 array (corner count, 3)
+        of v, vt, vn (counted from 0, -1 where missing, below -1
+        where the file counts back from the end), and the face
+        each triangle came from.
+    """
+
+    if len(faces) == 0:
+        return np.zeros((0, 3), dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    # "v", "v/vt", "v//vn" or "v/vt/vn", which can change from face to face
+    text = "\n".join(faces).replace("//", "/0/")
+
+    #slashes in each face, faces are one line each
+    characters = np.frombuffer(text.encode(), dtype=np.uint8)
+    faceOfCharacter = np.cumsum(characters == ord("\n"))
+    slashCounts = np.bincount(faceOfCharacter[characters == ord("/")],
+        minlength = len(faces))
+
+    #faces are told apart by a nan between them
+    values = np.fromstring(text.replace("\n", " nan ").replace("/", " "),
+        dtype=np.float64, sep=" ")
+    gaps = np.flatnonzero(np.isnan(values))
+    bounds = np.concatenate(([-1], gaps, [len(values)]))
+    lengths = np.diff(bounds) - 1
+
+    #each corner has one more number than it has slashes
+    cornerCounts = lengths - slashCounts
+    triangleCounts = cornerCounts - 2
+    if (triangleCounts < 1).any():
+        raise ValueError("face with fewer than three corners")
+    widths = lengths // cornerCounts
+    if (lengths % cornerCounts).any() or (widths > 3).any():
+        raise ValueError("face mixes corner formats")
+
+    #pad every corner out to v, vt, vn
+    numbers = values[~np.isnan(values)].astype(np.int64)
+    cornerWidths = np.repeat(widths, cornerCounts)
+    cornerStarts = np.cumsum(cornerWidths) - cornerWidths
+    elements = np.zeros((len(cornerWidths), 3), dtype=np.int64)
+    for column in range(3):
+        present = cornerWidths > column
+        elements[present, column] = numbers[cornerStarts[present] + column]
+    #obj counts from 1, negative counts back, 0 (or nothing) is missing
+    corners = np.where(elements > 0, elements - 1, elements)
+    corners[elements == 0] = -1
+    corners[elements < 0] -= 1
+
+    # corner i of a face: (0, i + 1, i + 2)
+    firstCorners = np.cumsum(cornerCounts) - cornerCounts
+    triangles = np.repeat(np.arange(len(faces)), triangleCounts)
+    step = np.arange(len(triangles)) - np.repeat(
+        np.cumsum(triangleCounts) - triangleCounts, triangleCounts)
+    fan = firstCorners[triangles]
+    order = np.stack((fan, fan + step + 1, fan + step + 2), axis = 1).reshape(-1)
+
+    return corners[order], triangles
+
+def resolve_relative(corners: np.ndarray, triangles: np.ndarray,
+    text: str) -> np.ndarray:
+    """
+        Turn negative elements into absolute ones. -1 is the
+        last element defined before the face, so it depends on
+        where the face sits in the file.
+    """
+
+    def where(kind: str) -> np.ndarray:
+        return np.array([match.start() for match in line_pattern(kind).finditer(text)],
+            dtype=np.int64)
+
+    facePlaces = np.repeat(where("f")[triangles], 3)
+
+    corners = corners.copy()
+    for column, kind in enumerate(("v", "vt", "vn")):
+        countBefore = np.searchsorted(where(kind), facePlaces)
+        relative = corners[:,column] < -1
+        # -2 (was -1) is the element just before
+        corners[relative, column] += countBefore[relative] + 1
+    return corners
+
+def get_vertex_orientations(positions: np.ndarray, texcoords: np.ndarray,
+    triangles: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+        Get the tangent and bitangent of each face, averaged
+        over the faces around each vertex.
+    """
+
+    pos1, pos2, pos3 = (positions[triangles[:,i]] for i in range(3))
+    uv1, uv2, uv3 = (texcoords[triangles[:,i]] for i in range(3))
+
+    #direction vectors
+    dPos1 = pos2 - pos1
+    dPos2 = pos3 - pos1
+    dUV1 = uv2 - uv1
+    dUV2 = uv3 - uv1
+
+    # calculate, faces with no texture stretch get nothing
+    den = dUV1[:,0] * dUV2[:,1] - dUV2[:,0] * dUV1[:,1]
+    den = np.divide(1, den, out = np.zeros_like(den), where = den != 0)[:,None]
+    tangent = den * (dUV2[:,1:2] * dPos1 - dUV1[:,1:2] * dPos2)
+    bitangent = den * (-dUV2[:,0:1] * dPos1 + dUV1[:,0:1] * dPos2)
+
+    corners = triangles.reshape(-1)
+    count = np.bincount(corners, minlength = len(positions))[:,None]
+    count = np.maximum(count, 1)
+
+    def average(faceValues: np.ndarray) -> np.ndarray:
+        cornerValues = np.repeat(faceValues, 3, axis = 0)
+        return np.stack([
+            np.bincount(corners, cornerValues[:,i], minlength = len(positions))
+            for i in range(3)], axis = 1) / count
+
+    return average(tangent), average(bitangent)
+
+################################## Cache ######################################
+
+def cache_folder(filename: str, layout: str) -> str:
+    """
+        Where the cache for a model and vertex layout lives,
+        beside the model.
+    """
+
+    return os.path.join(f"{filename}.cache", layout)
+
+def load_cache(filename: str, layout: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+        Memory map a model's cached arrays.
+
+        Returns the vertices and indices, or None if there's no
+        cache, or the model has changed since it was written.
+    """
+
+    folder = cache_folder(filename, layout)
+    try:
+        stat = os.stat(filename)
+        with open(os.path.join(folder, "meta.json"), "r") as file:
+            meta = json.load(file)
+        if meta["version"] != CACHE_VERSION \
+            or meta["mtime_ns"] != stat.st_mtime_ns \
+            or meta["size"] != stat.st_size \
+            or meta["layout"] != layout:
+            return None
+
+        vertices = np.load(os.path.join(folder, "vertices.npy"), mmap_mode = "r")
+        indices = np.load(os.path.join(folder, "indices.npy"), mmap_mode = "r")
+    except (OSError, ValueError, KeyError):
+        return None
+
+    return vertices, indices
+
+def save_cache(filename: str, layout: str,
+    vertices: np.ndarray, indices: np.ndarray) -> None:
+    """
+        Write a model's arrays to its cache. The folder is
+        written under a temporary name first, so a crash never
+        leaves a half written entry behind. A model in a folder
+        which can't be written to just goes uncached.
+    """
+
+    folder = cache_folder(filename, layout)
+    parent = os.path.dirname(folder)
+    try:
+        stat = os.stat(filename)
+        os.makedirs(parent, exist_ok = True)
+        staging = tempfile.mkdtemp(dir = parent)
+    except OSError:
+        return
+
+    np.save(os.path.join(staging, "vertices.npy"), vertices)
+    np.save(os.path.join(staging, "indices.npy"), indices)
+
+    meta = {
+        "version": CACHE_VERSION,
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "layout": layout,
+    }
+    with open(os.path.join(staging, "meta.json"), "w") as file:
+        json.dump(meta, file)
+
+    shutil.rmtree(folder, ignore_errors = True)
+    try:
+        os.replace(staging, folder)
+    except OSError:
+        #someone else got there first
+        shutil.rmtree(staging, ignore_errors = True)
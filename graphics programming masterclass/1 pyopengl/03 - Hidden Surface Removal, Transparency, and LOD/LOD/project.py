@@ -3,6 +3,7 @@ from OpenGL.GL import *
 from OpenGL.GL.shaders import compileProgram,compileShader
 import numpy as np
 import pyrr
+import obj_loader
 
 ################### Constants        ########################################
 
@@ -253,59 +254,25 @@ class ObjMesh(Mesh):
         """ Load the given file, create a buffer and upload to it. """
 
         super().__init__()
-        vertices = self.loadMesh(filename)
-        self.vertex_count = len(vertices)//3
-        vertices = np.array(vertices, dtype=np.float32)
+        vertices, indices = obj_loader.load_obj(filename, ("position",))
+        self.vertex_count = len(vertices)
+        self.index_count = len(indices)
 
         glBindVertexArray(self.vao)
         glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
         glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+
+        self.ebo = glGenBuffers(1)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
         
         glEnableVertexAttribArray(0)
         glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 12, ctypes.c_void_p(0))
     
-    def loadMesh(self, filename) -> list[float]:
-
-        v: list[list[float]] = []
-        vertices: list[float] = []
-
-        #open the obj file and read the data
-        with open(filename,'r') as f:
-            line = f.readline()
-            while line:
-                
-                words = line.split(" ")
-                if words[0]=="v":
-                    v.append(self.read_vertex_data(words))
-                elif words[0]=="f":
-                    self.read_face_data(words, v, vertices)
-                line = f.readline()
-        
-        return vertices
-    
-    def read_vertex_data(self, words: list[str]) -> list[float]:
-        """ Append the given vertex description to the vertex set."""
-        
-        return [float(words[1]), float(words[2]), float(words[3])]
-    
-    def read_face_data(
-        self, words: list[str], 
-        v: list[list[float]], vertices: list[float]) -> None:
-        
-        # obj file uses triangle fan format for each face individually.
-        triangleCount = len(words) - 3
-        for i in range(triangleCount):
-            self.read_corner(words[1], v, vertices)
-            self.read_corner(words[i+2], v, vertices)
-            self.read_corner(words[i+3], v, vertices)
-    
-    def read_corner(
-        self, description: str,
-        v: list[list[float]], vertices: list[float]) -> None:
+    def destroy(self):
 
-        v_vt_vn = description.split("/")
-        for element in v[int(v_vt_vn[0]) - 1]:
-            vertices.append(element)
+        super().destroy()
+        glDeleteBuffers(1,(self.ebo,))
 
 class Renderer:
 
@@ -335,6 +302,9 @@ class Renderer:
 
         glEnable(GL_BLEND)
         glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+
+        #models are drawn as wireframes
+        glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
     
     def make_assets(self):
         """
@@ -445,7 +415,7 @@ class Renderer:
                     self.objectColorLocation,
                     1, object.get_color()
                 )
-                glDrawArrays(GL_LINES, 0, mesh.vertex_count)
+                glDrawElements(GL_TRIANGLES, mesh.index_count, GL_UNSIGNED_INT, ctypes.c_void_p(0))
 
         pg.display.flip()
     
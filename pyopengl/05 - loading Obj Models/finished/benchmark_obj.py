@@ -0,0 +1,126 @@
+import numpy as np
+import os
+import time
+import glob
+import shutil
+import hashlib
+import tempfile
+import obj_loader
+
+"""
+    Times loading every obj model in the repository three ways:
+    line by line, the way the chapters used to, with obj_loader
+    parsing from scratch, and with obj_loader reading its cache.
+    The first full load also runs mesh_processing, which
+    benchmark_mesh times. Models are copied somewhere temporary
+    first, so no caches are left behind in the repository.
+"""
+
+repository = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..")
+attributes = ("position", "texcoord", "normal")
+repeats = 3
+
+def load_line_by_line(filename: str) -> list[float]:
+    """
+        The chapters' old loader: every corner of every triangle,
+        appended a float at a time. Missing elements are zero.
+    """
+
+    v = []
+    vt = []
+    vn = []
+    vertices = []
+
+    with open(filename, "r") as file:
+        for line in file:
+
+            words = line.split()
+            if len(words) == 0:
+                continue
+            match words[0]:
+                case "v":
+                    v.append([float(x) for x in words[1:4]])
+                case "vt":
+                    vt.append([float(x) for x in words[1:3]])
+                case "vn":
+                    vn.append([float(x) for x in words[1:4]])
+                case "f":
+                    corners = words[1:]
+                    for i in range(len(corners) - 2):
+                        for corner in (corners[0], corners[i + 1], corners[i + 2]):
+                            v_vt_vn = (corner.split("/") + ["", ""])[:3]
+                            for elements, element, size in zip(
+                                (v, vt, vn), v_vt_vn, (3, 2, 3)):
+                                if element:
+                                    index = int(element)
+                                    index = index - 1 if index > 0 else len(elements) + index
+                                    vertices.extend(elements[index])
+                                else:
+                                    vertices.extend([0.0] * size)
+
+    return vertices
+
+def count_triangles(corners: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+        Each different triangle, and how many times it appears,
+        whatever order they come in.
+    """
+
+    return np.unique(corners.reshape(-1, 3 * corners.shape[1]),
+        axis = 0, return_counts = True)
+
+def time_call(function, *args) -> tuple[float, object]:
+    """
+        Returns the best time (s) over a few runs, and the result.
+    """
+
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def find_models() -> list[str]:
+    """
+        Every obj file in the repository, once each, ignoring
+        copies of the same model in other chapters.
+    """
+
+    models = {}
+    for filename in sorted(glob.glob(os.path.join(repository, "**", "*.obj"), recursive = True)):
+        with open(filename, "rb") as file:
+            digest = hashlib.sha1(file.read()).hexdigest()
+        models.setdefault(digest, filename)
+    return sorted(models.values(), key = os.path.getsize)
+
+if __name__ == "__main__":
+
+    staging = tempfile.mkdtemp()
+    totals = np.zeros(3)
+    for filename in find_models():
+
+        copy = os.path.join(staging, os.path.basename(filename))
+        shutil.copyfile(filename, copy)
+
+        old, soup = time_call(load_line_by_line, copy)
+        parse, _ = time_call(obj_loader.parse_obj, copy, attributes)
+        vertices, indices = obj_loader.load_obj(copy, attributes)
+        cached, _ = time_call(obj_loader.load_obj, copy, attributes)
+        totals += (old, parse, cached)
+
+        #same triangles as before, just indexed and reordered
+        soup = np.array(soup, dtype=np.float32).reshape(-1, 8)
+        matches = all(np.array_equal(a, b) for a, b in zip(
+            count_triangles(vertices[indices]), count_triangles(soup)))
+
+        name = os.path.relpath(filename, repository)
+        print(f"{name}: {os.path.getsize(filename) / 1e6:.2f} MB, "
+              f"{len(soup)} corners -> {len(vertices)} vertices, "
+              f"line by line {1000 * old:.1f} ms, numpy {1000 * parse:.1f} ms, "
+              f"cached {1000 * cached:.2f} ms{'' if matches else ', MISMATCH'}")
+        os.remove(copy)
+
+    shutil.rmtree(staging, ignore_errors = True)
+    print(f"total: line by line {totals[0]:.2f} s, numpy {totals[1]:.2f} s, "
+          f"cached {totals[2]:.3f} s")
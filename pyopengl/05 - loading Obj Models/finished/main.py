@@ -3,6 +3,7 @@ from OpenGL.GL import *
 from OpenGL.GL.shaders import compileProgram,compileShader
 import numpy as np
 import pyrr
+import obj_loader
 
 def create_shader(vertex_filepath: str, fragment_filepath: str) -> int:
     """
@@ -32,114 +33,6 @@ def create_shader(vertex_filepath: str, fragment_filepath: str) -> int:
     
     return shader
 
-def loadMesh(filename: str) -> list[float]:
-    """
-        Load a mesh from an obj file.
-
-        Parameters:
-
-            filename: the filename.
-        
-        Returns:
-
-            The loaded data, in a flattened format.
-    """
-
-    v = []
-    vt = []
-    vn = []
-
-    vertices = []
-
-    with open(filename, "r") as file:
-
-        line = file.readline()
-
-        while line:
-
-            words = line.split(" ")
-            match words[0]:
-            
-                case "v":
-                    v.append(read_vertex_data(words))
-
-                case "vt":
-                    vt.append(read_texcoord_data(words))
-                
-                case "vn":
-                    vn.append(read_normal_data(words))
-            
-                case "f":
-                    read_face_data(words, v, vt, vn, vertices)
-            
-            line = file.readline()
-
-    return vertices
-    
-def read_vertex_data(words: list[str]) -> list[float]:
-    """
-        Returns a vertex description.
-    """
-
-    return [
-        float(words[1]),
-        float(words[2]),
-        float(words[3])
-    ]
-    
-def read_texcoord_data(words: list[str]) -> list[float]:
-    """
-        Returns a texture coordinate description.
-    """
-
-    return [
-        float(words[1]),
-        float(words[2])
-    ]
-    
-def read_normal_data(words: list[str]) -> list[float]:
-    """
-        Returns a normal vector description.
-    """
-
-    return [
-        float(words[1]),
-        float(words[2]),
-        float(words[3])
-    ]
-
-def read_face_data(
-    words: list[str], 
-    v: list[list[float]], vt: list[list[float]], 
-    vn: list[list[float]], vertices: list[float]) -> None:
-    """
-        Reads an edgetable and makes a face from it.
-    """
-
-    triangleCount = len(words) - 3
-
-    for i in range(triangleCount):
-
-        make_corner(words[1], v, vt, vn, vertices)
-        make_corner(words[2 + i], v, vt, vn, vertices)
-        make_corner(words[3 + i], v, vt, vn, vertices)
-    
-def make_corner(corner_description: str, 
-    v: list[list[float]], vt: list[list[float]], 
-    vn: list[list[float]], vertices: list[float]) -> None:
-    """
-        Composes a flattened description of a vertex.
-    """
-
-    v_vt_vn = corner_description.split("/")
-    
-    for element in v[int(v_vt_vn[0]) - 1]:
-        vertices.append(element)
-    for element in vt[int(v_vt_vn[1]) - 1]:
-        vertices.append(element)
-    for element in vn[int(v_vt_vn[2]) - 1]:
-        vertices.append(element)
-
 class Entity:
     """
         A basic object in the world, with a position and rotation.
@@ -330,9 +223,9 @@ class Mesh:
         """
 
         # x, y, z, s, t, nx, ny, nz
-        vertices = loadMesh(filename)
-        self.vertex_count = len(vertices)//8
-        vertices = np.array(vertices, dtype=np.float32)
+        vertices, indices = obj_loader.load_obj(filename)
+        self.vertex_count = len(vertices)
+        self.index_count = len(indices)
 
         self.vao = glGenVertexArrays(1)
         glBindVertexArray(self.vao)
@@ -341,6 +234,11 @@ class Mesh:
         self.vbo = glGenBuffers(1)
         glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
         glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+
+        #Indices, three per triangle
+        self.ebo = glGenBuffers(1)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
         #position
         glEnableVertexAttribArray(0)
         glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(0))
@@ -359,7 +257,7 @@ class Mesh:
             Draw the triangle.
         """
 
-        glDrawArrays(GL_TRIANGLES, 0, self.vertex_count)
+        glDrawElements(GL_TRIANGLES, self.index_count, GL_UNSIGNED_INT, ctypes.c_void_p(0))
 
     def destroy(self) -> None:
         """
@@ -367,7 +265,7 @@ class Mesh:
         """
         
         glDeleteVertexArrays(1,(self.vao,))
-        glDeleteBuffers(1,(self.vbo,))
+        glDeleteBuffers(2,(self.vbo, self.ebo))
     
     def destroy(self) -> None:
         """
@@ -375,7 +273,7 @@ class Mesh:
         """
         
         glDeleteVertexArrays(1,(self.vao,))
-        glDeleteBuffers(1,(self.vbo,))
+        glDeleteBuffers(2,(self.vbo, self.ebo))
 
 class Material:
     """
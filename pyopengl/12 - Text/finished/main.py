@@ -7,6 +7,7 @@ from OpenGL.GL.shaders import compileProgram,compileShader
 import numpy as np
 import pyrr
 from PIL import Image
+import obj_loader
 #endregion
 ############################## Constants ######################################
 #region
@@ -73,171 +74,6 @@ def create_shader(vertex_filepath: str, fragment_filepath: str) -> int:
                             compileShader(fragment_src, GL_FRAGMENT_SHADER))
     
     return shader
-
-def load_mesh(filename: str) -> list[float]:
-    """
-        Load a mesh from an obj file.
-
-        Parameters:
-
-            filename: the filename.
-        
-        Returns:
-
-            The loaded data, in a flattened format.
-    """
-
-    v = []
-    vt = []
-    vn = []
-    vertices = []
-
-    with open(filename, "r") as file:
-        line = file.readline()
-
-        while line:
-
-            words = line.split(" ")
-            match words[0]:
-                case "v":
-                    v.append(read_vertex_data(words))
-                case "vt":
-                    vt.append(read_texcoord_data(words))
-                case "vn":
-                    vn.append(read_normal_data(words))
-                case "f":
-                    read_face_data(words, v, vt, vn, vertices)
-            line = file.readline()
-
-    return vertices
-
-def read_vertex_data(words: list[str]) -> list[float]:
-    """
-        Returns a vertex description.
-    """
-
-    return [
-        float(words[1]),
-        float(words[2]),
-        float(words[3])
-    ]
-
-def read_texcoord_data(words: list[str]) -> list[float]:
-    """
-        Returns a texture coordinate description.
-    """
-
-    return [
-        float(words[1]),
-        float(words[2])
-    ]
-
-def read_normal_data(words: list[str]) -> list[float]:
-    """
-        Returns a normal vector description.
-    """
-
-    return [
-        float(words[1]),
-        float(words[2]),
-        float(words[3])
-    ]
-
-def read_face_data(
-    words: list[str], 
-    v: list[list[float]], vt: list[list[float]], 
-    vn: list[list[float]], vertices: list[float]) -> None:
-    """
-        Reads an edgetable and makes a face from it.
-    """
-
-    triangleCount = len(words) - 3
-
-    for i in range(triangleCount):
-
-        tangent, bitangent = get_face_orientation(words, 1, 2 + i, 3 + i, v, vt)
-
-        make_corner(words[1], v, vt, vn, vertices, tangent, bitangent)
-        make_corner(words[2 + i], v, vt, vn, vertices, tangent, bitangent)
-        make_corner(words[3 + i], v, vt, vn, vertices, tangent, bitangent)
-
-def read_face_data(
-    words: list[str], 
-    v: list[list[float]], vt: list[list[float]], 
-    vn: list[list[float]], vertices: list[float]) -> None:
-    """
-        Reads an edgetable and makes a face from it.
-    """
-
-    triangleCount = len(words) - 3
-
-    for i in range(triangleCount):
-
-        tangent, bitangent = get_face_orientation(words, 1, 2 + i, 3 + i, v, vt)
-
-        make_corner(words[1], v, vt, vn, vertices, tangent, bitangent)
-        make_corner(words[2 + i], v, vt, vn, vertices, tangent, bitangent)
-        make_corner(words[3 + i], v, vt, vn, vertices, tangent, bitangent)
-
-def get_face_orientation(
-    words: list[str], a: int, b: int, c: int, 
-    v: list[list[float]], vt: list[list[float]]) -> tuple[list[float]]:
-    """
-        Get the tangent and bitangent describing the given face.
-    """
-
-    v_vt_vn = words[a].split("/")
-    pos1 = np.array(v[int(v_vt_vn[0]) - 1], dtype = np.float32)
-    uv1 = np.array(vt[int(v_vt_vn[1]) - 1], dtype = np.float32)
-
-    v_vt_vn = words[b].split("/")
-    pos2 = np.array(v[int(v_vt_vn[0]) - 1], dtype = np.float32)
-    uv2 = np.array(vt[int(v_vt_vn[1]) - 1], dtype = np.float32)
-
-    v_vt_vn = words[c].split("/")
-    pos3 = np.array(v[int(v_vt_vn[0]) - 1], dtype = np.float32)
-    uv3 = np.array(vt[int(v_vt_vn[1]) - 1], dtype = np.float32)
-
-    #direction vectors
-    dPos1 = pos2 - pos1
-    dPos2 = pos3 - pos1
-    dUV1 = uv2 - uv1
-    dUV2 = uv3 - uv1
-
-    # calculate
-    den = 1 / (dUV1[0] * dUV2[1] - dUV2[0] * dUV1[1])
-    tangent = [0,0,0]
-    tangent[0] = den * (dUV2[1] * dPos1[0] - dUV1[1] * dPos2[0])
-    tangent[1] = den * (dUV2[1] * dPos1[1] - dUV1[1] * dPos2[1])
-    tangent[2] = den * (dUV2[1] * dPos1[2] - dUV1[1] * dPos2[2])
-
-    bitangent = [0,0,0]
-    bitangent[0] = den * (-dUV2[0] * dPos1[0] + dUV1[0] * dPos2[0])
-    bitangent[1] = den * (-dUV2[0] * dPos1[1] + dUV1[0] * dPos2[1])
-    bitangent[2] = den * (-dUV2[0] * dPos1[2] + dUV1[0] * dPos2[2])
-
-    return (tangent, bitangent)
-
-def make_corner(corner_description: str, 
-    v: list[list[float]], vt: list[list[float]], 
-    vn: list[list[float]], vertices: list[float],
-    tangent: list[float], bitangent: list[float]) -> None:
-    """
-        Composes a flattened description of a vertex.
-    """
-
-    v_vt_vn = corner_description.split("/")
-    
-    for element in v[int(v_vt_vn[0]) - 1]:
-        vertices.append(element)
-    for element in vt[int(v_vt_vn[1]) - 1]:
-        vertices.append(element)
-    for element in vn[int(v_vt_vn[2]) - 1]:
-        vertices.append(element)
-    for element in tangent:
-        vertices.append(element)
-    for element in bitangent:
-        vertices.append(element)
 #endregion
 ####################### Model #################################################
 #region
@@ -1366,9 +1202,10 @@ class Mesh:
 
 class ObjMesh(Mesh):
     """
-        A mesh which is initialized from an obj file.
+        A mesh which is initialized from an obj file,
+        and drawn from an index buffer.
     """
-    __slots__ = tuple()
+    __slots__ = ("ebo", "index_count")
 
 
     def __init__(self, filename: str):
@@ -1377,12 +1214,17 @@ class ObjMesh(Mesh):
         """
 
         super().__init__()
-        vertices = load_mesh(filename)
-        self.vertex_count = len(vertices)//14
-        vertices = np.array(vertices, dtype=np.float32)
+        vertices, indices = obj_loader.load_obj(filename,
+            ("position", "texcoord", "normal", "tangent", "bitangent"))
+        self.vertex_count = len(vertices)
+        self.index_count = len(indices)
 
         glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
 
+        self.ebo = glGenBuffers(1)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
+
         offset = 0
         #position
         glEnableVertexAttribArray(0)
@@ -1405,6 +1247,21 @@ class ObjMesh(Mesh):
         glVertexAttribPointer(4, 3, GL_FLOAT, GL_FALSE, 56, ctypes.c_void_p(offset))
         offset += 12
 
+    def draw(self) -> None:
+        """
+            Draw the mesh.
+        """
+
+        glDrawElements(GL_TRIANGLES, self.index_count, GL_UNSIGNED_INT, ctypes.c_void_p(0))
+
+    def destroy(self) -> None:
+        """
+            Free any allocated memory.
+        """
+
+        super().destroy()
+        glDeleteBuffers(1,(self.ebo,))
+
 class BillBoardMesh(Mesh):
     """
         A mesh which represents a billboard.
@@ -4,6 +4,8 @@ from OpenGL.GL.shaders import compileProgram,compileShader
 import numpy as np
 import pyrr
 import random
+import profiler
+import obj_loader
 
 ##################################### Model ###################################
 
@@ -163,6 +165,9 @@ class App:
             for event in pg.event.get():
                 if (event.type == pg.KEYDOWN and event.key==pg.K_ESCAPE):
                     running = False
+                elif (event.type == pg.KEYDOWN and event.key==pg.K_t):
+                    self.engine.profiler.exportTrace("trace.json")
+                    print("Saved profile to trace.json, open it in chrome://tracing")
             self.handleMouse()
             self.handleKeys()
             #update objects
@@ -199,7 +204,8 @@ class App:
         delta = self.currentTime - self.lastTime
         if (delta >= 1000):
             framerate = int(1000.0 * self.numFrames/delta)
-            pg.display.set_caption(f"Running at {framerate} fps.")
+            gpuTime = sum(self.engine.profiler.gpuTimes.values())
+            pg.display.set_caption(f"Running at {framerate} fps, gpu time {gpuTime:.2f} ms.")
             self.lastTime = self.currentTime
             self.numFrames = -1
             self.frameTime = float(1000.0 / framerate)
@@ -245,6 +251,8 @@ class Engine:
 
         self.create_framebuffer()
 
+        self.profiler = profiler.Profiler()
+
     def createShader(self, vertexFilepath, fragmentFilepath):
 
         with open(vertexFilepath,'r') as f:
@@ -463,18 +471,25 @@ class Engine:
                                     GL_RENDERBUFFER, self.gDepthStencil)
 
     def draw(self, scene):
+        self.profiler.beginFrame()
         #refresh screen
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
 
-        self.prepare_shaders(scene)
+        with self.profiler.scope("prepare shaders"):
+            self.prepare_shaders(scene)
         
-        self.geometry_pass(scene)
-
-        self.lighting_pass()
-
-        self.draw_lights(scene)
+        with self.profiler.scope("geometry pass"):
+            self.geometry_pass(scene)
+        
+        with self.profiler.scope("lighting pass"):
+            self.lighting_pass()
+        
+        with self.profiler.scope("draw lights"):
+            self.draw_lights(scene)
 
-        pg.display.flip()
+        with self.profiler.scope("flip", gpu = False):
+            pg.display.flip()
+        self.profiler.endFrame()
     
     def prepare_shaders(self, scene):
 
@@ -541,7 +556,8 @@ class Engine:
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
         glEnable(GL_DEPTH_TEST)
         self.wood_texture.use()
-        glDrawArraysInstanced(GL_TRIANGLES, 0, self.cube_mesh.vertex_count, len(scene.cubes))
+        glDrawElementsInstanced(GL_TRIANGLES, self.cube_mesh.index_count,
+            GL_UNSIGNED_INT, ctypes.c_void_p(0), len(scene.cubes))
     
     def lighting_pass(self):
 
@@ -576,6 +592,7 @@ class Engine:
             glDrawArrays(GL_TRIANGLES, 0, self.light_mesh.vertex_count)
 
     def quit(self):
+        self.profiler.destroy()
         self.cube_mesh.destroy()
         self.light_mesh.destroy()
         self.wood_texture.destroy()
@@ -728,15 +745,19 @@ class ObjMesh:
 
     def __init__(self, filename):
         # x, y, z, s, t, nx, ny, nz, tangent, bitangent, model(instanced)
-        self.vertices = self.loadMesh(filename)
-        self.vertex_count = len(self.vertices)//14
-        self.vertices = np.array(self.vertices, dtype=np.float32)
+        self.vertices, self.indices = obj_loader.load_obj(filename,
+            ("position", "texcoord", "normal", "tangent", "bitangent"))
+        self.vertex_count = len(self.vertices)
+        self.index_count = len(self.indices)
 
         self.vao = glGenVertexArrays(1)
         glBindVertexArray(self.vao)
         self.vbo = glGenBuffers(1)
         glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
         glBufferData(GL_ARRAY_BUFFER, self.vertices.nbytes, self.vertices, GL_STATIC_DRAW)
+        self.ebo = glGenBuffers(1)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, self.indices.nbytes, self.indices, GL_STATIC_DRAW)
         offset = 0
         #position
         glEnableVertexAttribArray(0)
@@ -759,117 +780,9 @@ class ObjMesh:
         glVertexAttribPointer(4, 3, GL_FLOAT, GL_FALSE, 56, ctypes.c_void_p(offset))
         offset += 12
     
-    def loadMesh(self, filename):
-
-        #raw, unassembled data
-        v = []
-        vt = []
-        vn = []
-        
-        #final, assembled and packed result
-        vertices = []
-
-        #open the obj file and read the data
-        with open(filename,'r') as f:
-            line = f.readline()
-            while line:
-                firstSpace = line.find(" ")
-                flag = line[0:firstSpace]
-                if flag=="v":
-                    #vertex
-                    line = line.replace("v ","")
-                    line = line.split(" ")
-                    l = [float(x) for x in line]
-                    v.append(l)
-                elif flag=="vt":
-                    #texture coordinate
-                    line = line.replace("vt ","")
-                    line = line.split(" ")
-                    l = [float(x) for x in line]
-                    vt.append(l)
-                elif flag=="vn":
-                    #normal
-                    line = line.replace("vn ","")
-                    line = line.split(" ")
-                    l = [float(x) for x in line]
-                    vn.append(l)
-                elif flag=="f":
-                    #face, three or more vertices in v/vt/vn form
-                    line = line.replace("f ","")
-                    line = line.replace("\n","")
-                    #get the individual vertices for each line
-                    line = line.split(" ")
-                    faceVertices = []
-                    faceTextures = []
-                    faceNormals = []
-                    for vertex in line:
-                        #break out into [v,vt,vn],
-                        #correct for 0 based indexing.
-                        l = vertex.split("/")
-                        position = int(l[0]) - 1
-                        faceVertices.append(v[position])
-                        texture = int(l[1]) - 1
-                        faceTextures.append(vt[texture])
-                        normal = int(l[2]) - 1
-                        faceNormals.append(vn[normal])
-                    # obj file uses triangle fan format for each face individually.
-                    # unpack each face
-                    triangles_in_face = len(line) - 2
-
-                    vertex_order = []
-                    """
-                        eg. 0,1,2,3 unpacks to vertices: [0,1,2,0,2,3]
-                    """
-                    for i in range(triangles_in_face):
-                        vertex_order.append(0)
-                        vertex_order.append(i+1)
-                        vertex_order.append(i+2)
-                    # calculate tangent and bitangent for point
-                    # how do model positions relate to texture positions?
-                    point1 = faceVertices[vertex_order[0]]
-                    point2 = faceVertices[vertex_order[1]]
-                    point3 = faceVertices[vertex_order[2]]
-                    uv1 = faceTextures[vertex_order[0]]
-                    uv2 = faceTextures[vertex_order[1]]
-                    uv3 = faceTextures[vertex_order[2]]
-                    #direction vectors
-                    deltaPos1 = [point2[i] - point1[i] for i in range(3)]
-                    deltaPos2 = [point3[i] - point1[i] for i in range(3)]
-                    deltaUV1 = [uv2[i] - uv1[i] for i in range(2)]
-                    deltaUV2 = [uv3[i] - uv1[i] for i in range(2)]
-                    # calculate
-                    den = 1 / (deltaUV1[0] * deltaUV2[1] - deltaUV2[0] * deltaUV1[1])
-                    tangent = []
-                    #tangent x
-                    tangent.append(den * (deltaUV2[1] * deltaPos1[0] - deltaUV1[1] * deltaPos2[0]))
-                    #tangent y
-                    tangent.append(den * (deltaUV2[1] * deltaPos1[1] - deltaUV1[1] * deltaPos2[1]))
-                    #tangent z
-                    tangent.append(den * (deltaUV2[1] * deltaPos1[2] - deltaUV1[1] * deltaPos2[2]))
-                    bitangent = []
-                    #bitangent x
-                    bitangent.append(den * (-deltaUV2[0] * deltaPos1[0] + deltaUV1[0] * deltaPos2[0]))
-                    #bitangent y
-                    bitangent.append(den * (-deltaUV2[0] * deltaPos1[1] + deltaUV1[0] * deltaPos2[1]))
-                    #bitangent z
-                    bitangent.append(den * (-deltaUV2[0] * deltaPos1[2] + deltaUV1[0] * deltaPos2[2]))
-                    for i in vertex_order:
-                        for x in faceVertices[i]:
-                            vertices.append(x)
-                        for x in faceTextures[i]:
-                            vertices.append(x)
-                        for x in faceNormals[i]:
-                            vertices.append(x)
-                        for x in tangent:
-                            vertices.append(x)
-                        for x in bitangent:
-                            vertices.append(x)
-                line = f.readline()
-        return vertices
-    
     def destroy(self):
         glDeleteVertexArrays(1, (self.vao,))
-        glDeleteBuffers(1,(self.vbo,))
+        glDeleteBuffers(2,(self.vbo, self.ebo))
 
 class TexturedQuad:
 
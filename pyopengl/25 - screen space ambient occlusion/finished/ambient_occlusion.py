@@ -4,6 +4,7 @@ from OpenGL.GL.shaders import compileProgram,compileShader
 import numpy as np
 import pyrr
 import random
+import profiler
 
 ##################################### Model ###################################
 
@@ -195,6 +196,9 @@ class App:
             for event in pg.event.get():
                 if (event.type == pg.KEYDOWN and event.key==pg.K_ESCAPE):
                     running = False
+                elif (event.type == pg.KEYDOWN and event.key==pg.K_t):
+                    self.engine.profiler.exportTrace("trace.json")
+                    print("Saved profile to trace.json, open it in chrome://tracing")
             self.handleMouse()
             self.handleKeys()
             #update objects
@@ -231,7 +235,8 @@ class App:
         delta = self.currentTime - self.lastTime
         if (delta >= 1000):
             framerate = int(1000.0 * self.numFrames/delta)
-            pg.display.set_caption(f"Running at {framerate} fps.")
+            gpuTime = sum(self.engine.profiler.gpuTimes.values())
+            pg.display.set_caption(f"Running at {framerate} fps, gpu time {gpuTime:.2f} ms.")
             self.lastTime = self.currentTime
             self.numFrames = -1
             self.frameTime = float(1000.0 / framerate)
@@ -282,6 +287,8 @@ class Engine:
 
         self.create_framebuffer()
 
+        self.profiler = profiler.Profiler()
+
     def createShader(self, vertexFilepath, fragmentFilepath):
 
         with open(vertexFilepath,'r') as f:
@@ -615,20 +622,28 @@ class Engine:
                                     GL_RENDERBUFFER, self.aoDepthStencil)
 
     def draw(self, scene):
+        self.profiler.beginFrame()
         #refresh screen
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
 
-        self.prepare_shaders(scene)
+        with self.profiler.scope("prepare shaders"):
+            self.prepare_shaders(scene)
         
-        self.geometry_pass(scene)
-
-        self.ambient_occlusion_pass()
-
-        self.lighting_pass()
-
-        self.draw_lights(scene)
+        with self.profiler.scope("geometry pass"):
+            self.geometry_pass(scene)
+        
+        with self.profiler.scope("ambient occlusion pass"):
+            self.ambient_occlusion_pass()
+        
+        with self.profiler.scope("lighting pass"):
+            self.lighting_pass()
+        
+        with self.profiler.scope("draw lights"):
+            self.draw_lights(scene)
 
-        pg.display.flip()
+        with self.profiler.scope("flip", gpu = False):
+            pg.display.flip()
+        self.profiler.endFrame()
     
     def prepare_shaders(self, scene):
 
@@ -795,6 +810,7 @@ class Engine:
             glDrawArrays(GL_TRIANGLES, 0, self.light_mesh.vertex_count)
 
     def quit(self):
+        self.profiler.destroy()
         self.container_mesh.destroy()
         self.monkey_mesh.destroy()
         self.light_mesh.destroy()
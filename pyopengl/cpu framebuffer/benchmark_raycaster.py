@@ -0,0 +1,62 @@
+import numpy as np
+import time
+import raycaster
+
+"""
+    Times the cpu side of a frame (casting every column into the
+    framebuffer) with each backend, at a range of resolutions.
+    Runs without a window.
+"""
+
+resolutions = ((320, 240), (640, 480), (1280, 720), (1920, 1080))
+frameCount = 50
+#the python backend is slow, so it gets fewer frames
+pythonFrameCount = 5
+
+class HeadlessEngine(raycaster.Engine):
+    """
+        The engine's framebuffer, without the OpenGL side.
+    """
+
+    def __init__(self, width, height, backend):
+
+        self.screenWidth = width
+        self.screenHeight = height
+        self.backend = backend
+        self.colorBufferData = np.zeros(width * height, dtype=np.uint32)
+        self.columns = self.colorBufferData.reshape(width, height)
+        self.createColors()
+
+def time_frames(engine, gameBoard, frames):
+    """
+        Returns the average time (ms) to draw a frame, turning
+        a little each frame so every angle gets a turn.
+    """
+
+    engine.castRays(gameBoard)
+    start = time.perf_counter()
+    for _ in range(frames):
+        gameBoard.spin_player(1)
+        engine.castRays(gameBoard)
+    return 1000 * (time.perf_counter() - start) / frames
+
+if __name__ == "__main__":
+
+    for width, height in resolutions:
+
+        gameBoard = raycaster.GameBoard()
+        compiled = HeadlessEngine(width, height, "numba")
+        ms = time_frames(compiled, gameBoard, frameCount)
+
+        gameBoard = raycaster.GameBoard()
+        reference = HeadlessEngine(width, height, "python")
+        reference_ms = time_frames(reference, gameBoard, pythonFrameCount)
+
+        #same view, same picture
+        gameBoard = raycaster.GameBoard()
+        compiled.castRays(gameBoard)
+        reference.castRays(gameBoard)
+        mismatches = np.count_nonzero(compiled.colorBufferData != reference.colorBufferData)
+
+        print(f"{width}x{height}: numba {ms:.2f} ms, python {reference_ms:.1f} ms "
+              f"(x{reference_ms / ms:.0f}), {mismatches} pixels differ")
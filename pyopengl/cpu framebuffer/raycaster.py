@@ -3,6 +3,7 @@ from OpenGL.GL import *
 from OpenGL.GL.shaders import compileProgram,compileShader
 import numpy as np
 import math
+from numba import njit, prange
 
 ################################## Model ######################################
 
@@ -63,6 +64,8 @@ class GameBoard:
             [1,4,4,4,4,4,4,4,4,0,0,0,0,0,0,0,0,0,0,0,0,0,0,1],
             [1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1]
         ]
+        #the same map, for compiled code
+        self.grid = np.array(self.map, dtype=np.uint8)
         self.player = Player(7.5, 6.5, 90)
 
     def move_player(self, speed):
@@ -99,6 +102,81 @@ class GameBoard:
 
 ################################## View #######################################
 
+@njit(parallel = True, cache = True)
+def cast_columns(grid, posX, posY, forwardsX, forwardsY, colors, background, columns):
+    """
+        Cast the ray for every screen column at once, drawing
+        the background and wall of each column straight into
+        the framebuffer.
+
+            Parameters:
+                grid (np.ndarray): the map, 0 is empty
+                posX, posY (float): the player's position
+                forwardsX, forwardsY (float): the player's direction
+                colors (np.ndarray): wall colors, by map value - 1
+                background (int): color above and below the walls
+                columns (np.ndarray): framebuffer, (width, height)
+    """
+
+    width, height = columns.shape
+    rightX = -forwardsY
+    rightY =  forwardsX
+
+    for rayIndex in prange(width):
+        interpolationCoefficient = 2.0 * rayIndex / width - 1.0
+        rayDirectionX = forwardsX + interpolationCoefficient * rightX
+        rayDirectionY = forwardsY + interpolationCoefficient * rightY
+
+        mapX = int(math.floor(posX))
+        mapY = int(math.floor(posY))
+
+        deltaDistX = 1e8 if abs(rayDirectionX) < 1e-8 else abs(1 / rayDirectionX)
+        deltaDistY = 1e8 if abs(rayDirectionY) < 1e-8 else abs(1 / rayDirectionY)
+
+        if rayDirectionX < 0:
+            stepX = -1
+            sideDistX = (posX - mapX) * deltaDistX
+        else:
+            stepX = 1
+            sideDistX = (mapX + 1 - posX) * deltaDistX
+
+        if rayDirectionY < 0:
+            stepY = -1
+            sideDistY = (posY - mapY) * deltaDistY
+        else:
+            stepY = 1
+            sideDistY = (mapY + 1 - posY) * deltaDistY
+
+        #trace ray, the edge of the map counts as a wall
+        side = 0
+        cell = 0
+        while True:
+            if sideDistX < sideDistY:
+                sideDistX += deltaDistX
+                mapX += stepX
+                side = 0
+            else:
+                sideDistY += deltaDistY
+                mapY += stepY
+                side = 1
+
+            if mapX < 0 or mapX >= grid.shape[1] or mapY < 0 or mapY >= grid.shape[0]:
+                cell = 1
+                break
+            cell = grid[mapY, mapX]
+            if cell != 0:
+                break
+
+        if side == 0:
+            distanceToCamera = abs(sideDistX - deltaDistX)
+        else:
+            distanceToCamera = abs(sideDistY - deltaDistY)
+
+        lineHeight = min(int((height // 2) / max(distanceToCamera, 1e-8)), height // 2)
+        column = columns[rayIndex]
+        column[:] = background
+        column[height // 2 - lineHeight : height // 2 + lineHeight] = colors[cell - 1]
+
 class Engine:
     """
         Responsible for drawing scenes
@@ -114,6 +192,9 @@ class Engine:
         """
         self.screenWidth = width
         self.screenHeight = height
+        #"numba": all columns at once, compiled
+        #"python": a column at a time, as a reference
+        self.backend = "numba"
 
         #general OpenGL configuration
         self.shader = self.createShader("shaders/frameBufferVertex.txt",
@@ -127,14 +208,18 @@ class Engine:
         
         self.createQuad()
         self.createColorBuffer()
+        self.createColors()
+    
+    def createColors(self):
 
-        self.colors = [
+        self.colors = np.array([
                         (0 << 24) + (0 << 16) + (128 << 8) + 255,
                         (0 << 24) + (128 << 16) + (0 << 8) + 255,
                         (0 << 24) + (128 << 16) + (128 << 8) + 255,
                         (128 << 24) + (0 << 16) + (0 << 8) + 255,
                         (128 << 24) + (0 << 16) + (128 << 8) + 255
-                    ]
+                    ], dtype=np.uint32)
+        self.backgroundColor = (16 << 24) + (32 << 16) + (64 << 8) + 255
     
     def createQuad(self):
         # x, y, z, s, t
@@ -162,11 +247,13 @@ class Engine:
         glVertexAttribPointer(1, 2, GL_FLOAT, GL_FALSE, 20, ctypes.c_void_p(12))
     
     def createColorBuffer(self):
-        self.colorBufferData = np.array(
-            [np.uint32((255<<16) + (255 << 8) + (255 << 0)) for pixel in range(self.screenWidth * self.screenHeight)],
+        self.colorBufferData = np.full(
+            self.screenWidth * self.screenHeight,
+            (255<<16) + (255 << 8) + (255 << 0),
             dtype=np.uint32
         )
-        #print(self.colorBufferData.shape)
+        #one row per screen column, for the compiled backend
+        self.columns = self.colorBufferData.reshape(self.screenWidth, self.screenHeight)
 
         self.colorBuffer = glGenTextures(1)
         glBindTexture(GL_TEXTURE_2D, self.colorBuffer)
@@ -177,7 +264,7 @@ class Engine:
         glTexParameteri (GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
 
         
-        glTexImage2D(GL_TEXTURE_2D,0,GL_RGBA,self.screenHeight,self.screenWidth,0,GL_RGBA,GL_UNSIGNED_INT_8_8_8_8,bytes(self.colorBufferData))
+        glTexImage2D(GL_TEXTURE_2D,0,GL_RGBA,self.screenHeight,self.screenWidth,0,GL_RGBA,GL_UNSIGNED_INT_8_8_8_8,self.colorBufferData)
     
     def createShader(self, vertexFilepath, fragmentFilepath):
         """
@@ -203,6 +290,23 @@ class Engine:
 
         glUseProgram(self.shader)
 
+        self.castRays(gameBoard)
+            
+        self.updateScreen()
+    
+    def castRays(self, gameBoard):
+        """
+            Draw the walls into the framebuffer, on the cpu.
+        """
+
+        if self.backend == "numba":
+            direction = np.radians(gameBoard.player.direction)
+            cast_columns(
+                gameBoard.grid, gameBoard.player.x, gameBoard.player.y,
+                np.cos(direction), -np.sin(direction),
+                self.colors, self.backgroundColor, self.columns)
+            return
+
         self.clearScreen()
 
         #view parameters
@@ -281,12 +385,9 @@ class Engine:
                 height = (self.screenHeight//2)/max(distanceToCamera,1e-8),
                 color = self.colors[gameBoard.map[mapY][mapX] - 1]
             )
-            
-        self.updateScreen()
 
     def clearScreen(self):
-        self.colorBufferData &= 0
-        self.colorBufferData |= ((16 << 24) + (32 << 16) + (64 << 8) + 255)
+        self.colorBufferData[:] = self.backgroundColor
     
     def drawVerticalLine(self, x, height, color):
         lineHeight = min(int(height), self.screenHeight//2)
@@ -296,7 +397,7 @@ class Engine:
     
     def updateScreen(self):
         glBindTexture(GL_TEXTURE_2D, self.colorBuffer)
-        glTexImage2D(GL_TEXTURE_2D,0,GL_RGBA,self.screenHeight,self.screenWidth,0,GL_RGBA,GL_UNSIGNED_INT_8_8_8_8,bytes(self.colorBufferData))
+        glTexSubImage2D(GL_TEXTURE_2D,0,0,0,self.screenHeight,self.screenWidth,GL_RGBA,GL_UNSIGNED_INT_8_8_8_8,self.colorBufferData)
         glBindVertexArray(self.vao)
         glDrawArrays(GL_TRIANGLES, 0, self.vertex_count)
         pg.display.flip()
@@ -370,4 +471,5 @@ class App:
         self.graphicsEngine.destroy()
         pg.quit()
 
-myApp = App()
\ No newline at end of file
+if __name__ == "__main__":
+    myApp = App()
\ No newline at end of file
@@ -0,0 +1,45 @@
+import numpy as np
+import time
+import textured_raycaster
+
+"""
+    Times the textured raycaster's cpu side, without a window.
+    Every pass is single threaded, so this is one core's worth.
+"""
+
+resolutions = ((320, 240), (640, 480), (1280, 720))
+frameCount = 200
+#60 fps
+budget = 1000 / 60
+
+def time_frames(renderer, gameBoard):
+    """
+        Returns the frame times (ms), walking in a circle so
+        walls, floor and sprites all get a turn.
+    """
+
+    renderer.draw(gameBoard)
+    times = np.zeros(frameCount)
+    for i in range(frameCount):
+        gameBoard.spin_player(360 / frameCount)
+        start = time.perf_counter()
+        renderer.draw(gameBoard)
+        times[i] = 1000 * (time.perf_counter() - start)
+    return times
+
+if __name__ == "__main__":
+
+    for width, height in resolutions:
+
+        gameBoard = textured_raycaster.GameBoard()
+        #out in the open, where the most is in view
+        gameBoard.player.x = 12.5
+        gameBoard.player.y = 12.5
+        renderer = textured_raycaster.ColumnRenderer(width, height)
+        times = time_frames(renderer, gameBoard)
+
+        mean = times.mean()
+        worst = np.percentile(times, 99)
+        verdict = "fits" if worst < budget else "misses"
+        print(f"{width}x{height}: mean {mean:.2f} ms ({1000 / mean:.0f} fps), "
+              f"99th percentile {worst:.2f} ms, {verdict} 60 fps")
@@ -0,0 +1,557 @@
+import pygame as pg
+from OpenGL.GL import *
+from OpenGL.GL.shaders import compileProgram,compileShader
+import numpy as np
+import math
+import ctypes
+from numba import njit
+
+################################## Model ######################################
+
+class Player:
+    """
+        Represents the position and direction of the player
+    """
+
+
+    def __init__(self, x, y, direction):
+        """
+            Create a new player at the given position and direction.
+
+            Parameters:
+                x (float): x position
+                y (float): y position
+                direction (float): direction, in degrees
+        """
+
+        self.x = x
+        self.y = y
+        self.direction = direction
+
+class GameBoard:
+    """
+        Holds pointers to all objects in the scene
+    """
+
+
+    def __init__(self):
+        """
+            Set up scene objects.
+
+            TODO: read data from file
+        """
+
+        self.player = Player(7.5, 6.5, 90)
+        self.map = [
+            [1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1],
+            [1,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,1],
+            [1,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,1],
+            [1,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,1],
+            [1,0,0,0,0,0,2,2,2,2,2,0,0,0,0,3,0,3,0,3,0,0,0,1],
+            [1,0,0,0,0,0,2,0,0,0,2,0,0,0,0,0,0,0,0,0,0,0,0,1],
+            [1,0,0,0,0,0,2,0,0,0,2,0,0,0,0,3,0,0,0,3,0,0,0,1],
+            [1,0,0,0,0,0,2,0,0,0,2,0,0,0,0,0,0,0,0,0,0,0,0,1],
+            [1,0,0,0,0,0,2,2,0,2,2,0,0,0,0,3,0,3,0,3,0,0,0,1],
+            [1,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,1],
+            [1,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,1],
+            [1,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,1],
+            [1,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,1],
+            [1,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,1],
+            [1,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,1],
+            [1,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,1],
+            [1,4,4,4,4,4,4,4,4,0,0,0,0,0,0,0,0,0,0,0,0,0,0,1],
+            [1,4,0,4,0,0,0,0,4,0,0,0,0,0,0,0,0,0,0,0,0,0,0,1],
+            [1,4,0,0,0,0,5,0,4,0,0,0,0,0,0,0,0,0,0,0,0,0,0,1],
+            [1,4,0,4,0,0,0,0,4,0,0,0,0,0,0,0,0,0,0,0,0,0,0,1],
+            [1,4,0,4,4,4,4,4,4,0,0,0,0,0,0,0,0,0,0,0,0,0,0,1],
+            [1,4,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,1],
+            [1,4,4,4,4,4,4,4,4,0,0,0,0,0,0,0,0,0,0,0,0,0,0,1],
+            [1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1]
+        ]
+        #the same map, for compiled code
+        self.grid = np.array(self.map, dtype=np.uint8)
+
+        #billboards: x, y, texture (0: medkit, 1: light)
+        sprites = np.array([
+            (8.5, 6.5, 0),
+            (12.5, 10.5, 1),
+            (17.5, 5.5, 0),
+            (5.5, 18.5, 1),
+            (20.5, 20.5, 0),
+            (3.5, 3.5, 1),
+        ])
+        self.spriteX = sprites[:,0].copy()
+        self.spriteY = sprites[:,1].copy()
+        self.spriteTexture = sprites[:,2].astype(np.int32)
+
+    def move_player(self, speed):
+        """
+            attempt to move the player with the given speed
+        """
+        dx =  speed * np.cos(np.radians(self.player.direction), dtype=np.float32)
+        dy = -speed * np.sin(np.radians(self.player.direction), dtype=np.float32)
+        if (int(self.player.x + dx) >= 0 and int(self.player.x + dx) < len(self.map[0])):
+            if (self.map[int(self.player.y)][int(self.player.x + dx)]) == 0:
+                self.player.x += dx
+        if (int(self.player.y + dy) >= 0 and int(self.player.y + dy) < len(self.map)):
+            if (self.map[int(self.player.y + dy)][int(self.player.x)]) == 0:
+                self.player.y += dy
+
+    def spin_player(self, angle):
+        """
+            shift the player's direction by the given amount, in degrees
+        """
+        self.player.direction += angle
+        if (self.player.direction < 0):
+            self.player.direction += 360
+        elif (self.player.direction > 360):
+            self.player.direction -= 360
+
+################################## View #######################################
+
+"""
+    Each frame is drawn in passes over flat arrays:
+
+        cast_walls: one ray per column, giving each column's
+            wall distance, side, cell and texture u
+        draw_columns: walls, floor and ceiling, sampled a
+            texture column at a time
+        draw_sprites: billboards, tested against the wall
+            distances, so walls hide them
+
+    Colors are packed RGBA8 (red in the top byte), and the
+    framebuffer is stored a column at a time, so every pass
+    writes memory in order.
+"""
+
+textureSize = 64
+
+def load_textures(filenames, size = textureSize):
+    """
+        Load images as an array of packed colors, indexed
+        [texture, u, v], so a texture column is contiguous.
+    """
+
+    textures = np.zeros((len(filenames), size, size), dtype=np.uint32)
+    for i, filename in enumerate(filenames):
+        image = pg.transform.smoothscale(pg.image.load(filename), (size, size))
+        rgb = pg.surfarray.array3d(image).astype(np.uint32)
+        if image.get_flags() & pg.SRCALPHA:
+            alpha = pg.surfarray.array_alpha(image).astype(np.uint32)
+        else:
+            alpha = np.full((size, size), 255, dtype=np.uint32)
+        textures[i] = (rgb[:,:,0] << 24) | (rgb[:,:,1] << 16) | (rgb[:,:,2] << 8) | alpha
+
+    return textures
+
+@njit(cache = True)
+def cast_walls(grid, posX, posY, forwardsX, forwardsY,
+    distances, sides, cells, texU):
+    """
+        Cast one ray per screen column, recording where it
+        hit a wall.
+
+            Parameters:
+                grid (np.ndarray): the map, 0 is empty
+                posX, posY (float): the player's position
+                forwardsX, forwardsY (float): the player's direction
+                distances (np.ndarray): distance to the camera plane
+                sides (np.ndarray): 0 for an x facing wall, 1 for y
+                cells (np.ndarray): map value of the wall
+                texU (np.ndarray): where across the wall it was hit,
+                    in [0, 1)
+    """
+
+    width = distances.shape[0]
+    rightX = -forwardsY
+    rightY =  forwardsX
+
+    for rayIndex in range(width):
+        interpolationCoefficient = 2.0 * rayIndex / width - 1.0
+        rayDirectionX = forwardsX + interpolationCoefficient * rightX
+        rayDirectionY = forwardsY + interpolationCoefficient * rightY
+
+        mapX = int(math.floor(posX))
+        mapY = int(math.floor(posY))
+
+        deltaDistX = 1e8 if abs(rayDirectionX) < 1e-8 else abs(1 / rayDirectionX)
+        deltaDistY = 1e8 if abs(rayDirectionY) < 1e-8 else abs(1 / rayDirectionY)
+
+        if rayDirectionX < 0:
+            stepX = -1
+            sideDistX = (posX - mapX) * deltaDistX
+        else:
+            stepX = 1
+            sideDistX = (mapX + 1 - posX) * deltaDistX
+
+        if rayDirectionY < 0:
+            stepY = -1
+            sideDistY = (posY - mapY) * deltaDistY
+        else:
+            stepY = 1
+            sideDistY = (mapY + 1 - posY) * deltaDistY
+
+        #trace ray, the edge of the map counts as a wall
+        side = 0
+        cell = 0
+        while True:
+            if sideDistX < sideDistY:
+                sideDistX += deltaDistX
+                mapX += stepX
+                side = 0
+            else:
+                sideDistY += deltaDistY
+                mapY += stepY
+                side = 1
+
+            if mapX < 0 or mapX >= grid.shape[1] or mapY < 0 or mapY >= grid.shape[0]:
+                cell = 1
+                break
+            cell = grid[mapY, mapX]
+            if cell != 0:
+                break
+
+        if side == 0:
+            distance = max(abs(sideDistX - deltaDistX), 1e-4)
+            wallCoordinate = posY + distance * rayDirectionY
+        else:
+            distance = max(abs(sideDistY - deltaDistY), 1e-4)
+            wallCoordinate = posX + distance * rayDirectionX
+        u = wallCoordinate - math.floor(wallCoordinate)
+
+        #keep textures the right way round from both sides
+        if (side == 0 and rayDirectionX > 0) or (side == 1 and rayDirectionY < 0):
+            u = 1.0 - u
+
+        distances[rayIndex] = distance
+        sides[rayIndex] = side
+        cells[rayIndex] = cell
+        texU[rayIndex] = u
+
+@njit(cache = True)
+def draw_columns(posX, posY, forwardsX, forwardsY,
+    distances, sides, cells, texU,
+    wallTextures, floorTexture, ceilingColor, columns):
+    """
+        Fill each column with its ceiling, wall and floor.
+        Walls facing y are drawn darker.
+    """
+
+    width, height = columns.shape
+    size = wallTextures.shape[1]
+    halfHeight = height // 2
+    rightX = -forwardsY
+    rightY =  forwardsX
+
+    for x in range(width):
+        column = columns[x]
+        distance = distances[x]
+
+        #the wall is a unit high, centred on the horizon
+        wallHeight = height / distance
+        wallTop = halfHeight - 0.5 * wallHeight
+        first = max(0, int(wallTop))
+        last = min(height, int(halfHeight + 0.5 * wallHeight))
+
+        column[:first] = ceilingColor
+
+        texels = wallTextures[(cells[x] - 1) % wallTextures.shape[0],
+                              min(int(texU[x] * size), size - 1)]
+        vStep = size / wallHeight
+        v = (first - wallTop) * vStep
+        if sides[x] == 1:
+            for y in range(first, last):
+                color = texels[min(int(v), size - 1)]
+                column[y] = ((color >> 1) & 0x7F7F7F00) | (color & 0xFF)
+                v += vStep
+        else:
+            for y in range(first, last):
+                column[y] = texels[min(int(v), size - 1)]
+                v += vStep
+
+        #floor: the row below the horizon at y sees the floor
+        #halfHeight / (y - halfHeight) away
+        interpolationCoefficient = 2.0 * x / width - 1.0
+        rayDirectionX = forwardsX + interpolationCoefficient * rightX
+        rayDirectionY = forwardsY + interpolationCoefficient * rightY
+        for y in range(max(last, halfHeight + 1), height):
+            rowDistance = halfHeight / (y - halfHeight)
+            floorX = posX + rowDistance * rayDirectionX
+            floorY = posY + rowDistance * rayDirectionY
+            u = int((floorX - math.floor(floorX)) * size)
+            v = int((floorY - math.floor(floorY)) * size)
+            column[y] = floorTexture[min(u, size - 1), min(v, size - 1)]
+
+@njit(cache = True)
+def draw_sprites(posX, posY, forwardsX, forwardsY,
+    spriteX, spriteY, spriteTexture, spriteScale,
+    distances, spriteTextures, columns):
+    """
+        Draw billboards standing on the floor, furthest first,
+        skipping any column where a wall is nearer.
+    """
+
+    width, height = columns.shape
+    size = spriteTextures.shape[1]
+    halfHeight = height // 2
+    rightX = -forwardsY
+    rightY =  forwardsX
+
+    #depth along the view direction, and across it
+    depths = (spriteX - posX) * forwardsX + (spriteY - posY) * forwardsY
+    laterals = (spriteX - posX) * rightX + (spriteY - posY) * rightY
+    order = np.argsort(-depths)
+
+    for i in order:
+        depth = depths[i]
+        if depth < 0.1:
+            continue
+
+        centreX = (laterals[i] / depth + 1.0) * 0.5 * width
+        #a unit across is width / 2 pixels, a unit up is height
+        spriteWidth = spriteScale * 0.5 * width / depth
+        spriteHeight = spriteScale * height / depth
+        left = centreX - 0.5 * spriteWidth
+        floorY = halfHeight + 0.5 * height / depth
+        top = floorY - spriteHeight
+
+        firstX = max(0, int(left))
+        lastX = min(width, int(left + spriteWidth))
+        firstY = max(0, int(top))
+        lastY = min(height, int(floorY))
+        texels = spriteTextures[spriteTexture[i]]
+        uStep = size / spriteWidth
+        vStep = size / spriteHeight
+
+        for x in range(firstX, lastX):
+            if distances[x] <= depth:
+                continue
+            column = columns[x]
+            texelColumn = texels[min(int((x - left) * uStep), size - 1)]
+            v = (firstY - top) * vStep
+            for y in range(firstY, lastY):
+                color = texelColumn[min(int(v), size - 1)]
+                #alpha tested, not blended
+                if (color & 0xFF) > 127:
+                    column[y] = color
+                v += vStep
+
+class ColumnRenderer:
+    """
+        Draws the scene into a framebuffer in host memory.
+        Needs no OpenGL, so it can be timed on its own.
+    """
+
+
+    def __init__(self, width, height):
+        """
+            Parameters:
+                width (int): width of screen
+                height (int): height of screen
+        """
+
+        self.width = width
+        self.height = height
+
+        #one row per screen column
+        self.columns = np.zeros((width, height), dtype=np.uint32)
+
+        self.distances = np.zeros(width, dtype=np.float64)
+        self.sides = np.zeros(width, dtype=np.uint8)
+        self.cells = np.zeros(width, dtype=np.uint8)
+        self.texU = np.zeros(width, dtype=np.float64)
+
+        self.wallTextures = load_textures(
+            ["gfx/wood.jpeg", "gfx/crate_diffuse.jpg"])
+        self.floorTexture = load_textures(["gfx/floor.png"])[0]
+        self.spriteTextures = load_textures(
+            ["gfx/medkit.png", "gfx/greenlight.png"])
+        self.ceilingColor = (16 << 24) + (32 << 16) + (64 << 8) + 255
+        self.spriteScale = 0.5
+
+    def draw(self, gameBoard):
+        """
+            Draw a frame of the given scene.
+        """
+
+        posX = gameBoard.player.x
+        posY = gameBoard.player.y
+        forwardsX =  np.cos(np.radians(gameBoard.player.direction))
+        forwardsY = -np.sin(np.radians(gameBoard.player.direction))
+
+        cast_walls(gameBoard.grid, posX, posY, forwardsX, forwardsY,
+            self.distances, self.sides, self.cells, self.texU)
+        draw_columns(posX, posY, forwardsX, forwardsY,
+            self.distances, self.sides, self.cells, self.texU,
+            self.wallTextures, self.floorTexture, self.ceilingColor, self.columns)
+        draw_sprites(posX, posY, forwardsX, forwardsY,
+            gameBoard.spriteX, gameBoard.spriteY, gameBoard.spriteTexture,
+            self.spriteScale, self.distances, self.spriteTextures, self.columns)
+
+class Engine:
+    """
+        Responsible for drawing scenes
+    """
+
+
+    def __init__(self, width, height):
+        """
+            Initialize a textured raycasting context
+
+                Parameters:
+                    width (int): width of screen
+                    height (int): height of screen
+        """
+        self.screenWidth = width
+        self.screenHeight = height
+
+        #general OpenGL configuration
+        self.shader = self.createShader("shaders/frameBufferVertex.txt",
+                                        "shaders/frameBufferFragment.txt")
+        glUseProgram(self.shader)
+
+        self.renderer = ColumnRenderer(width, height)
+        self.createQuad()
+        self.createColorBuffer()
+
+    def createQuad(self):
+        # x, y, z, s, t
+        self.vertices = np.array(
+            ( 1.0,  1.0, 0.0, 0.0, 1.0, #top-right
+             -1.0,  1.0, 0.0, 0.0, 0.0, #top-left
+             -1.0, -1.0, 0.0, 1.0, 0.0, #bottom-left
+             -1.0, -1.0, 0.0, 1.0, 0.0, #bottom-left
+              1.0, -1.0, 0.0, 1.0, 1.0, #bottom-right
+              1.0,  1.0, 0.0, 0.0, 1.0), #top-right
+             dtype=np.float32
+        )
+
+        self.vertex_count = 6
+
+        self.vao = glGenVertexArrays(1)
+        glBindVertexArray(self.vao)
+        self.vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, self.vertices.nbytes, self.vertices, GL_STATIC_DRAW)
+
+        glEnableVertexAttribArray(0)
+        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 20, ctypes.c_void_p(0))
+        glEnableVertexAttribArray(1)
+        glVertexAttribPointer(1, 2, GL_FLOAT, GL_FALSE, 20, ctypes.c_void_p(12))
+
+    def createColorBuffer(self):
+
+        self.colorBuffer = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.colorBuffer)
+
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+
+        #columns go along the texture's rows, the quad turns them upright
+        glTexImage2D(GL_TEXTURE_2D,0,GL_RGBA,self.screenHeight,self.screenWidth,0,GL_RGBA,GL_UNSIGNED_INT_8_8_8_8,self.renderer.columns)
+
+    def createShader(self, vertexFilepath, fragmentFilepath):
+        """
+            Read source code, compile and link shaders.
+            Returns the compiled and linked program.
+        """
+
+        with open(vertexFilepath,'r') as f:
+            vertex_src = f.readlines()
+
+        with open(fragmentFilepath,'r') as f:
+            fragment_src = f.readlines()
+
+        shader = compileProgram(compileShader(vertex_src, GL_VERTEX_SHADER),
+                                compileShader(fragment_src, GL_FRAGMENT_SHADER))
+
+        return shader
+
+    def drawScene(self, gameBoard):
+        """
+            Draw all objects in the scene
+        """
+
+        self.renderer.draw(gameBoard)
+
+        glUseProgram(self.shader)
+        glBindTexture(GL_TEXTURE_2D, self.colorBuffer)
+        glTexSubImage2D(GL_TEXTURE_2D,0,0,0,self.screenHeight,self.screenWidth,GL_RGBA,GL_UNSIGNED_INT_8_8_8_8,self.renderer.columns)
+        glBindVertexArray(self.vao)
+        glDrawArrays(GL_TRIANGLES, 0, self.vertex_count)
+        pg.display.flip()
+
+    def destroy(self):
+        """
+            Free any allocated memory
+        """
+
+        glDeleteVertexArrays(1,(self.vao,))
+        glDeleteBuffers(1,(self.vbo,))
+        glDeleteTextures(1, (self.colorBuffer,))
+        glDeleteProgram(self.shader)
+
+################################## Control ####################################
+
+class App:
+    """
+        Calls high level control functions (handle input, draw scene etc)
+    """
+
+
+    def __init__(self):
+        pg.init()
+        self.screenWidth = 640
+        self.screenHeight = 480
+        pg.display.gl_set_attribute(pg.GL_CONTEXT_MAJOR_VERSION, 3)
+        pg.display.gl_set_attribute(pg.GL_CONTEXT_MINOR_VERSION, 3)
+        pg.display.gl_set_attribute(pg.GL_CONTEXT_PROFILE_MASK,
+                                    pg.GL_CONTEXT_PROFILE_CORE)
+        pg.display.set_mode((self.screenWidth, self.screenHeight), pg.OPENGL|pg.DOUBLEBUF)
+        self.clock = pg.time.Clock()
+        self.graphicsEngine = Engine(self.screenWidth, self.screenHeight)
+        self.gameBoard = GameBoard()
+        self.mainLoop()
+
+    def mainLoop(self):
+
+        running = True
+        while (running):
+            #events
+            for event in pg.event.get():
+                if (event.type == pg.QUIT):
+                    running = False
+            self.handleKeys()
+
+            #render
+            self.graphicsEngine.drawScene(self.gameBoard)
+
+            #timing
+            self.clock.tick()
+            framerate = int(self.clock.get_fps())
+            pg.display.set_caption(f"Running at {framerate} fps.")
+        self.quit()
+
+    def handleKeys(self):
+        """
+            handle the current key state
+        """
+
+        keys = pg.key.get_pressed()
+        if keys[pg.K_w]:
+            self.gameBoard.move_player(0.1)
+        if keys[pg.K_a]:
+            self.gameBoard.spin_player(4)
+        if keys[pg.K_s]:
+            self.gameBoard.move_player(-0.1)
+        if keys[pg.K_d]:
+            self.gameBoard.spin_player(-4)
+
+    def quit(self):
+        self.graphicsEngine.destroy()
+        pg.quit()
+
+if __name__ == "__main__":
+    myApp = App()
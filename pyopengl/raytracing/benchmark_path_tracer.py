@@ -0,0 +1,57 @@
+import time
+import os
+import raytracer2
+import path_tracer
+
+"""
+    Times the path tracer without a window: how soon the one
+    sample preview is ready, and how long the full image takes,
+    traced on this process and on a pool.
+"""
+
+width = 640
+height = 480
+sampleCount = 32
+
+def time_render(workers):
+    """
+        Returns seconds to the first full pass, and to the end.
+    """
+
+    renderer = path_tracer.ProgressiveRenderer(
+        raytracer2.Scene(), width, height,
+        sampleCount = sampleCount, workers = workers)
+    firstPass = len(renderer.tiles)
+
+    start = time.perf_counter()
+    if workers == 0:
+        #the preview is the first pass on its own
+        preview = path_tracer.ProgressiveRenderer(
+            raytracer2.Scene(), width, height, sampleCount = 1, workers = 0)
+        preview.start()
+        previewTime = time.perf_counter() - start
+        start = time.perf_counter()
+        renderer.start()
+        return previewTime, time.perf_counter() - start
+
+    renderer.start()
+    added = 0
+    previewTime = None
+    while not renderer.done:
+        added += renderer.poll()
+        if previewTime is None and added >= firstPass:
+            previewTime = time.perf_counter() - start
+        time.sleep(0.001)
+    total = time.perf_counter() - start
+    renderer.close()
+    return previewTime, total
+
+if __name__ == "__main__":
+
+    rays = width * height * sampleCount
+    for workers in (0, os.cpu_count()):
+        previewTime, total = time_render(workers)
+        label = "this process" if workers == 0 else f"{workers} workers"
+        print(f"{label}: preview in {previewTime:.2f} s, "
+              f"{sampleCount} samples in {total:.1f} s "
+              f"({rays / total / 1e6:.2f} million paths/s)")
@@ -0,0 +1,303 @@
+import numpy as np
+import os
+import queue
+from concurrent.futures import ProcessPoolExecutor
+
+"""
+    A path tracer which traces whole batches of rays at once.
+
+    Rays live in arrays (origins, directions, throughputs), and
+    each bounce intersects every live ray with every sphere in
+    one go, then drops the rays which escaped. The image is cut
+    into tiles, which are traced on a pool of processes, a few
+    samples per pixel at a time, so a rough picture shows up
+    straight away and then refines.
+"""
+
+################################## Tracing ####################################
+
+#the scene, as arrays, in each worker process
+workerScene = None
+
+def packScene(scene):
+    """
+        Copy what the tracer needs out of a Scene, as arrays.
+    """
+
+    return {
+        "centers": np.array([sphere.center for sphere in scene.spheres], dtype=np.float64),
+        "radii": np.array([sphere.radius for sphere in scene.spheres], dtype=np.float64),
+        "colors": np.array([sphere.color for sphere in scene.spheres], dtype=np.float64),
+        "sunDirection": np.array(scene.sun.direction, dtype=np.float64),
+        "sunColor": np.array(scene.sun.color, dtype=np.float64),
+        "cameraPosition": np.array(scene.camera.position, dtype=np.float64),
+        "cameraDirection": np.array(scene.camera.direction, dtype=np.float64),
+        "cameraRight": np.array(scene.camera.right, dtype=np.float64),
+        "cameraUp": np.array(scene.camera.up, dtype=np.float64),
+    }
+
+def setScene(sceneArrays):
+    """
+        Hand a worker the scene, once, when it starts.
+    """
+
+    global workerScene
+    workerScene = sceneArrays
+
+def randomInUnitSphere(rng, count):
+    """
+        Points spread evenly through the unit ball, without
+        rejection: a random direction, pushed out by the cube
+        root of a uniform number.
+    """
+
+    directions = rng.standard_normal((count, 3))
+    directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+    return directions * np.cbrt(rng.uniform(size=(count, 1)))
+
+def intersectSpheres(origins, directions, centers, radii, tMin):
+    """
+        Find the nearest sphere each ray hits beyond tMin.
+
+        Returns the distances (inf for a miss) and the indices
+        of the spheres hit.
+    """
+
+    #(rays, spheres, 3)
+    offsets = origins[:,None,:] - centers[None,:,:]
+    a = np.einsum("ij,ij->i", directions, directions)[:,None]
+    halfB = np.einsum("ijk,ik->ij", offsets, directions)
+    c = np.einsum("ijk,ijk->ij", offsets, offsets) - radii * radii
+    discriminant = halfB * halfB - a * c
+
+    root = np.sqrt(np.maximum(discriminant, 0.0))
+    near = (-halfB - root) / a
+    far = (-halfB + root) / a
+    t = np.where(near > tMin, near, far)
+    t = np.where((discriminant >= 0) & (t > tMin), t, np.inf)
+
+    index = np.argmin(t, axis=1)
+    return t[np.arange(len(t)), index], index
+
+def tracePaths(origins, directions, sceneArrays, maxBounces, rng):
+    """
+        Follow a batch of rays until they escape or run out of
+        bounces. Each surface hit is lit by the sun and tints
+        whatever the ray sees next.
+
+        Returns the color each ray brings back.
+    """
+
+    centers = sceneArrays["centers"]
+    radii = sceneArrays["radii"]
+    albedos = sceneArrays["colors"]
+    sunColor = sceneArrays["sunColor"]
+    sunDirection = sceneArrays["sunDirection"]
+
+    colors = np.zeros((len(origins), 3))
+    throughputs = np.ones((len(origins), 3))
+    alive = np.arange(len(origins))
+
+    for _ in range(maxBounces):
+
+        t, index = intersectSpheres(origins, directions, centers, radii, 0.001)
+
+        #rays which escaped see the sky
+        missed = np.isinf(t)
+        colors[alive[missed]] = throughputs[missed] * sunColor
+        hit = ~missed
+        alive = alive[hit]
+        if len(alive) == 0:
+            return colors
+        origins = origins[hit]
+        directions = directions[hit]
+        throughputs = throughputs[hit]
+        t = t[hit]
+        index = index[hit]
+
+        positions = origins + t[:,None] * directions
+        normals = (positions - centers[index]) / radii[index][:,None]
+        lightingAmount = np.maximum(normals @ -sunDirection, 0.0)
+        throughputs *= lightingAmount[:,None] * albedos[index] * sunColor
+
+        #bounce off in a random direction, leaning towards the normal
+        origins = positions
+        directions = normals + randomInUnitSphere(rng, len(normals))
+        directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+
+    #out of bounces, as though it escaped
+    colors[alive] = throughputs * sunColor
+    return colors
+
+def renderTile(tile, width, height, samples, maxBounces, seed):
+    """
+        Trace some samples for every pixel of a tile, in one
+        batch. Runs in a worker.
+
+            Parameters:
+                tile (tuple): x, y, tile width, tile height
+                width, height (int): size of the whole image
+                samples (int): rays per pixel
+                maxBounces (int): bounces before a ray gives up
+                seed (int): seeds this tile's random numbers
+
+        Returns the tile, the number of samples, and their sum
+        as an array (tile height, tile width, 3).
+    """
+
+    sceneArrays = workerScene
+    rng = np.random.default_rng(seed)
+    x0, y0, tileWidth, tileHeight = tile
+
+    ys, xs = np.mgrid[y0:y0 + tileHeight, x0:x0 + tileWidth]
+    xs = np.tile(xs.ravel(), samples) + rng.uniform(size=samples * xs.size)
+    ys = np.tile(ys.ravel(), samples) + rng.uniform(size=samples * ys.size)
+
+    limitingFactor = max(width / 2, height / 2)
+    horizontalCoefficient = ((xs - width / 2) / limitingFactor)[:,None]
+    verticalCoefficient = ((ys - height / 2) / limitingFactor)[:,None]
+    directions = sceneArrays["cameraDirection"] \
+        + horizontalCoefficient * sceneArrays["cameraRight"] \
+        + verticalCoefficient * sceneArrays["cameraUp"]
+    origins = np.broadcast_to(sceneArrays["cameraPosition"], directions.shape).copy()
+
+    colors = tracePaths(origins, directions, sceneArrays, maxBounces, rng)
+    return tile, samples, colors.reshape(samples, tileHeight, tileWidth, 3).sum(axis=0)
+
+################################## Progressive ################################
+
+class ProgressiveRenderer:
+    """
+        Traces an image in passes, each adding a few samples
+        to every tile, on a pool of worker processes. Finished
+        tiles are picked up with poll(), without waiting.
+    """
+
+
+    def __init__(self, scene, width, height, sampleCount = 32, maxBounces = 32,
+        tileSize = 32, samplesPerPass = 4, workers = None):
+        """
+            Parameters:
+                scene (Scene): what to draw
+                width, height (int): size of the image
+                sampleCount (int): samples per pixel, in the end
+                maxBounces (int): bounces before a ray gives up
+                tileSize (int): tiles are this many pixels across
+                samplesPerPass (int): samples added by each pass,
+                    after the first, which takes one for a quick
+                    preview
+                workers (int): processes to trace on, by default
+                    one per core, 0 traces on this process
+        """
+
+        self.width = width
+        self.height = height
+        self.sampleCount = sampleCount
+        self.maxBounces = maxBounces
+        self.sceneArrays = packScene(scene)
+
+        self.accumulation = np.zeros((height, width, 3))
+        self.samples = np.zeros((height, width), dtype=np.int32)
+
+        self.tiles = [
+            (x, y, min(tileSize, width - x), min(tileSize, height - y))
+            for y in range(0, height, tileSize)
+            for x in range(0, width, tileSize)]
+
+        self.passes = [1]
+        while sum(self.passes) < sampleCount:
+            self.passes.append(min(samplesPerPass, sampleCount - sum(self.passes)))
+
+        if workers is None:
+            workers = os.cpu_count()
+        self.workers = workers
+        self.pool: ProcessPoolExecutor = None
+        self.finished = queue.SimpleQueue()
+        self.pending = 0
+
+    def start(self):
+        """
+            Queue every pass of every tile. The pool works
+            through them in order, so the whole image sharpens
+            together.
+        """
+
+        if self.workers == 0:
+            self.renderInline()
+            return
+
+        self.pool = ProcessPoolExecutor(
+            max_workers = self.workers,
+            initializer = setScene, initargs = (self.sceneArrays,))
+
+        seed = 0
+        for samples in self.passes:
+            for tile in self.tiles:
+                future = self.pool.submit(
+                    renderTile, tile, self.width, self.height,
+                    samples, self.maxBounces, seed)
+                future.add_done_callback(self.finished.put)
+                self.pending += 1
+                seed += 1
+
+    def poll(self):
+        """
+            Add any tiles which have finished to the image.
+
+            Returns how many were added.
+        """
+
+        added = 0
+        while True:
+            try:
+                future = self.finished.get_nowait()
+            except queue.Empty:
+                break
+            self.pending -= 1
+            if future.cancelled():
+                continue
+            self.addTile(*future.result())
+            added += 1
+
+        return added
+
+    def addTile(self, tile, samples, colorSum):
+
+        x, y, tileWidth, tileHeight = tile
+        self.accumulation[y:y + tileHeight, x:x + tileWidth] += colorSum
+        self.samples[y:y + tileHeight, x:x + tileWidth] += samples
+
+    def renderInline(self):
+        """
+            Trace the whole image on this process, pass by pass.
+        """
+
+        setScene(self.sceneArrays)
+        seed = 0
+        for samples in self.passes:
+            for tile in self.tiles:
+                self.addTile(*renderTile(
+                    tile, self.width, self.height,
+                    samples, self.maxBounces, seed))
+                seed += 1
+
+    @property
+    def done(self):
+        return self.pending == 0
+
+    def packedColors(self, out):
+        """
+            Write the image so far into out, as packed RGBA8
+            (red in the top byte), one row after another from
+            the bottom.
+        """
+
+        average = self.accumulation / np.maximum(self.samples, 1)[:,:,None]
+        rgb = np.clip(average * 255, 0, 255).astype(np.uint32)
+        out[:] = ((rgb[:,:,0] << 24) | (rgb[:,:,1] << 16) | (rgb[:,:,2] << 8) | 255).ravel()
+
+    def close(self):
+
+        if self.pool is not None:
+            self.pool.shutdown(wait = False, cancel_futures = True)
+            self.pool = None
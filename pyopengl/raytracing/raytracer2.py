@@ -2,21 +2,7 @@ import pygame as pg
 from OpenGL.GL import *
 from OpenGL.GL.shaders import compileProgram,compileShader
 import numpy as np
-import pyrr
-
-################################## Helper Functions ###########################
-
-def randomInUnitSphere():
-    while True:
-        vector = np.array([
-            np.random.uniform(low=-1.0,high=1.0),
-            np.random.uniform(low=-1.0,high=1.0),
-            np.random.uniform(low=-1.0,high=1.0)
-        ], dtype=np.float32)
-
-        if (pyrr.vector.squared_length(vector) >= 1):
-            continue
-        return vector
+import path_tracer
 
 ################################## Model ######################################
 
@@ -57,27 +43,6 @@ class Sphere:
         self.center = center
         self.radius = radius
         self.color = color
-    
-    def hit(self, ray, tMin, tMax, renderState):
-        co = ray.position - self.center
-        a = np.dot(ray.direction, ray.direction)
-        b = 2 * np.dot(co, ray.direction)
-        c = np.dot(co, co) - self.radius * self.radius
-        discriminant = b * b - 4 * a * c
-        if discriminant < 0:
-            return False
-        root = (-b - np.sqrt(discriminant)) / (2 * a)
-        if (root < tMin) or (root > tMax):
-            root = (-b + np.sqrt(discriminant)) / (2 * a)
-            if (root < tMin) or (root > tMax):
-                return False
-        
-        renderState.t = root
-        renderState.pos = ray.position + root * ray.direction
-        renderState.normal = pyrr.vector.normalize(ray.position + root * ray.direction - self.center)
-        renderState.color = self.color
-
-        return True
 
 class DirectionalLight:
     """
@@ -137,39 +102,6 @@ class Scene:
 
 ################################## View #######################################
 
-class RenderState:
-    """
-        Stores useful information when a ray hits a sphere
-    """
-    def __init__(self, pos, normal, t, color):
-        """
-            Parameters:
-                pos (numpy array [3,1])
-                normal (numpy array [3,1])
-                t (float)
-                color (numpy array [3,1])
-        """
-        self.pos = pos
-        self.normal = normal
-        self.t = t
-        self.color = color
-
-class Ray:
-    """
-        Abstract ray for rendering, has a start position and a direction
-    """
-
-
-    def __init__(self, position, direction):
-        """
-            Parameters:
-                position (numpy array [3,1])
-                direction (numpy array [3,1])
-        """
-
-        self.position = position
-        self.direction = direction
-    
 class Engine:
     """
         Responsible for drawing scenes
@@ -187,6 +119,8 @@ class Engine:
         self.screenHeight = height
         self.sampleCount = 32
         self.maxBounces = 32
+        #traces on a pool of processes, in the background
+        self.renderer: path_tracer.ProgressiveRenderer = None
 
         #general OpenGL configuration
         self.shader = self.createShader("shaders/frameBufferVertex.txt",
@@ -227,8 +161,9 @@ class Engine:
         glVertexAttribPointer(1, 2, GL_FLOAT, GL_FALSE, 20, ctypes.c_void_p(12))
     
     def createColorBuffer(self):
-        self.colorBufferData = np.array(
-            [np.uint32((255<<16) + (255 << 8) + (255 << 0)) for pixel in range(self.screenWidth * self.screenHeight)],
+        self.colorBufferData = np.full(
+            self.screenWidth * self.screenHeight,
+            (255<<16) + (255 << 8) + (255 << 0),
             dtype=np.uint32
         )
 
@@ -241,7 +176,7 @@ class Engine:
         glTexParameteri (GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
 
         
-        glTexImage2D(GL_TEXTURE_2D,0,GL_RGBA,self.screenWidth,self.screenHeight,0,GL_RGBA,GL_UNSIGNED_INT_8_8_8_8,bytes(self.colorBufferData))
+        glTexImage2D(GL_TEXTURE_2D,0,GL_RGBA,self.screenWidth,self.screenHeight,0,GL_RGBA,GL_UNSIGNED_INT_8_8_8_8,self.colorBufferData)
     
     def createShader(self, vertexFilepath, fragmentFilepath):
         """
@@ -260,64 +195,19 @@ class Engine:
         
         return shader
 
-    def setPixel(self, x, y, color):
-        r = max(0,min(255,int(color[0] * 255 / self.sampleCount)))
-        g = max(0,min(255,int(color[1] * 255 / self.sampleCount)))
-        b = max(0,min(255,int(color[2] * 255 / self.sampleCount)))
-        self.colorBufferData[x + y * self.screenWidth] = (r << 24) + (g << 16) + (b << 8) + 255
-    
-    def rayColor(self, ray, scene, bounce):
-        if bounce >= self.maxBounces:
-            return scene.sun.color
-        
-        color = scene.sun.color
-        renderState = RenderState(
-            pos = np.array([0,0,0],dtype=np.float32),
-            normal = np.array([0,0,0],dtype=np.float32),
-            t = 0,
-            color = np.array([0,0,0],dtype=np.float32)
-        )
-        nearestHit = 999999999
-        hitSomething = False
-        for sphere in scene.spheres:
-            if sphere.hit(ray, 0.001, nearestHit, renderState):
-                nearestHit = renderState.t
-                hitSomething = True
-        
-        if hitSomething:
-            lightingAmount = max(np.dot(-renderState.normal, scene.sun.direction), 0)
-            color = lightingAmount * np.multiply(renderState.color, scene.sun.color, dtype=np.float32)
-            ray.position = renderState.pos
-            ray.direction = pyrr.vector.normalize(renderState.normal + randomInUnitSphere())
-            return np.multiply(color, self.rayColor(ray,scene, bounce + 1))
-        
-        return color
-        
     def renderScene(self, scene):
         """
-            Draw all objects in the scene
+            Start tracing the scene. The picture fills in, roughly
+            at first, as drawScreen is called.
         """
 
-        glUseProgram(self.shader)
-
-        for y in range(self.screenHeight):
-            print(f"Rendering line {y}/{self.screenHeight - 1}")
-            for x in range(self.screenWidth):
-                color = np.array([0,0,0],dtype=np.float32)
-                limitingFactor = max(self.screenWidth/2, self.screenHeight/2)
-                for sample in range(self.sampleCount):
-                    horizontalCoefficient = (x + np.random.uniform() - self.screenWidth / 2) / limitingFactor
-                    verticalCoefficient = (y + np.random.uniform() - self.screenHeight / 2) / limitingFactor
-                    ray = Ray(
-                        position = scene.camera.position,
-                        direction = scene.camera.direction \
-                            + horizontalCoefficient * scene.camera.right \
-                            + verticalCoefficient * scene.camera.up
-                    )
-                    color += self.rayColor(ray,scene, 0)
-                self.setPixel(x,y,color)
-                
+        if self.renderer is not None:
+            self.renderer.close()
 
+        self.renderer = path_tracer.ProgressiveRenderer(
+            scene, self.screenWidth, self.screenHeight,
+            sampleCount = self.sampleCount, maxBounces = self.maxBounces)
+        self.renderer.start()
 
     def clearScreen(self):
         self.colorBufferData &= 0
@@ -325,7 +215,9 @@ class Engine:
     
     def drawScreen(self):
         glBindTexture(GL_TEXTURE_2D, self.colorBuffer)
-        glTexImage2D(GL_TEXTURE_2D,0,GL_RGBA,self.screenWidth,self.screenHeight,0,GL_RGBA,GL_UNSIGNED_INT_8_8_8_8,bytes(self.colorBufferData))
+        if self.renderer is not None and self.renderer.poll() > 0:
+            self.renderer.packedColors(self.colorBufferData)
+            glTexSubImage2D(GL_TEXTURE_2D,0,0,0,self.screenWidth,self.screenHeight,GL_RGBA,GL_UNSIGNED_INT_8_8_8_8,self.colorBufferData)
         glBindVertexArray(self.vao)
         glDrawArrays(GL_TRIANGLES, 0, self.vertex_count)
         pg.display.flip()
@@ -335,6 +227,8 @@ class Engine:
             Free any allocated memory
         """
 
+        if self.renderer is not None:
+            self.renderer.close()
         glDeleteVertexArrays(1, (self.vao,))
         glDeleteBuffers(1, (self.vbo,))
         glDeleteTextures(1, (self.colorBuffer,))
@@ -384,4 +278,5 @@ class App:
         self.graphicsEngine.destroy()
         pg.quit()
 
-myApp = App()
\ No newline at end of file
+if __name__ == "__main__":
+    myApp = App()
\ No newline at end of file
@@ -166,7 +166,7 @@ class Engine:
             "CrumblingBrickWall", "DiamondSquareFlourishTiles", "EgyptianHieroglyphMetal"
         ]
 
-        self.megaTexture = megatexture.MegaTexture(filenames)
+        self.megaTexture = megatexture.MegaTexture(filenames, streamMipmaps = False)
     
     def createShader(self, vertexFilepath, fragmentFilepath):
         """
@@ -290,6 +290,7 @@ class Engine:
         """
             Draw all objects in the scene
         """
+        self.megaTexture.update()
         """
         glUseProgram(self.rayTracerShader)
 
@@ -1,34 +1,55 @@
 from config import *
+import os
+import json
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+#---- Megatexture Atlas              ----#
+# Each material is a row of five layers. #
+# Layers are decoded in a thread pool    #
+# straight into one rgba8 array, which   #
+# is cached on disk until one of the     #
+# source images changes.                 #
+#----------------------------------------#
+
+CACHE_VERSION = 1
+CACHE_FOLDER = "cache"
+layers = ("albedo", "emissive", "glossiness", "normal", "specular")
 
 class MegaTexture:
 
-    def __init__(self, filenames):
-        
-        texture_size = 1024
-        texture_count = len(filenames)
-        width = 5 * texture_size
-        height = texture_count * texture_size
-
-        
-        textureData = pg.Surface((width,height)).convert()
-        for i in range(texture_count):
-            #load albedo
-            image = pg.image.load(f"textures\{filenames[i]}\{filenames[i]}_albedo.png").convert()
-            textureData.blit(image, (0, (texture_count - i - 1) * texture_size))
-            #load emissive
-            image = pg.image.load(f"textures\{filenames[i]}\{filenames[i]}_emissive.png").convert()
-            textureData.blit(image, (texture_size, (texture_count - i - 1) * texture_size))
-            #load glossmap
-            image = pg.image.load(f"textures\{filenames[i]}\{filenames[i]}_glossiness.png").convert()
-            textureData.blit(image, (2 * texture_size, (texture_count - i - 1) * texture_size))
-            #load normal
-            image = pg.image.load(f"textures\{filenames[i]}\{filenames[i]}_normal.png").convert()
-            textureData.blit(image, (3 * texture_size, (texture_count - i - 1) * texture_size))
-            #load specular
-            image = pg.image.load(f"textures\{filenames[i]}\{filenames[i]}_specular.png").convert()
-            textureData.blit(image, (4 * texture_size, (texture_count - i - 1) * texture_size))
-        img_data = pg.image.tostring(textureData,"RGBA")
+    def __init__(self, filenames, streamMipmaps = False):
+        """
+            Load the atlas (from the cache if it's there) and
+            upload it.
+
+            Parameters:
+                filenames (list[str]): material names, one row each
+                streamMipmaps (bool): upload the smaller mip levels a
+                    frame at a time, instead of generating them all
+                    up front
+        """
+
+        start = time.perf_counter()
 
+        self.texture_size = 1024
+        self.texture_count = len(filenames)
+        self.width = len(layers) * self.texture_size
+        self.height = self.texture_count * self.texture_size
+        self.levels = int(np.log2(max(self.width, self.height))) + 1
+
+        sources = [
+            [os.path.join("textures", name, f"{name}_{layer}.png") for layer in layers]
+            for name in filenames
+        ]
+        self.folder = os.path.join(CACHE_FOLDER, "megatexture", cache_key(sources, self.texture_size))
+        self.cacheHit = os.path.exists(level_path(self.folder, 0))
+        if self.cacheHit:
+            img_data = np.load(level_path(self.folder, 0), mmap_mode = 'r')
+        else:
+            img_data = load_atlas(sources, self.texture_size)
+            save_level(self.folder, 0, img_data)
 
         self.texture = glGenTextures(1)
         glBindTexture(GL_TEXTURE_2D, self.texture)
@@ -36,8 +57,150 @@ class MegaTexture:
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
-        glTexImage2D(GL_TEXTURE_2D,0,GL_RGBA32F,width, height,0,GL_RGBA,GL_UNSIGNED_BYTE,img_data)
-        glGenerateMipmap(GL_TEXTURE_2D)
+        #8 bits a channel is all the images have, no need for floats
+        glTexStorage2D(GL_TEXTURE_2D, self.levels, GL_RGBA8, self.width, self.height)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        glTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, self.width, self.height,
+                        GL_RGBA, GL_UNSIGNED_BYTE, np.ascontiguousarray(img_data))
+
+        self.streamMipmaps = streamMipmaps
+        if streamMipmaps:
+            self.levelsLoaded = 1
+            self.lastLevel = img_data
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, 0)
+        else:
+            self.levelsLoaded = self.levels
+            glGenerateMipmap(GL_TEXTURE_2D)
+
+        self.loadTime = time.perf_counter() - start
+        #the whole mip chain, allocated up front
+        self.bytesUsed = int(sum(
+            4 * max(self.width >> level, 1) * max(self.height >> level, 1)
+            for level in range(self.levels)))
+        print(f"megatexture: {self.texture_count} materials in "
+              f"{1000 * self.loadTime:.0f} ms ({'cached' if self.cacheHit else 'decoded'}), "
+              f"{self.bytesUsed / 2**20:.0f} MB on the gpu "
+              f"(was {4 * self.bytesUsed / 2**20:.0f} MB as floats)")
+
+    def update(self):
+        """
+            Call once a frame. When streaming, uploads the next
+            mip level.
+        """
+
+        if self.levelsLoaded == self.levels:
+            return
+
+        level = self.levelsLoaded
+        path = level_path(self.folder, level)
+        if os.path.exists(path):
+            img_data = np.load(path, mmap_mode = 'r')
+        else:
+            img_data = downsample(self.lastLevel)
+            save_level(self.folder, level, img_data)
+
+        height, width = img_data.shape[:2]
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        glTexSubImage2D(GL_TEXTURE_2D, level, 0, 0, width, height,
+                        GL_RGBA, GL_UNSIGNED_BYTE, np.ascontiguousarray(img_data))
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, level)
+
+        self.lastLevel = img_data
+        self.levelsLoaded += 1
     
     def destroy(self):
-        glDeleteTextures(1, self.texture)
\ No newline at end of file
+        glDeleteTextures(1, (self.texture,))
+
+#region
+def cache_key(sources, texture_size):
+    """
+        Hash the layout and each source image's size and
+        modification time, so touching any of them misses the cache.
+    """
+
+    digest = hashlib.sha256()
+    digest.update(f"version {CACHE_VERSION} size {texture_size}".encode())
+    for filename in (filename for material in sources for filename in material):
+        try:
+            status = os.stat(filename)
+            stamp = (filename, status.st_mtime_ns, status.st_size)
+        except OSError:
+            stamp = (filename, None, None)
+        digest.update(json.dumps(stamp).encode())
+
+    return digest.hexdigest()[:32]
+
+def level_path(folder, level):
+
+    return os.path.join(folder, f"level_{level}.npy")
+
+def save_level(folder, level, img_data):
+    """
+        Write a mip level to the cache. It's written under a
+        temporary name first, so a crash never leaves half a file.
+    """
+
+    os.makedirs(folder, exist_ok = True)
+    path = level_path(folder, level)
+    staging = f"{path}.{os.getpid()}.tmp"
+    with open(staging, 'wb') as f:
+        np.save(f, img_data)
+    os.replace(staging, path)
+
+def load_atlas(sources, texture_size):
+    """
+        Decode every layer of every material into one rgba8 array,
+        laid out like the old pygame surface: first row at the top,
+        first material at the bottom.
+    """
+
+    texture_count = len(sources)
+    img_data = np.empty(
+        (texture_count * texture_size, len(layers) * texture_size, 4), dtype = np.uint8)
+
+    def load_layer(i, j):
+        row = (texture_count - i - 1) * texture_size
+        col = j * texture_size
+        image = pg.image.load(sources[i][j])
+        width, height = image.get_size()
+        pixels = np.frombuffer(pg.image.tostring(image, "RGBX"), dtype = np.uint8)
+        pixels = pixels.reshape(height, width, 4)[:texture_size, :texture_size]
+        tile = img_data[row : row + texture_size, col : col + texture_size]
+        #like a blit, anything too big is cropped and too small is left black
+        if pixels.shape[:2] != tile.shape[:2]:
+            tile[:] = (0, 0, 0, 255)
+        tile[: pixels.shape[0], : pixels.shape[1]] = pixels
+        #the surface was converted without alpha before
+        if image.get_flags() & pg.SRCALPHA:
+            tile[..., 3] = 255
+
+    #image loading lets go of the gil, so the decoding overlaps
+    with ThreadPoolExecutor(max_workers = os.cpu_count()) as pool:
+        jobs = [pool.submit(load_layer, i, j)
+                for i in range(texture_count) for j in range(len(layers))]
+        for job in jobs:
+            job.result()
+
+    return img_data
+
+def downsample(img_data):
+    """
+        Halve an image with a box filter, like glGenerateMipmap.
+    """
+
+    height, width = img_data.shape[:2]
+    rows = (0, 1) if height > 1 else (0,)
+    cols = (0, 1) if width > 1 else (0,)
+    step_y = len(rows)
+    step_x = len(cols)
+    img_data = img_data[: height // step_y * step_y, : width // step_x * step_x]
+
+    total = 0
+    for row in rows:
+        for col in cols:
+            total = total + img_data[row::step_y, col::step_x].astype(np.uint16)
+    count = step_y * step_x
+
+    return ((total + count // 2) // count).astype(np.uint8)
+#endregion